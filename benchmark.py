@@ -0,0 +1,290 @@
+"""
+Throughput benchmarks against the configured database (see DB_CONFIG in main.py)
+
+Run against a test database: benchmarks write real ledger rows.
+    
+    python benchmark.py adjustments --lines 1000 --repeat 5
+    python benchmark.py lookups --count 2000
+    python benchmark.py loadtest --workstations 8 --duration 60 --think-ms 2000 --skew 1.1
+"""
+import argparse
+import random
+import threading
+import time
+
+import mysql.connector
+
+from main import (Database, apply_adjustments, issue_spare, InsufficientStockError,
+                  fetch_parts_delta, lookup_item)
+
+DEADLOCK_ERRNO = 1213
+LOCK_WAIT_TIMEOUT_ERRNO = 1205
+
+
+def bench_adjustments(lines: int, repeat: int):
+    """Post batches of Found(+1) / Loss(-1) pairs so stock ends where it started"""
+    ids = [row[0] for row in Database.execute_query(
+        "SELECT id FROM spareparts ORDER BY id LIMIT %s", (lines,), fetch=True) or []]
+    if not ids:
+        print("No spareparts rows to adjust")
+        return
+    # Spread the batch over the available spares
+    batch_ids = [ids[i % len(ids)] for i in range(lines)]
+    found = [(spare_id, 'Found', 1, 'benchmark') for spare_id in batch_ids]
+    loss = [(spare_id, 'Loss', -1, 'benchmark') for spare_id in batch_ids]
+    
+    timings = []
+    for _ in range(repeat):
+        for batch in (found, loss):
+            started = time.perf_counter()
+            apply_adjustments(batch, "benchmark")
+            timings.append(time.perf_counter() - started)
+    
+    timings.sort()
+    median = timings[len(timings) // 2]
+    print(f"adjustments: {lines} lines/batch over {len(set(batch_ids))} spares, {len(timings)} batches")
+    print(f"  median {median * 1000:.0f} ms/batch, {lines / median:,.0f} lines/s "
+          f"(best {timings[0] * 1000:.0f} ms, worst {timings[-1] * 1000:.0f} ms)")
+
+
+def bench_lookups(count: int):
+    """Hot point lookups, with and without the old ping-before-every-query"""
+    ids = [row[0] for row in Database.execute_query(
+        "SELECT id FROM spareparts ORDER BY id LIMIT 1000", fetch=True) or []]
+    if not ids:
+        print("No spareparts rows to look up")
+        return
+    query = "SELECT id, spare_name, stock FROM spareparts WHERE id = %s"
+    
+    def run(ping: bool) -> float:
+        started = time.perf_counter()
+        for i in range(count):
+            if ping:
+                Database.get_connection().is_connected()    # what every query used to pay
+            Database.execute_query(query, (ids[i % len(ids)],), fetch=True)
+        return (time.perf_counter() - started) / count
+    
+    run(False)  # warm up
+    with_ping = run(True)
+    without_ping = run(False)
+    print(f"lookups: {count} point selects")
+    print(f"  ping per query : {with_ping * 1e6:8.0f} us/query")
+    print(f"  idle-time check: {without_ping * 1e6:8.0f} us/query "
+          f"({1 - without_ping / with_ping:.0%} less latency)")
+
+
+class Workstation(threading.Thread):
+    """
+    One simulated store counter on its own connection
+    
+    Loops like a clerk at the issue form: look the item up, think, issue it
+    through issue_spare (the submit_transaction write path), think again;
+    every refresh_s it runs the delta refresh the app polls with.
+    """
+    
+    def __init__(self, number: int, spares, cum_weights, stop: threading.Event, think_ms: float,
+                 refresh_s: float, qty: int, tag: str, seed: int):
+        super().__init__(daemon=True)
+        self.number = number
+        self.spares = spares
+        self.cum_weights = cum_weights
+        self.stop = stop
+        self.think_ms = think_ms
+        self.refresh_s = refresh_s
+        self.qty = qty
+        self.tag = tag
+        self.random = random.Random(seed)
+        self.latency = {'lookup': [], 'issue': [], 'refresh': []}
+        self.issued = {}        # spare_id -> qty committed
+        self.counts = {'ok': 0, 'rejected': 0, 'deadlock': 0, 'lock_timeout': 0, 'error': 0}
+    
+    def think(self):
+        if self.think_ms > 0:
+            self.stop.wait(self.random.expovariate(1000 / self.think_ms))
+    
+    def timed(self, kind: str, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        self.latency[kind].append(time.perf_counter() - started)
+        return result
+    
+    def run(self):
+        # The app's own service calls on this thread's primary connection. The
+        # query cache is per process, so here it is shared by every station.
+        with Database.worker_connection(write=True) as conn:
+            self.loop(conn)
+    
+    def loop(self, conn):
+        def refresh(since):
+            # Without the deleted-id scan, as the app's poll runs it
+            watermark = fetch_parts_delta(since, check_deleted=False)[2]
+            return watermark or since
+        
+        since = Database.execute_query("SELECT NOW() - INTERVAL %s SECOND",
+                                       (Database.watermark_margin(),), fetch=True)[0][0]
+        next_refresh = time.monotonic() + self.refresh_s
+        while not self.stop.is_set():
+            spare_id, name = self.random.choices(self.spares, cum_weights=self.cum_weights)[0]
+            self.timed('lookup', lookup_item, name)
+            self.think()
+            if self.stop.is_set():
+                break
+            
+            started = time.perf_counter()
+            try:
+                spare_id = issue_spare(conn, self.qty, f"LOADTEST-{self.number}", self.tag,
+                                       spare_name=name)[0]
+                self.issued[spare_id] = self.issued.get(spare_id, 0) + self.qty
+                self.counts['ok'] += 1
+            except InsufficientStockError:
+                self.counts['rejected'] += 1
+            except mysql.connector.Error as err:
+                if err.errno == DEADLOCK_ERRNO:
+                    self.counts['deadlock'] += 1
+                elif err.errno == LOCK_WAIT_TIMEOUT_ERRNO:
+                    self.counts['lock_timeout'] += 1
+                else:
+                    self.counts['error'] += 1
+            self.latency['issue'].append(time.perf_counter() - started)
+            
+            if time.monotonic() >= next_refresh:
+                since = self.timed('refresh', refresh, since)
+                next_refresh = time.monotonic() + self.refresh_s
+            self.think()
+
+
+def percentile(values, fraction: float) -> float:
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else 0.0
+
+
+def primary_rows(query: str, params: tuple = ()) -> list:
+    """Read on a fresh primary connection: no replica lag, no query cache"""
+    conn = Database.new_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def row_lock_status() -> dict:
+    return {name: int(value) for name, value in primary_rows("SHOW GLOBAL STATUS LIKE 'Innodb_row_lock%'")}
+
+
+def bench_loadtest(workstations: int, duration: float, think_ms: float, skew: float, items: int,
+                   refresh_s: float, qty: int, topup: int, seed: int):
+    """N concurrent workstations issuing against a shared catalog, then a consistency check"""
+    spares = [(row[0], row[1]) for row in Database.execute_query(
+        "SELECT id, spare_name FROM spareparts ORDER BY id LIMIT %s", (items,), fetch=True) or []]
+    if not spares:
+        print("No spareparts rows to issue")
+        return
+    ids = [spare_id for spare_id, _ in spares]
+    placeholders = ", ".join(["%s"] * len(ids))
+    stock_query = f"SELECT id, stock FROM spareparts WHERE id IN ({placeholders})"
+    
+    # Top up through the ledger so the run measures contention, not empty shelves
+    if topup:
+        short = [(spare_id, 'Found', topup - (stock or 0), 'load test top-up')
+                 for spare_id, stock in primary_rows(stock_query, tuple(ids))
+                 if (stock or 0) < topup]
+        apply_adjustments(short, "loadtest")
+    
+    # Zipf-like skew: the spare at popularity rank r is picked with weight 1 / r^skew
+    rng = random.Random(seed)
+    rng.shuffle(spares)
+    cum_weights, total = [], 0.0
+    for rank in range(1, len(spares) + 1):
+        total += 1 / rank ** skew
+        cum_weights.append(total)
+    
+    before = dict(primary_rows(stock_query, tuple(ids)))
+    locks_before = row_lock_status()
+    tag = f"loadtest {time.strftime('%Y%m%d-%H%M%S')}"
+    stop = threading.Event()
+    threads = [Workstation(n, spares, cum_weights, stop, think_ms, refresh_s, qty, tag, seed + n)
+               for n in range(1, workstations + 1)]
+    
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    stop.wait(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    locks_after = row_lock_status()
+    
+    counts = {key: sum(t.counts[key] for t in threads) for key in threads[0].counts}
+    issued = {}
+    for thread in threads:
+        for spare_id, q in thread.issued.items():
+            issued[spare_id] = issued.get(spare_id, 0) + q
+    
+    # Consistency: every committed issue, and nothing else, reached stock and the usage ledger
+    after = dict(primary_rows(stock_query, tuple(ids)))
+    violations = [(spare_id, before[spare_id], issued.get(spare_id, 0), after.get(spare_id))
+                  for spare_id in ids
+                  if after.get(spare_id) is None or after[spare_id] < 0
+                  or before[spare_id] - issued.get(spare_id, 0) != after[spare_id]]
+    usage_rows = primary_rows("SELECT COUNT(*) FROM stock_usage WHERE notes = %s", (tag,))[0][0]
+    
+    print(f"loadtest: {workstations} workstations, {elapsed:.0f} s, {len(spares)} spares "
+          f"(skew {skew}), think {think_ms:g} ms, refresh every {refresh_s:g} s")
+    print(f"  issues     : {counts['ok']} ok, {counts['rejected']} rejected (no stock), "
+          f"{counts['deadlock']} deadlocks, {counts['lock_timeout']} lock wait timeouts, "
+          f"{counts['error']} other errors")
+    print(f"  throughput : {counts['ok'] / elapsed:.1f} issues/s ({counts['ok'] / elapsed * 60:,.0f}/min)")
+    print(f"  latency ms : {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8} {'count':>8}")
+    for kind in ('lookup', 'issue', 'refresh'):
+        values = sorted(v for t in threads for v in t.latency[kind])
+        print(f"    {kind:<9}: " + " ".join(f"{percentile(values, f) * 1000:8.1f}" for f in (0.5, 0.9, 0.99, 1.0))
+              + f" {len(values):8d}")
+    waits = locks_after.get('Innodb_row_lock_waits', 0) - locks_before.get('Innodb_row_lock_waits', 0)
+    waited = locks_after.get('Innodb_row_lock_time', 0) - locks_before.get('Innodb_row_lock_time', 0)
+    print(f"  lock waits : {waits} row lock waits, {waited} ms waited"
+          + (f" (avg {waited / waits:.1f} ms)" if waits else ""))
+    print(f"  consistency: {len(violations)} stock violations over {len(ids)} spares, "
+          f"usage ledger {usage_rows}/{counts['ok']} rows")
+    for spare_id, stock_before, taken, stock_after in violations[:10]:
+        print(f"    spare {spare_id}: {stock_before} - {taken} issued, but stock is {stock_after}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+    
+    adjustments = sub.add_parser("adjustments", help="batched stock adjustment throughput")
+    adjustments.add_argument("--lines", type=int, default=1000)
+    adjustments.add_argument("--repeat", type=int, default=5)
+    
+    lookups = sub.add_parser("lookups", help="hot lookup latency with and without a ping per query")
+    lookups.add_argument("--count", type=int, default=2000)
+    
+    loadtest = sub.add_parser("loadtest", help="concurrent workstations: throughput, latency, locks, consistency")
+    loadtest.add_argument("--workstations", type=int, default=8)
+    loadtest.add_argument("--duration", type=float, default=60, help="seconds")
+    loadtest.add_argument("--think-ms", type=float, default=2000, help="mean think time between steps")
+    loadtest.add_argument("--skew", type=float, default=1.0, help="hot-item skew (0 = uniform)")
+    loadtest.add_argument("--items", type=int, default=500, help="spares in play")
+    loadtest.add_argument("--refresh-s", type=float, default=15, help="delta refresh interval")
+    loadtest.add_argument("--qty", type=int, default=1, help="units per issue")
+    loadtest.add_argument("--topup", type=int, default=1000, help="top spares up to this stock first (0 = off)")
+    loadtest.add_argument("--seed", type=int, default=1)
+    
+    args = parser.parse_args()
+    try:
+        if args.benchmark == "adjustments":
+            bench_adjustments(args.lines, args.repeat)
+        elif args.benchmark == "lookups":
+            bench_lookups(args.count)
+        elif args.benchmark == "loadtest":
+            bench_loadtest(args.workstations, args.duration, args.think_ms, args.skew, args.items,
+                           args.refresh_s, args.qty, args.topup, args.seed)
+    finally:
+        Database.close_connection()
+
+
+if __name__ == "__main__":
+    main()
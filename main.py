@@ -1,12 +1,194 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import mysql.connector
+import csv
+import json
 from datetime import datetime
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
+import os
+import io
+import re
 import sys
+import mmap
+import struct
+import time
 import traceback
-from threading import Thread
+import functools
+import cProfile
+import pstats
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from array import array
+import threading
+from threading import Thread, Event
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, CancelledError, as_completed
+from concurrent.futures.process import BrokenProcessPool
 import queue
+import multiprocessing
+from collections import deque, OrderedDict
+from bisect import bisect_left, insort
+import heapq
+from abc import ABC, abstractmethod
+
+try:
+    import numpy as np  # optional: vectorized status classification
+except ImportError:
+    np = None
+
+# Local folder for the warm-start snapshot and UI preferences
+APP_DATA_DIR = os.path.join(os.path.expanduser("~"), ".me_storage")
+PREFS_PATH = os.path.join(APP_DATA_DIR, 'ui_prefs.json')
+
+# MySQL connection settings
+DB_CONFIG = {
+    'host': "localhost",
+    'user': "root",
+    'password': "",  # Your MySQL password here
+    'database': "me_database",
+    'charset': 'utf8mb4',
+    'collation': 'utf8mb4_unicode_ci',
+}
+
+# Read replicas as DB_CONFIG overrides, e.g. [{'host': "10.0.0.12"}] or a local
+# second instance [{'port': 3307}]. Empty keeps every query on the primary.
+DB_REPLICAS = []
+READ_YOUR_WRITES_SECONDS = 5    # after a write, this session reads from the primary
+REPLICA_MAX_LAG_SECONDS = 5     # replicas further behind are skipped
+REPLICA_CHECK_SECONDS = 10      # how often the open replica's lag is re-checked
+REPLICA_RETRY_SECONDS = 30      # how long a failed or lagging replica is skipped
+
+# Connection liveness: no ping per query, only after the connection sat idle
+CONNECTION_IDLE_CHECK_SECONDS = 60  # ping before reuse after this much idle time
+KEEPALIVE_SECONDS = 240             # keepalive ping interval, well under wait_timeout
+KEEPALIVE_CHECK_SECONDS = 60        # how often the keepalive thread looks at the idle time
+LOST_CONNECTION_ERRNOS = {2006, 2013, 2055}     # gone away / lost during query / lost at
+
+# Statements that may run on a replica (locking reads are excluded separately)
+READ_ONLY_KEYWORDS = ('SELECT', 'WITH', 'SHOW', 'EXPLAIN')
+
+# ================================================
+# QUERY CACHE - TTL + LRU WITH TABLE TAGS
+# ================================================
+
+QUERY_CACHE_BYTES = 32 * 1024 * 1024    # memory budget for cached results
+QUERY_CACHE_TTL = 30                    # default seconds for cache=True
+QUERY_CACHE_MAX_ENTRY_SHARE = 4         # one result may use at most 1/4 of the budget
+
+# Tables a statement reads or writes (identifiers after these keywords)
+TABLE_NAME_RE = re.compile(r'\b(?:FROM|JOIN|INTO|UPDATE|TABLE)\s+`?(\w+)`?', re.IGNORECASE)
+
+# View -> base tables it reads, so writes to those also drop cached view reads
+# (filled in where the views are defined)
+VIEW_TABLES = {}
+
+def query_tables(query: str) -> frozenset:
+    """Lower-cased table names mentioned in a statement, views expanded to their base tables"""
+    tables = {name.lower() for name in TABLE_NAME_RE.findall(query)}
+    for view in tables & VIEW_TABLES.keys():
+        tables.update(VIEW_TABLES[view])
+    return frozenset(tables)
+
+def result_size(rows) -> int:
+    """Approximate in-memory size of a fetched result"""
+    size = sys.getsizeof(rows)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+    return size
+
+
+class QueryCache:
+    """
+    Result cache keyed by (SQL, params)
+    
+    Entries expire after their TTL, the least recently used are evicted
+    past the memory budget, and a write to any table an entry read from
+    drops it. Each invalidation bumps the table's generation, so a read
+    that was in flight across a write is not stored afterwards.
+    """
+    
+    def __init__(self, max_bytes: int = QUERY_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()    # key -> (expires, size, tables, rows)
+        self.by_table = {}              # table -> set of keys
+        self.generations = {}           # table -> invalidation count
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[3]
+    
+    def generation(self, tables) -> tuple:
+        """Snapshot of the tables' generations; take it before running the read"""
+        with self.lock:
+            return tuple(self.generations.get(table, 0) for table in sorted(tables))
+    
+    def put(self, key, rows, tables: frozenset, ttl: float, generation: tuple = None):
+        size = result_size(rows)
+        if size > self.max_bytes // QUERY_CACHE_MAX_ENTRY_SHARE:
+            return
+        with self.lock:
+            # A write landed while the read ran: its rows may predate it
+            if generation is not None and generation != tuple(
+                    self.generations.get(table, 0) for table in sorted(tables)):
+                return
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = (time.monotonic() + ttl, size, tables, rows)
+            self.bytes += size
+            for table in tables:
+                self.by_table.setdefault(table, set()).add(key)
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+    
+    def invalidate(self, tables):
+        """Drop every entry that read from any of the tables"""
+        with self.lock:
+            for table in tables:
+                table = table.lower()
+                self.generations[table] = self.generations.get(table, 0) + 1
+                for key in self.by_table.pop(table, ()):
+                    if key in self.entries:
+                        self._drop(key)
+                        self.invalidations += 1
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.by_table.clear()
+            self.bytes = 0
+    
+    def _drop(self, key):
+        _, size, tables, _ = self.entries.pop(key)
+        self.bytes -= size
+        for table in tables:
+            keys = self.by_table.get(table)
+            if keys:
+                keys.discard(key)
+    
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
 
 # ================================================
 # DATABASE CONNECTION & SETUP - OPTIMIZED
@@ -16,28 +198,273 @@ class Database:
     """Singleton database connection with improved performance"""
     _connection = None
     _connection_pool = []
+    _last_used = 0.0    # time.monotonic() the primary connection was last handed out
+    # Guards handing the primary between the UI thread and the keepalive thread
+    _connection_lock = threading.Lock()
+    _keepalive_stop = None
+    
+    # Read/write splitting: reads go to a replica unless this session wrote recently
+    _replica_connection = None
+    _replica_checked_at = 0.0
+    _replica_down_until = {}    # replica index -> time.monotonic() it may be retried
+    _last_write_at = None
+    
+    # Opt-in result cache (execute_query(..., cache=...)), invalidated by writes
+    query_cache = QueryCache()
+    
+    # Worker threads never touch the shared connection: each binds its own
+    _worker = threading.local()
+    
+    @classmethod
+    @contextmanager
+    def worker_connection(cls, write: bool = False):
+        """
+        Give the current worker thread its own connection for the block
+        
+        mysql.connector connections can't be shared between threads, so the
+        shared connection belongs to the UI thread; background code wraps its
+        execute_query calls in this. The connection may be a replica unless
+        write=True, which binds the primary; a write or locking read in a
+        read-only block raises instead of reaching a replica. Nested use
+        reuses the bound connection.
+        """
+        bound = getattr(cls._worker, 'conn', None)
+        if bound is not None:
+            if write and not cls._worker.writable:
+                raise RuntimeError("Database.worker_connection(write=True) nested in a read-only block")
+            yield bound
+            return
+        conn = cls.new_connection() if write else cls.new_read_connection()
+        cls._worker.conn, cls._worker.writable = conn, write
+        try:
+            yield conn
+        finally:
+            cls._worker.conn = None
+            try:
+                conn.close()
+            except mysql.connector.Error:
+                pass
+    
+    @classmethod
+    def _bound_connection(cls, write: bool = False):
+        """This worker thread's connection, or None on the UI thread"""
+        bound = getattr(cls._worker, 'conn', None)
+        if bound is None and threading.current_thread() is not threading.main_thread():
+            raise RuntimeError("Shared database connection used off the UI thread; "
+                               "wrap the worker in Database.worker_connection()")
+        if bound is not None and write and not cls._worker.writable:
+            raise RuntimeError("Write from a read-only worker block, whose connection may be a replica; "
+                               "use Database.worker_connection(write=True)")
+        return bound
     
     @classmethod
     def get_connection(cls):
-        """Get database connection with connection pooling"""
-        if cls._connection is None or not cls._connection.is_connected():
+        """
+        Get database connection with connection pooling
+        
+        No round trip on the hot path: the connection is only pinged after it
+        sat idle for CONNECTION_IDLE_CHECK_SECONDS. A connection that dies
+        between uses is caught by execute_query's reconnect-and-retry.
+        """
+        bound = cls._bound_connection(write=True)
+        if bound is not None:
+            return bound
+        with cls._connection_lock:
+            now = time.monotonic()
+            if cls._connection is not None and now - cls._last_used >= CONNECTION_IDLE_CHECK_SECONDS:
+                try:
+                    cls._connection.ping(reconnect=True, attempts=2, delay=0)
+                except mysql.connector.Error:
+                    cls._connection = None
+            if cls._connection is None:
+                try:
+                    cls._connection = mysql.connector.connect(
+                        **DB_CONFIG,
+                        autocommit=False,
+                        pool_name="mypool",
+                        pool_size=5,
+                        pool_reset_session=True
+                    )
+                except mysql.connector.Error as err:
+                    cls._connection = None
+                    cls.show_connection_error(err)
+            cls._last_used = now
+            return cls._connection
+    
+    @classmethod
+    def reconnect(cls):
+        """Drop the primary connection after a lost-connection error and open a new one"""
+        bound = cls._bound_connection()
+        if bound is not None:
+            bound.reconnect(attempts=2, delay=0)
+            return bound
+        with cls._connection_lock:
+            conn, cls._connection = cls._connection, None
+        if conn is not None:
+            try:
+                conn.close()
+            except mysql.connector.Error:
+                pass
+        return cls.get_connection()
+    
+    @staticmethod
+    def is_connection_lost(err) -> bool:
+        return getattr(err, 'errno', None) in LOST_CONNECTION_ERRNOS
+    
+    @classmethod
+    def keepalive(cls):
+        """
+        Ping the primary if it has been idle long enough for the server to drop it
+        
+        Runs on the keepalive thread. The idle connection is checked out while
+        it is pinged, so the UI thread never shares it; if the UI needs the
+        primary in that moment, get_connection opens a fresh one and the
+        pinged connection is closed.
+        """
+        with cls._connection_lock:
+            conn = cls._connection
+            if conn is None or time.monotonic() - cls._last_used < KEEPALIVE_SECONDS:
+                return
+            cls._connection = None
+        try:
+            conn.ping(reconnect=True, attempts=1, delay=0)
+        except mysql.connector.Error as err:
+            print(f"Keepalive warning: {err}")
+            return
+        with cls._connection_lock:
+            if cls._connection is None:
+                cls._connection, cls._last_used = conn, time.monotonic()
+                return
+        conn.close()
+    
+    @classmethod
+    def start_keepalive(cls, interval: float = KEEPALIVE_CHECK_SECONDS):
+        """Run keepalive() from a background thread, off the UI loop"""
+        if cls._keepalive_stop is not None:
+            return
+        stop = cls._keepalive_stop = Event()
+        
+        def run():
+            while not stop.wait(interval):
+                cls.keepalive()
+        
+        Thread(target=run, name="db-keepalive", daemon=True).start()
+    
+    @classmethod
+    def new_connection(cls):
+        """Open a dedicated connection for background jobs (caller closes it)"""
+        return mysql.connector.connect(**DB_CONFIG, autocommit=False)
+    
+    @classmethod
+    def new_read_connection(cls):
+        """Dedicated connection for background readers: a replica if one is usable"""
+        if not cls.reads_pinned_to_primary():
+            conn = cls.connect_replica()
+            if conn:
+                return conn
+        return cls.new_connection()
+    
+    @classmethod
+    def mark_written(cls, *tables):
+        """
+        Record a write: this session reads its own writes from the primary for
+        a while, and cached results that read the written tables are dropped
+        """
+        cls._last_write_at = time.monotonic()
+        cls.query_cache.invalidate(tables)
+    
+    @classmethod
+    def reads_pinned_to_primary(cls) -> bool:
+        return (not DB_REPLICAS or
+                (cls._last_write_at is not None and
+                 time.monotonic() - cls._last_write_at < READ_YOUR_WRITES_SECONDS))
+    
+    @classmethod
+    def watermark_margin(cls) -> int:
+        """Seconds to back delta watermarks off by, so replica lag can't skip rows"""
+        return REPLICA_MAX_LAG_SECONDS if DB_REPLICAS else 0
+    
+    @staticmethod
+    def is_read_query(query: str) -> bool:
+        words = query.split(None, 1)
+        if not words or words[0].upper() not in READ_ONLY_KEYWORDS:
+            return False
+        upper = query.upper()
+        return 'FOR UPDATE' not in upper and 'LOCK IN SHARE MODE' not in upper
+    
+    @classmethod
+    def get_read_connection(cls):
+        """Connection for a read-only query: the current replica, else the primary"""
+        bound = cls._bound_connection()
+        if bound is not None:
+            return bound
+        if cls.reads_pinned_to_primary():
+            return cls.get_connection()
+        
+        now = time.monotonic()
+        if cls._replica_connection is not None and now - cls._replica_checked_at >= REPLICA_CHECK_SECONDS:
+            cls._replica_checked_at = now
+            if not cls.replica_usable(cls._replica_connection):
+                cls.drop_replica()
+        if cls._replica_connection is None:
+            cls._replica_connection = cls.connect_replica()
+            cls._replica_checked_at = now
+        return cls._replica_connection or cls.get_connection()
+    
+    @classmethod
+    def connect_replica(cls):
+        """Connect to the first reachable replica within the lag limit, or None"""
+        now = time.monotonic()
+        for index, overrides in enumerate(DB_REPLICAS):
+            if cls._replica_down_until.get(index, 0) > now:
+                continue
             try:
-                cls._connection = mysql.connector.connect(
-                    host="localhost",
-                    user="root",
-                    password="",  # Your MySQL password here
-                    database="me_database",
-                    charset='utf8mb4',
-                    collation='utf8mb4_unicode_ci',
-                    autocommit=False,
-                    pool_name="mypool",
-                    pool_size=5,
-                    pool_reset_session=True
-                )
+                conn = mysql.connector.connect(**{**DB_CONFIG, **overrides}, autocommit=False)
+                if cls.replica_usable(conn):
+                    conn.replica_index = index
+                    return conn
+                conn.close()
             except mysql.connector.Error as err:
-                cls._connection = None
-                cls.show_connection_error(err)
-        return cls._connection
+                print(f"Replica {index} unavailable: {err}")
+            cls._replica_down_until[index] = now + REPLICA_RETRY_SECONDS
+        return None
+    
+    @classmethod
+    def replica_usable(cls, conn) -> bool:
+        """Connected and no further behind than REPLICA_MAX_LAG_SECONDS"""
+        cursor = None
+        try:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except mysql.connector.Error:
+                cursor.execute("SHOW SLAVE STATUS")     # MySQL before 8.0.22
+            status = cursor.fetchone()
+            cursor.fetchall()
+        except mysql.connector.errors.ProgrammingError:
+            return True     # no REPLICATION CLIENT privilege: lag unknown, trust the config
+        except mysql.connector.Error:
+            return False
+        finally:
+            if cursor:
+                cursor.close()
+        
+        if not status:
+            return True     # not a replica (e.g. a stand-in second instance)
+        lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+        return lag is not None and lag <= REPLICA_MAX_LAG_SECONDS
+    
+    @classmethod
+    def drop_replica(cls):
+        """Close the current replica and skip it for REPLICA_RETRY_SECONDS"""
+        conn, cls._replica_connection = cls._replica_connection, None
+        if conn is None:
+            return
+        cls._replica_down_until[conn.replica_index] = time.monotonic() + REPLICA_RETRY_SECONDS
+        try:
+            conn.close()
+        except mysql.connector.Error:
+            pass
     
     @classmethod
     def show_connection_error(cls, err):
@@ -57,9 +484,9 @@ class Database:
         try:
             # First, ensure the database exists
             conn = mysql.connector.connect(
-                host="localhost",
-                user="root",
-                password="",
+                host=DB_CONFIG['host'],
+                user=DB_CONFIG['user'],
+                password=DB_CONFIG['password'],
                 charset='utf8mb4'
             )
             cursor = conn.cursor()
@@ -82,10 +509,15 @@ class Database:
                 stock INT DEFAULT 0,
                 min_stock INT DEFAULT 5,
                 rack_location VARCHAR(100),
+                status_priority TINYINT NOT NULL DEFAULT 4,
+                catalog_version INT NOT NULL DEFAULT 0,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
                 INDEX idx_spare_name (spare_name),
-                INDEX idx_stock (stock)
+                INDEX idx_stock (stock),
+                INDEX idx_updated_at (updated_at),
+                INDEX idx_status_priority_name (status_priority, spare_name),
+                FULLTEXT INDEX ft_catalog (spare_name, material_type, product_number, rack_location)
             ) ENGINE=InnoDB CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
             """,
             """
@@ -110,6 +542,7 @@ class Database:
             """
             CREATE TABLE IF NOT EXISTS stock_usage (
                 id INT PRIMARY KEY AUTO_INCREMENT,
+                spare_id INT NULL,
                 date_time DATETIME NOT NULL,
                 item_name VARCHAR(200) NOT NULL,
                 item_number VARCHAR(50),
@@ -119,7 +552,10 @@ class Database:
                 notes TEXT,
                 issued_by VARCHAR(100),
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                INDEX idx_date_time (date_time)
+                INDEX idx_date_time (date_time),
+                INDEX idx_spare_date (spare_id, date_time),
+                CONSTRAINT fk_stock_usage_spare FOREIGN KEY (spare_id)
+                    REFERENCES spareparts(id) ON DELETE SET NULL
             ) ENGINE=InnoDB CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
             """,
             """
@@ -127,7 +563,7 @@ class Database:
                 id INT PRIMARY KEY AUTO_INCREMENT,
                 spare_id INT NOT NULL,
                 spare_name VARCHAR(200) NOT NULL,
-                adjustment_type ENUM('Correction', 'Damage', 'Loss', 'Found', 'Transfer'),
+                adjustment_type ENUM('Correction', 'Damage', 'Loss', 'Found', 'Transfer', 'Opening'),
                 old_qty INT DEFAULT 0,
                 new_qty INT DEFAULT 0,
                 difference INT DEFAULT 0,
@@ -136,7 +572,8 @@ class Database:
                 adjustment_date DATETIME,
                 notes TEXT,
                 FOREIGN KEY (spare_id) REFERENCES spareparts(id) ON DELETE CASCADE,
-                INDEX idx_adjustment_date (adjustment_date)
+                INDEX idx_adjustment_date (adjustment_date),
+                INDEX idx_spare_adjusted (spare_id, adjustment_date)
             ) ENGINE=InnoDB CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
             """,
             """
@@ -153,7 +590,8 @@ class Database:
                 created_by VARCHAR(100),
                 created_at DATETIME,
                 FOREIGN KEY (spare_id) REFERENCES spareparts(id) ON DELETE CASCADE,
-                INDEX idx_created_at (created_at)
+                INDEX idx_created_at (created_at),
+                INDEX idx_spare_created (spare_id, created_at)
             ) ENGINE=InnoDB CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci
             """
         ]
@@ -167,42 +605,216 @@ class Database:
                 except mysql.connector.Error as err:
                     if "already exists" not in str(err):
                         print(f"Table creation warning: {err}")
+            
+            # History archive tables (LIKE copies, so migrations below apply to both)
+            for sql in history_tables_sql():
+                try:
+                    cursor.execute(sql)
+                except mysql.connector.Error as err:
+                    print(f"Archive setup warning: {err}")
+            
+            # Ledgers started after these spares had stock: book opening balances once
+            book_openings = not cls.adjustment_type_exists(cursor, 'stock_adjustments', 'Opening')
+            
+            # Upgrade tables created by older versions
+            migrations = [
+                (cls.index_exists, 'spareparts', 'idx_updated_at',
+                 ["ALTER TABLE spareparts ADD INDEX idx_updated_at (updated_at)"]),
+                (cls.column_exists, 'spareparts', 'status_priority',
+                 ["ALTER TABLE spareparts ADD COLUMN status_priority TINYINT NOT NULL DEFAULT 4 AFTER rack_location",
+                  REFRESH_ALL_STATUS_PRIORITY_SQL]),
+                (cls.index_exists, 'spareparts', 'idx_status_priority_name',
+                 ["ALTER TABLE spareparts ADD INDEX idx_status_priority_name (status_priority, spare_name)"]),
+                (cls.column_exists, 'stock_usage', 'spare_id',
+                 ["ALTER TABLE stock_usage ADD COLUMN spare_id INT NULL AFTER id"]),
+                (cls.index_exists, 'stock_usage', 'idx_spare_date',
+                 ["ALTER TABLE stock_usage ADD INDEX idx_spare_date (spare_id, date_time)"]),
+                (cls.constraint_exists, 'stock_usage', 'fk_stock_usage_spare',
+                 ["ALTER TABLE stock_usage ADD CONSTRAINT fk_stock_usage_spare FOREIGN KEY (spare_id) "
+                  "REFERENCES spareparts(id) ON DELETE SET NULL"]),
+                (cls.column_exists, 'stock_usage_archive', 'spare_id',
+                 ["ALTER TABLE stock_usage_archive ADD COLUMN spare_id INT NULL AFTER id"]),
+                (cls.index_exists, 'stock_usage_archive', 'idx_spare_date',
+                 ["ALTER TABLE stock_usage_archive ADD INDEX idx_spare_date (spare_id, date_time)"]),
+                (cls.index_exists, 'stock_movements', 'idx_spare_created',
+                 ["ALTER TABLE stock_movements ADD INDEX idx_spare_created (spare_id, created_at)"]),
+                (cls.index_exists, 'stock_movements_archive', 'idx_spare_created',
+                 ["ALTER TABLE stock_movements_archive ADD INDEX idx_spare_created (spare_id, created_at)"]),
+                (cls.index_exists, 'stock_adjustments', 'idx_spare_adjusted',
+                 ["ALTER TABLE stock_adjustments ADD INDEX idx_spare_adjusted (spare_id, adjustment_date)"]),
+                (cls.column_exists, 'spareparts', 'catalog_version',
+                 ["ALTER TABLE spareparts ADD COLUMN catalog_version INT NOT NULL DEFAULT 0 AFTER status_priority"]),
+                (cls.index_exists, 'spareparts', 'ft_catalog',
+                 ["ALTER TABLE spareparts ADD FULLTEXT INDEX ft_catalog "
+                  "(spare_name, material_type, product_number, rack_location)"]),
+                (cls.adjustment_type_exists, 'stock_adjustments', 'Opening',
+                 ["ALTER TABLE stock_adjustments MODIFY adjustment_type "
+                  "ENUM('Correction', 'Damage', 'Loss', 'Found', 'Transfer', 'Opening')"]),
+            ]
+            for exists, table, name, statements in migrations:
+                try:
+                    if not exists(cursor, table, name):
+                        for sql in statements:
+                            cursor.execute(sql)
+                except mysql.connector.Error as err:
+                    print(f"Migration warning: {err}")
+            
+            # Live + archive views (after migrations, so they pick up new columns)
+            for sql in history_views_sql():
+                try:
+                    cursor.execute(sql)
+                except mysql.connector.Error as err:
+                    print(f"Archive setup warning: {err}")
             conn.commit()
             cursor.close()
+            
+            if book_openings:
+                try:
+                    print(f"Booked {book_opening_balances()} opening balances")
+                except mysql.connector.Error as err:
+                    print(f"Migration warning: {err}")
     
     @classmethod
-    def execute_query(cls, query: str, params: tuple = None, fetch: bool = False, commit: bool = True):
-        """Execute SQL query with proper error handling"""
-        result = None
-        conn = cls.get_connection()
+    def index_exists(cls, cursor, table: str, index_name: str) -> bool:
+        """Check whether an index exists in the current database"""
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        """, (table, index_name))
+        return cursor.fetchone()[0] > 0
+    
+    @classmethod
+    def constraint_exists(cls, cursor, table: str, constraint: str) -> bool:
+        """Check whether a constraint (e.g. a foreign key) exists in the current database"""
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.table_constraints
+            WHERE table_schema = DATABASE() AND table_name = %s AND constraint_name = %s
+        """, (table, constraint))
+        return cursor.fetchone()[0] > 0
+    
+    @classmethod
+    def column_exists(cls, cursor, table: str, column: str) -> bool:
+        """Check whether a column exists in the current database"""
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """, (table, column))
+        return cursor.fetchone()[0] > 0
+    
+    @classmethod
+    def adjustment_type_exists(cls, cursor, table: str, adjustment_type: str) -> bool:
+        """Check whether a table's adjustment_type ENUM allows a value"""
+        cursor.execute("""
+            SELECT column_type FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = 'adjustment_type'
+        """, (table,))
+        row = cursor.fetchone()
+        return bool(row) and f"'{adjustment_type}'" in row[0]
+    
+    @classmethod
+    def execute_query(cls, query: str, params: tuple = None, fetch: bool = False, commit: bool = True,
+                      read_only: bool = None, cache=False):
+        """
+        Execute SQL query with proper error handling
+        
+        Read-only queries (auto-detected unless read_only is given) go to a
+        replica when one is configured and usable, falling back to the primary
+        if the replica fails mid-query. cache=True (or a TTL in seconds) serves
+        repeated reads from the query cache until the TTL passes or a write
+        touches one of the tables the query reads.
+        """
+        if read_only is None:
+            read_only = fetch and cls.is_read_query(query)
         
+        if cache and read_only:
+            key = (query, tuple(params or ()))
+            rows = cls.query_cache.get(key)
+            if rows is None:
+                tables = query_tables(query)
+                generation = cls.query_cache.generation(tables)
+                rows = cls.execute_query(query, params, fetch, commit, read_only)
+                if rows is not None:
+                    ttl = QUERY_CACHE_TTL if cache is True else cache
+                    cls.query_cache.put(key, rows, tables, ttl, generation)
+            # Callers own their copy; cached rows are tuples and stay unchanged
+            return list(rows) if rows is not None else None
+        
+        conn = cls.get_read_connection() if read_only else cls.get_connection()
         if not conn:
+            return None
+        
+        if conn is not cls._replica_connection:
+            try:
+                result = cls._execute(conn, query, params, fetch, commit)
+            except mysql.connector.Error as err:
+                # Reads are idempotent: reconnect and run once more
+                if not cls.is_connection_lost(err):
+                    raise
+                conn = cls.reconnect()
+                if not read_only or not conn:
+                    raise
+                result = cls._execute(conn, query, params, fetch, commit)
+            if not read_only:
+                cls.mark_written(*query_tables(query))
             return result
-            
+        
+        try:
+            return cls._execute(conn, query, params, fetch, commit)
+        except mysql.connector.Error as err:
+            print(f"Replica read failed, using primary: {err}")
+            cls.drop_replica()
+            conn = cls.get_connection()
+            if not conn:
+                return None
+            return cls._execute(conn, query, params, fetch, commit)
+    
+    @classmethod
+    def _execute(cls, conn, query: str, params: tuple, fetch: bool, commit: bool):
+        """
+        Run one statement on a given connection
+        
+        A read only ends (or rolls back) the transaction it opened itself: if
+        the caller already has one open on this connection, it is left alone.
+        """
+        result = None
         cursor = None
+        # Reads never end a transaction they didn't start
+        owns_transaction = not fetch or not getattr(conn, 'in_transaction', False)
         try:
             cursor = conn.cursor()
             cursor.execute(query, params or ())
             if fetch:
                 result = cursor.fetchall()
-            elif commit:
+            if commit and owns_transaction:
+                # Also ends read transactions so the next read sees fresh rows
                 conn.commit()
         except mysql.connector.Error as err:
             print(f"Database error: {err}")
-            if conn:
-                conn.rollback()
+            if owns_transaction:
+                cls._rollback_quietly(conn)
             raise
         except Exception as e:
             print(f"Unexpected error: {e}")
-            if conn:
-                conn.rollback()
+            if owns_transaction:
+                cls._rollback_quietly(conn)
             raise
         finally:
             if cursor:
-                cursor.close()
+                try:
+                    cursor.close()
+                except mysql.connector.Error:
+                    pass
             
         return result
     
+    @staticmethod
+    def _rollback_quietly(conn):
+        """Roll back, ignoring errors from a connection that is already gone"""
+        try:
+            conn.rollback()
+        except mysql.connector.Error:
+            pass
+    
     @classmethod
     def execute_many(cls, query: str, params_list: list):
         """Execute multiple SQL queries"""
@@ -215,6 +827,7 @@ class Database:
             cursor = conn.cursor()
             cursor.executemany(query, params_list)
             conn.commit()
+            cls.mark_written(*query_tables(query))
         except Exception as e:
             print(f"Execute many error: {e}")
             conn.rollback()
@@ -226,9 +839,83 @@ class Database:
     @classmethod
     def close_connection(cls):
         """Close database connection"""
+        if cls._keepalive_stop is not None:
+            cls._keepalive_stop.set()
+            cls._keepalive_stop = None
         if cls._connection and cls._connection.is_connected():
             cls._connection.close()
             cls._connection = None
+        if cls._replica_connection:
+            cls._replica_connection.close()
+            cls._replica_connection = None
+
+
+# ================================================
+# CONSISTENT SNAPSHOT READS - REPORTS & EXPORTS
+# ================================================
+
+class ReportSnapshot:
+    """
+    One read-only consistent-snapshot transaction on a dedicated connection
+    
+    Every query run through it sees the database as of the moment it was
+    opened, so a report that reads spareparts, physical_quantity and the
+    ledgers in several statements never mixes before and after states of an
+    issue committed meanwhile. InnoDB serves the snapshot from undo logs
+    without locks, so issue writers are never blocked.
+    
+        with ReportSnapshot() as snapshot:
+            rows = snapshot.query("SELECT ...", params)
+    
+    begin=False leaves the snapshot unopened, so something that must come
+    strictly before it (a delta watermark) can be read first; call begin().
+    """
+    
+    def __init__(self, begin: bool = True):
+        self.conn = Database.new_read_connection()
+        try:
+            self.cursor = self.conn.cursor()
+            # The snapshot only holds across statements under REPEATABLE READ
+            self.cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            if begin:
+                self.begin()
+        except mysql.connector.Error:
+            self.conn.close()
+            raise
+    
+    def begin(self):
+        """Open the snapshot (implicitly ending any earlier read on this connection)"""
+        self.cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY")
+    
+    def query(self, query: str, params: tuple = None) -> list:
+        """Run one read inside the snapshot and return all rows"""
+        self.cursor.execute(query, params or ())
+        return self.cursor.fetchall()
+    
+    def close(self):
+        """End the snapshot (releases its undo history) and the connection"""
+        try:
+            self.cursor.close()
+            self.conn.commit()
+        except mysql.connector.Error:
+            pass
+        finally:
+            self.conn.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+@contextmanager
+def report_snapshot(snapshot: ReportSnapshot = None):
+    """Share the caller's snapshot, or open one for the duration of the block"""
+    if snapshot is not None:
+        yield snapshot
+        return
+    with ReportSnapshot() as snapshot:
+        yield snapshot
 
 
 # ================================================
@@ -272,21 +959,47 @@ def format_variance(value: int) -> str:
         return str(value)
     return "0"
 
-def get_status_info(sys_qty: int, phy_qty: int, variance: int, min_stock: int, pqt_status: str) -> Tuple[str, tuple]:
-    """Get status icon and tags based on quantities"""
+# Status codes, shared by get_status_info, the batch classifier and STATUS_CODE_SQL
+STATUS_MISSING, STATUS_VARIANCE, STATUS_UNVERIFIED, STATUS_LOW, STATUS_MATCH, STATUS_NO_CHECK = range(6)
+STATUS_ICONS = ("🔴", "⚠️", "❓", "🟡", "✅", "📊")
+STATUS_TAGS = (('missing',), ('variance',), ('variance', 'no_check'),
+               ('low_stock',), ('match',), ('no_check',))
+
+def status_code(sys_qty: int, phy_qty: int, variance: int, min_stock: int, verified: bool) -> int:
+    """Get status code based on quantities"""
     if sys_qty == 0:
-        return "🔴", ('missing',)
+        return STATUS_MISSING
     elif variance != 0:
-        if pqt_status == 'Verified':
-            return "⚠️", ('variance',)
-        else:
-            return "❓", ('variance', 'no_check')
+        return STATUS_VARIANCE if verified else STATUS_UNVERIFIED
     elif sys_qty <= min_stock:
-        return "🟡", ('low_stock',)
-    elif phy_qty == sys_qty or pqt_status == 'Verified':
-        return "✅", ('match',)
+        return STATUS_LOW
+    elif phy_qty == sys_qty or verified:
+        return STATUS_MATCH
     else:
-        return "📊", ('no_check',)
+        return STATUS_NO_CHECK
+
+def get_status_info(sys_qty: int, phy_qty: int, variance: int, min_stock: int, pqt_status: str) -> Tuple[str, tuple]:
+    """Get status icon and tags based on quantities"""
+    code = status_code(sys_qty, phy_qty, variance, min_stock, pqt_status == 'Verified')
+    return STATUS_ICONS[code], STATUS_TAGS[code]
+
+def load_ui_prefs() -> dict:
+    """Load saved UI preferences (empty dict if none)"""
+    try:
+        with open(PREFS_PATH, 'r', encoding='utf-8') as f:
+            prefs = json.load(f)
+        return prefs if isinstance(prefs, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def save_ui_prefs(prefs: dict):
+    """Save UI preferences"""
+    try:
+        os.makedirs(APP_DATA_DIR, exist_ok=True)
+        with open(PREFS_PATH, 'w', encoding='utf-8') as f:
+            json.dump(prefs, f, indent=2)
+    except OSError as e:
+        print(f"Preferences warning: {e}")
 
 def validate_integer(value: str, field_name: str = "Quantity") -> Tuple[bool, int, str]:
     """Validate integer input"""
@@ -303,1295 +1016,5105 @@ def validate_integer(value: str, field_name: str = "Quantity") -> Tuple[bool, in
 
 
 # ================================================
-# LOADING SCREEN - UNTUK STARTUP YANG LEBIH SMOOTH
+# SEARCH INDEX - TYPE-AHEAD PICKER
 # ================================================
 
-class LoadingScreen:
-    """Loading screen untuk startup aplikasi"""
+class PrefixIndex:
+    """Sorted prefix index over spare names, product numbers and material"""
+    
+    DEFAULT_LIMIT = 50
     
     def __init__(self):
-        self.root = tk.Tk()
-        self.root.title("Loading...")
-        self.root.geometry("400x250")
-        self.root.resizable(False, False)
-        self.root.configure(bg='#2c3e50')
-        self.root.overrideredirect(True)
-        
-        # Create UI first
-        self.create_ui()
-        
-        # Center window after creation
-        self.center_window()
-        
-    def center_window(self):
-        """Center window on screen"""
-        center_window_on_screen(self.root, 400, 250)
+        self._keys = []     # sorted list of (key, spare_name)
+        self._entries = {}  # spare_name -> set of keys
     
-    def create_ui(self):
-        """Create loading UI"""
-        # Icon
-        tk.Label(self.root,
-                text="📊",
-                font=('Segoe UI', 48),
-                bg='#2c3e50',
-                fg='white').pack(pady=(30, 10))
-        
-        # Title
-        tk.Label(self.root,
-                text="Sparepart Management",
-                font=('Segoe UI', 16, 'bold'),
-                bg='#2c3e50',
-                fg='white').pack()
+    def __len__(self):
+        return len(self._entries)
+    
+    def __contains__(self, name):
+        return name in self._entries
+    
+    @staticmethod
+    def _make_keys(name: str, product_no: str = None, material: str = None) -> set:
+        """Build lookup keys: full name, each word of the name, product no, material"""
+        keys = {name.lower()}
+        keys.update(word for word in name.lower().split() if word)
+        for field in (product_no, material):
+            if field:
+                keys.add(field.lower())
+        return keys
+    
+    @classmethod
+    def build(cls, rows) -> 'PrefixIndex':
+        """Build index once from (spare_name, product_number, material_type) rows"""
+        index = cls()
+        pairs = []
+        for name, product_no, material in rows:
+            if not name:
+                continue
+            keys = cls._make_keys(name, product_no, material)
+            index._entries.setdefault(name, set()).update(keys)
+            pairs.extend((key, name) for key in keys)
+        index._keys = sorted(set(pairs))
+        return index
+    
+    def add(self, name: str, product_no: str = None, material: str = None):
+        """Add or refresh a single item incrementally"""
+        if not name:
+            return
+        self.remove(name)
+        keys = self._make_keys(name, product_no, material)
+        for key in keys:
+            insort(self._keys, (key, name))
+        self._entries[name] = keys
+    
+    def remove(self, name: str):
+        """Remove a single item incrementally"""
+        keys = self._entries.pop(name, None)
+        if not keys:
+            return
+        for key in keys:
+            pos = bisect_left(self._keys, (key, name))
+            if pos < len(self._keys) and self._keys[pos] == (key, name):
+                del self._keys[pos]
+    
+    def search(self, prefix: str, limit: int = None) -> List[str]:
+        """Return up to `limit` spare names with a key starting with prefix"""
+        limit = limit or self.DEFAULT_LIMIT
+        prefix = prefix.strip().lower()
         
-        tk.Label(self.root,
-                text="with PQT System",
-                font=('Segoe UI', 12),
-                bg='#2c3e50',
-                fg='#bdc3c7').pack()
+        if not prefix:
+            return sorted(self._entries)[:limit]
         
-        # Status label
-        self.status_label = tk.Label(self.root,
-                                     text="Initializing...",
-                                     font=('Segoe UI', 10),
-                                     bg='#2c3e50',
-                                     fg='#ecf0f1')
-        self.status_label.pack(pady=(20, 10))
+        matches = []
+        seen = set()
+        pos = bisect_left(self._keys, (prefix,))
+        while pos < len(self._keys) and len(matches) < limit:
+            key, name = self._keys[pos]
+            if not key.startswith(prefix):
+                break
+            if name not in seen:
+                seen.add(name)
+                matches.append(name)
+            pos += 1
         
-        # Progress bar
-        self.progress = ttk.Progressbar(self.root,
-                                       length=300,
-                                       mode='indeterminate')
-        self.progress.pack(pady=(0, 20))
-        self.progress.start(10)
-    
-    def update_status(self, text):
-        """Update status text"""
-        self.status_label.config(text=text)
-        self.root.update()
-    
-    def close(self):
-        """Close loading screen"""
-        self.progress.stop()
-        self.root.destroy()
+        # Names that start with the prefix first, then the rest alphabetically
+        matches.sort(key=lambda n: (not n.lower().startswith(prefix), n.lower()))
+        return matches
 
 
 # ================================================
-# MAIN APPLICATION - OPTIMIZED
+# PARTS DATA - QUERIES & DELTA RECONCILE
 # ================================================
 
-class SparepartApp:
+# Server-side form of status_code() over spareparts s LEFT JOIN physical_quantity p
+STATUS_CODE_SQL = """
+    CASE
+        WHEN s.stock = 0 THEN 0
+        WHEN COALESCE(p.variance, 0) != 0 THEN
+            CASE WHEN p.status = 'Verified' THEN 1 ELSE 2 END
+        WHEN s.stock <= s.min_stock THEN 3
+        WHEN COALESCE(p.physical_qty, s.stock) = s.stock OR p.status = 'Verified' THEN 4
+        ELSE 5
+    END
+"""
+
+PARTS_COLUMNS = f"""
+    s.id,
+    s.spare_name,
+    s.material_type,
+    s.stock as system_qty,
+    COALESCE(p.physical_qty, s.stock) as physical_qty,
+    COALESCE(p.variance, 0) as variance,
+    s.rack_location,
+    COALESCE(DATE_FORMAT(p.check_date, '%Y-%m-%d'), 'Never') as last_check,
+    s.min_stock,
+    COALESCE(p.status, 'Pending') as pqt_status,
+    {STATUS_CODE_SQL} as status_code
+"""
+
+# Default list ordering. It depends on physical_quantity, so it can't be a
+# generated column; write paths keep spareparts.status_priority current instead
+STATUS_PRIORITY_SQL = """
+    CASE 
+        WHEN s.stock = 0 THEN 1
+        WHEN COALESCE(p.variance, 0) != 0 THEN 2
+        WHEN s.stock <= s.min_stock AND s.stock > 0 THEN 3
+        ELSE 4
+    END
+"""
+
+REFRESH_STATUS_PRIORITY_SQL = f"""
+    UPDATE spareparts s
+    LEFT JOIN physical_quantity p ON s.id = p.spare_id
+    SET s.status_priority = {STATUS_PRIORITY_SQL}
+    WHERE s.id IN ({{ids}})
+"""
+
+REFRESH_ALL_STATUS_PRIORITY_SQL = f"""
+    UPDATE spareparts s
+    LEFT JOIN physical_quantity p ON s.id = p.spare_id
+    SET s.status_priority = {STATUS_PRIORITY_SQL}
+"""
+
+# First page and keyset continuation, both served in idx_status_priority_name order
+PARTS_PAGE_SIZE = 200
+
+PARTS_FIRST_PAGE_QUERY = f"""
+    SELECT {PARTS_COLUMNS}, s.status_priority
+    FROM spareparts s
+    LEFT JOIN physical_quantity p ON s.id = p.spare_id
+    ORDER BY s.status_priority, s.spare_name, s.id
+    LIMIT %s
+"""
+
+PARTS_AFTER_QUERY = f"""
+    SELECT {PARTS_COLUMNS}, s.status_priority
+    FROM spareparts s
+    LEFT JOIN physical_quantity p ON s.id = p.spare_id
+    WHERE s.status_priority > %s
+       OR (s.status_priority = %s AND (s.spare_name > %s OR (s.spare_name = %s AND s.id > %s)))
+    ORDER BY s.status_priority, s.spare_name, s.id
+"""
+
+# product_number rides along (after status_code) for the picker's prefix index
+PARTS_DELTA_QUERY = f"""
+    SELECT {PARTS_COLUMNS}, s.product_number
+    FROM spareparts s
+    LEFT JOIN physical_quantity p ON s.id = p.spare_id
+    WHERE s.id IN (
+        SELECT id FROM spareparts WHERE updated_at >= %s
+        UNION
+        SELECT spare_id FROM physical_quantity
+        WHERE check_date >= %s OR adjustment_date >= %s
+    )
+"""
+
+# Issue form lookup for the selected item
+ITEM_LOOKUP_QUERY = """
+    SELECT 
+        s.id,
+        s.product_number,
+        s.material_type,
+        s.stock as system_qty,
+        COALESCE(p.physical_qty, s.stock) as physical_qty,
+        COALESCE(p.variance, 0) as variance,
+        s.rack_location,
+        s.min_stock
+    FROM spareparts s
+    LEFT JOIN physical_quantity p ON s.id = p.spare_id
+    WHERE s.spare_name = %s
+"""
+
+# Short TTL: other stations' issues show up within seconds, ours invalidate at once
+ITEM_LOOKUP_CACHE_TTL = 5
+
+def lookup_item(item_name: str) -> Optional[tuple]:
+    """ITEM_LOOKUP_QUERY row for one spare name, or None"""
+    result = Database.execute_query(ITEM_LOOKUP_QUERY, (item_name,), fetch=True, cache=ITEM_LOOKUP_CACHE_TTL)
+    return result[0] if result else None
+
+def status_priority(sys_qty: int, variance: int, min_stock: int) -> int:
+    """Default list ordering, same rules as STATUS_PRIORITY_SQL"""
+    if sys_qty == 0:
+        return 1
+    elif variance != 0:
+        return 2
+    elif sys_qty <= min_stock:
+        return 3
+    return 4
+
+def refresh_status_priority(cursor, spare_ids):
+    """Recompute status_priority for the given spares inside the caller's transaction"""
+    spare_ids = list(spare_ids)
+    if spare_ids:
+        placeholders = ", ".join(["%s"] * len(spare_ids))
+        cursor.execute(REFRESH_STATUS_PRIORITY_SQL.format(ids=placeholders), tuple(spare_ids))
+
+def fetch_parts_snapshot(on_first_page=None) -> Tuple['PartsTable', Optional[datetime]]:
+    """
+    Load the full parts list and the server time it was taken at
+    
+    First page and continuation share one consistent snapshot, so the list
+    (and anything exported from it) is a single point in time.
+    """
+    try:
+        snapshot = ReportSnapshot(begin=False)
+    except mysql.connector.Error as err:
+        print(f"Parts snapshot warning: {err}")
+        return PartsTable(), None
+    
+    with snapshot:
+        # Watermark strictly before the snapshot opens: anything committed after
+        # it is either in the snapshot or re-fetched by the next delta
+        result = snapshot.query("SELECT NOW() - INTERVAL %s SECOND", (Database.watermark_margin(),))
+        watermark = result[0][0] if result else None
+        snapshot.begin()
+        
+        rows = snapshot.query(PARTS_FIRST_PAGE_QUERY, (PARTS_PAGE_SIZE,))
+        if on_first_page and rows:
+            on_first_page(PartsTable.from_rows(rows))
+        
+        if len(rows) == PARTS_PAGE_SIZE:
+            last = rows[-1]
+            priority, name, spare_id = last[-1], last[1], last[0]
+            rows += snapshot.query(PARTS_AFTER_QUERY, (priority, priority, name, name, spare_id))
+    return PartsTable.from_rows(rows), watermark
+
+def fetch_parts_delta(since: datetime, check_deleted: bool = True) -> Tuple[list, Optional[set], Optional[datetime]]:
+    """Load only rows changed since the watermark, plus the ids still present"""
+    result = Database.execute_query("SELECT NOW() - INTERVAL %s SECOND",
+                                    (Database.watermark_margin(),), fetch=True)
+    watermark = result[0][0] if result else None
+    changed = Database.execute_query(PARTS_DELTA_QUERY, (since, since, since), fetch=True) or []
+    live_ids = None
+    if check_deleted:
+        live_ids = {row[0] for row in Database.execute_query("SELECT id FROM spareparts", fetch=True) or []}
+    return changed, live_ids, watermark
+
+def merge_parts_delta(table: 'PartsTable', changed, live_ids: Optional[set]) -> 'PartsTable':
+    """Apply changed rows to a snapshot, drop deleted spares, restore default order"""
+    changed_ids = {row[0] for row in changed}
+    keep = [i for i, spare_id in enumerate(table.ids)
+            if (live_ids is None or spare_id in live_ids) and spare_id not in changed_ids]
+    merged = table.take(keep)
+    for row in changed:
+        merged.append(row)
+    return merged.take(merged.default_order())
+
+
+# ================================================
+# CATALOG SEARCH - FULLTEXT
+# ================================================
+
+SEARCH_LIMIT = 200          # top hits returned to the search box
+SEARCH_MIN_TOKEN = 3        # innodb_ft_min_token_size; shorter words aren't indexed
+SEARCH_CACHE_TTL = 30
+FULLTEXT_MISSING_ERRNO = 1191   # ER_FT_MATCHING_KEY_NOT_FOUND
+
+SEARCH_MATCH_SQL = "MATCH(s.spare_name, s.material_type, s.product_number, s.rack_location) AGAINST (%s IN BOOLEAN MODE)"
+
+CATALOG_SEARCH_QUERY = f"""
+    SELECT s.id, {SEARCH_MATCH_SQL} AS score
+    FROM spareparts s
+    WHERE {SEARCH_MATCH_SQL} {{short_filters}}
+    ORDER BY (s.product_number = %s) DESC, score DESC, s.spare_name
+    LIMIT %s
+"""
+
+SHORT_TOKEN_FILTER_SQL = "AND CONCAT_WS(' ', s.spare_name, s.material_type, s.product_number, s.rack_location) LIKE %s"
+
+def fulltext_terms(term: str) -> Tuple[str, List[str]]:
+    """
+    Split search text into a boolean-mode expression and the leftover short words
+    
+    Every indexed word is required and prefix-matched ("+bear* +6204*"), so
+    results narrow as the user types. Operators typed by the user are dropped.
+    """
+    words = re.findall(r'\w+', term.lower())
+    indexed = [word for word in words if len(word) >= SEARCH_MIN_TOKEN]
+    short = [word for word in words if len(word) < SEARCH_MIN_TOKEN]
+    return " ".join(f"+{word}*" for word in indexed), short
+
+def search_catalog(term: str, limit: int = SEARCH_LIMIT) -> Optional[List[int]]:
+    """
+    Top spare ids for the search text, most relevant first
+    
+    An exact product_number match ranks first, then FULLTEXT relevance.
+    Returns None when the text has no indexable word, so the caller keeps
+    its local substring filter.
+    """
+    expression, short = fulltext_terms(term)
+    if not expression:
+        return None
+    query = CATALOG_SEARCH_QUERY.format(short_filters=" ".join([SHORT_TOKEN_FILTER_SQL] * len(short)))
+    params = (expression, expression, *(f"%{word}%" for word in short), term.strip(), limit)
+    rows = Database.execute_query(query, params, fetch=True, read_only=True, cache=SEARCH_CACHE_TTL)
+    if rows is None:
+        raise RuntimeError("Catalog search failed")
+    return [row[0] for row in rows]
+
+
+# ================================================
+# PARTS TABLE - COLUMNAR SNAPSHOT
+# ================================================
+
+class StringDictionary:
+    """Dictionary encoding for repeated strings (material, rack, status, dates)"""
+    
+    __slots__ = ('values', 'codes')
+    
+    def __init__(self, values=None):
+        self.values = []
+        self.codes = {}
+        for value in values or ():
+            self.encode(value)
+    
+    def encode(self, value) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+
+class PartRow:
+    """Lightweight view of one row in a PartsTable"""
+    
+    __slots__ = ('table', 'index')
+    
+    def __init__(self, table: 'PartsTable', index: int):
+        self.table = table
+        self.index = index
+    
+    @property
+    def spare_id(self) -> int:
+        return self.table.ids[self.index]
+    
+    @property
+    def name(self) -> str:
+        return self.table.names[self.index]
+    
+    @property
+    def material(self) -> Optional[str]:
+        return self.table.material.values[self.table.material_codes[self.index]]
+    
+    @property
+    def sys_qty(self) -> int:
+        return self.table.sys_qty[self.index]
+    
+    @property
+    def phy_qty(self) -> int:
+        return self.table.phy_qty[self.index]
+    
+    @property
+    def variance(self) -> int:
+        return self.table.variance[self.index]
+    
+    @property
+    def rack(self) -> Optional[str]:
+        return self.table.rack.values[self.table.rack_codes[self.index]]
+    
+    @property
+    def last_check(self) -> str:
+        return self.table.last_check.values[self.table.last_check_codes[self.index]]
+    
+    @property
+    def min_stock(self) -> int:
+        return self.table.min_stock[self.index]
+    
+    @property
+    def pqt_status(self) -> str:
+        return self.table.pqt_status.values[self.table.pqt_status_codes[self.index]]
+    
+    def __iter__(self):
+        """Unpack like the original 10-field query row"""
+        return iter(self.table.row_tuple(self.index))
+
+
+class PartsTable:
+    """
+    Columnar in-memory parts snapshot
+    
+    Numbers live in typed arrays, repeated strings are dictionary-encoded,
+    so a 1M-row catalog costs a fraction of a list of 10-field tuples.
+    """
+    
+    INT_COLUMNS = ('ids', 'sys_qty', 'phy_qty', 'variance', 'min_stock')
+    CODE_COLUMNS = ('material', 'rack', 'last_check', 'pqt_status')
+    
+    def __init__(self):
+        self.ids = array('i')
+        self.sys_qty = array('i')
+        self.phy_qty = array('i')
+        self.variance = array('i')
+        self.min_stock = array('i')
+        self.names = []
+        
+        self.material = StringDictionary()
+        self.rack = StringDictionary()
+        self.last_check = StringDictionary()
+        self.pqt_status = StringDictionary()
+        self.material_codes = array('i')
+        self.rack_codes = array('i')
+        self.last_check_codes = array('i')
+        self.pqt_status_codes = array('i')
+        self.status_codes = array('b')
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def __iter__(self):
+        return (PartRow(self, i) for i in range(len(self.ids)))
+    
+    def row(self, index: int) -> PartRow:
+        return PartRow(self, index)
+    
+    @classmethod
+    def from_rows(cls, rows) -> 'PartsTable':
+        """Build from PARTS_COLUMNS rows (status_code optional)"""
+        table = cls()
+        for row in rows:
+            table.append(row)
+        return table
+    
+    def append(self, row):
+        """Append one query row, using the server-side status code when present"""
+        spare_id, name, material, sys_qty, phy_qty, variance, rack, last_check, min_stock, pqt_status = row[:10]
+        self.ids.append(spare_id)
+        self.names.append(name)
+        self.material_codes.append(self.material.encode(material))
+        self.sys_qty.append(sys_qty or 0)
+        self.phy_qty.append(phy_qty or 0)
+        self.variance.append(variance or 0)
+        self.rack_codes.append(self.rack.encode(rack))
+        self.last_check_codes.append(self.last_check.encode(last_check))
+        self.min_stock.append(min_stock or 0)
+        self.pqt_status_codes.append(self.pqt_status.encode(pqt_status))
+        if len(row) > 10:
+            self.status_codes.append(row[10])
+        else:
+            self.status_codes.append(status_code(sys_qty or 0, phy_qty or 0, variance or 0,
+                                                 min_stock or 0, pqt_status == 'Verified'))
+    
+    def row_tuple(self, i: int) -> tuple:
+        """Materialize one row as the original 10-field tuple"""
+        return (self.ids[i], self.names[i],
+                self.material.values[self.material_codes[i]],
+                self.sys_qty[i], self.phy_qty[i], self.variance[i],
+                self.rack.values[self.rack_codes[i]],
+                self.last_check.values[self.last_check_codes[i]],
+                self.min_stock[i],
+                self.pqt_status.values[self.pqt_status_codes[i]])
+    
+    def take(self, indices) -> 'PartsTable':
+        """New table with the given rows, in the given order (dictionaries are shared)"""
+        table = PartsTable()
+        for column in self.INT_COLUMNS:
+            source = getattr(self, column)
+            setattr(table, column, array('i', [source[i] for i in indices]))
+        names = self.names
+        table.names = [names[i] for i in indices]
+        for column in self.CODE_COLUMNS:
+            source = getattr(self, column + '_codes')
+            setattr(table, column + '_codes', array('i', [source[i] for i in indices]))
+            setattr(table, column, getattr(self, column))
+        status_codes = self.status_codes
+        table.status_codes = array('b', [status_codes[i] for i in indices])
+        return table
+    
+    def default_order(self) -> List[int]:
+        """Row indices in default list order (status priority, then name)"""
+        sys_qty, variance, min_stock, names = self.sys_qty, self.variance, self.min_stock, self.names
+        return sorted(range(len(self.ids)),
+                      key=lambda i: (status_priority(sys_qty[i], variance[i], min_stock[i]),
+                                     (names[i] or "").lower()))
+
+
+# ================================================
+# STATUS CLASSIFICATION - BATCH
+# ================================================
+
+def classify_statuses(table: PartsTable) -> array:
+    """Status codes for every row in one pass (NumPy when available)"""
+    verified_code = table.pqt_status.codes.get('Verified', -1)
+    
+    if np is not None:
+        sys_qty = np.frombuffer(table.sys_qty, dtype=np.int32)
+        phy_qty = np.frombuffer(table.phy_qty, dtype=np.int32)
+        variance = np.frombuffer(table.variance, dtype=np.int32)
+        min_stock = np.frombuffer(table.min_stock, dtype=np.int32)
+        verified = np.frombuffer(table.pqt_status_codes, dtype=np.int32) == verified_code
+        
+        # Conditions in get_status_info order; the first match wins
+        codes = np.select(
+            [sys_qty == 0,
+             (variance != 0) & verified,
+             variance != 0,
+             sys_qty <= min_stock,
+             (phy_qty == sys_qty) | verified],
+            [STATUS_MISSING, STATUS_VARIANCE, STATUS_UNVERIFIED, STATUS_LOW, STATUS_MATCH],
+            default=STATUS_NO_CHECK)
+        return array('b', codes.astype(np.int8).tobytes())
+    
+    return array('b', [status_code(sys_qty, phy_qty, variance, min_stock, pqt == verified_code)
+                       for sys_qty, phy_qty, variance, min_stock, pqt
+                       in zip(table.sys_qty, table.phy_qty, table.variance,
+                              table.min_stock, table.pqt_status_codes)])
+
+def build_sort_keys(table: PartsTable, column: str):
+    """Per-row sort keys for one column; dictionary columns sort by value rank"""
+    if column == 'name':
+        return [(name or "").lower() for name in table.names]
+    if column in ('sys_qty', 'phy_qty', 'variance'):
+        return getattr(table, column)
+    
+    # Rank each distinct value once, then map rows through their codes
+    dictionary = getattr(table, column)
+    
+    def value_key(code):
+        value = dictionary.values[code]
+        if column == 'last_check' and value == 'Never':
+            value = ""
+        return (value is None, (value or "").lower())
+    
+    rank = [0] * len(dictionary.values)
+    for position, code in enumerate(sorted(range(len(dictionary.values)), key=value_key)):
+        rank[code] = position
+    return array('i', [rank[code] for code in getattr(table, column + '_codes')])
+
+
+# ================================================
+# STOCK ALERTS - INCREMENTAL INDEX
+# ================================================
+
+class StockAlertIndex:
+    """Maintained set of spares at or below min_stock, updated per changed row"""
+    
+    REORDER_FACTOR = 2  # suggest restocking up to min_stock x this
+    
+    def __init__(self):
+        self.alerts = {}  # spare_id -> (spare_name, stock, min_stock)
+    
+    def __len__(self):
+        return len(self.alerts)
+    
+    @classmethod
+    def build(cls, table: PartsTable) -> 'StockAlertIndex':
+        """Full scan, only on a full (re)load"""
+        index = cls()
+        for i, (stock, min_stock) in enumerate(zip(table.sys_qty, table.min_stock)):
+            if stock <= min_stock:
+                index.alerts[table.ids[i]] = (table.names[i], stock, min_stock)
+        return index
+    
+    def update(self, spare_id: int, name: str, stock: int, min_stock: int) -> bool:
+        """Apply one spare's current stock; True if the alert set changed"""
+        if stock <= min_stock:
+            entry = (name, stock, min_stock)
+            if self.alerts.get(spare_id) == entry:
+                return False
+            self.alerts[spare_id] = entry
+            return True
+        return self.alerts.pop(spare_id, None) is not None
+    
+    def apply_rows(self, rows, live_ids: Optional[set] = None) -> bool:
+        """Apply changed PARTS_COLUMNS rows (and deletions); O(changed rows)"""
+        changed = False
+        for row in rows:
+            changed |= self.update(row[0], row[1], row[3], row[8])
+        if live_ids is not None:
+            for spare_id in [sid for sid in self.alerts if sid not in live_ids]:
+                del self.alerts[spare_id]
+                changed = True
+        return changed
+    
+    def out_of_stock_count(self) -> int:
+        return sum(1 for _, stock, _ in self.alerts.values() if stock <= 0)
+    
+    def sorted_alerts(self) -> List[tuple]:
+        """(spare_id, name, stock, min_stock), out of stock first, then biggest shortfall"""
+        return sorted(((spare_id, name, stock, min_stock)
+                       for spare_id, (name, stock, min_stock) in self.alerts.items()),
+                      key=lambda a: (a[2] > 0, a[2] - a[3], (a[1] or "").lower()))
+    
+    def reorder_list(self) -> List[tuple]:
+        """(spare_id, name, stock, min_stock, suggested order qty)"""
+        return [(spare_id, name, stock, min_stock,
+                 max(min_stock * self.REORDER_FACTOR - stock, 1))
+                for spare_id, name, stock, min_stock in self.sorted_alerts()]
+
+
+# ================================================
+# SNAPSHOT CACHE - INSTANT WARM START
+# ================================================
+
+class SnapshotCache:
+    """
+    Last parts snapshot on disk in a compact, memory-mappable format
+    
+    Layout (native byte order, recorded in the header), mirroring PartsTable:
+        header        magic, version, byte order, watermark, row count
+        int columns   ids, sys_qty, phy_qty, variance, min_stock as int32
+        names         (rows + 1) uint32 offsets, utf-8 blob padded to 4 bytes
+        code columns  per dictionary column: int32 codes, value count,
+                      offsets and blob of the dictionary (None stored as '\\0')
+    """
+    
+    MAGIC = b'MESN'
+    VERSION = 2
+    HEADER = struct.Struct('<4sHH19sxI')
+    COUNT = struct.Struct('<I')
+    WATERMARK_FORMAT = "%Y-%m-%d %H:%M:%S"
+    NULL = '\0'
+    PATH = os.path.join(APP_DATA_DIR, 'parts_snapshot.bin')
+    
+    @classmethod
+    def _byte_order(cls) -> int:
+        return 1 if sys.byteorder == 'little' else 2
+    
+    @classmethod
+    def _pack_strings(cls, values) -> List[bytes]:
+        """Offsets + blob chunks for a list of strings"""
+        encoded = [(cls.NULL if value is None else value).encode('utf-8') for value in values]
+        offsets = array('I', [0])
+        total = 0
+        for value in encoded:
+            total += len(value)
+            offsets.append(total)
+        return [offsets.tobytes(), b"".join(encoded) + b"\0" * (-total % 4)]
+    
+    @classmethod
+    def save(cls, table: PartsTable, watermark: datetime, path: str = None):
+        """Write snapshot atomically (temp file + rename)"""
+        path = path or cls.PATH
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        chunks = [getattr(table, column).tobytes() for column in PartsTable.INT_COLUMNS]
+        chunks.extend(cls._pack_strings(table.names))
+        for column in PartsTable.CODE_COLUMNS:
+            dictionary = getattr(table, column)
+            chunks.append(getattr(table, column + '_codes').tobytes())
+            chunks.append(cls.COUNT.pack(len(dictionary.values)))
+            chunks.extend(cls._pack_strings(dictionary.values))
+        
+        header = cls.HEADER.pack(cls.MAGIC, cls.VERSION, cls._byte_order(),
+                                 watermark.strftime(cls.WATERMARK_FORMAT).encode('ascii'),
+                                 len(table))
+        
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path: str = None) -> Optional[Tuple[PartsTable, datetime]]:
+        """Return (table, watermark), or None if missing, outdated or corrupt"""
+        path = path or cls.PATH
+        try:
+            with open(path, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    return cls._decode(mm)
+        except (OSError, ValueError, struct.error, UnicodeDecodeError, IndexError):
+            return None
+    
+    @classmethod
+    def _decode(cls, mm) -> Optional[Tuple[PartsTable, datetime]]:
+        """Decode a mapped snapshot file straight into table columns"""
+        magic, version, byte_order, watermark, count = cls.HEADER.unpack_from(mm, 0)
+        if magic != cls.MAGIC or version != cls.VERSION or byte_order != cls._byte_order():
+            return None
+        
+        offset = cls.HEADER.size
+        
+        def read_ints(n, typecode='i'):
+            nonlocal offset
+            values = array(typecode)
+            values.frombytes(mm[offset:offset + n * values.itemsize])
+            offset += n * values.itemsize
+            if len(values) != n:
+                raise ValueError("truncated snapshot")
+            return values
+        
+        def read_strings(n):
+            nonlocal offset
+            bounds = read_ints(n + 1, 'I')
+            blob = mm[offset:offset + bounds[-1]]
+            offset += bounds[-1] + (-bounds[-1] % 4)
+            values = [blob[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(n)]
+            return [None if value == cls.NULL else value for value in values]
+        
+        table = PartsTable()
+        for column in PartsTable.INT_COLUMNS:
+            setattr(table, column, read_ints(count))
+        table.names = read_strings(count)
+        for column in PartsTable.CODE_COLUMNS:
+            setattr(table, column + '_codes', read_ints(count))
+            size = cls.COUNT.unpack_from(mm, offset)[0]
+            offset += cls.COUNT.size
+            setattr(table, column, StringDictionary(read_strings(size)))
+        table.status_codes = classify_statuses(table)
+        
+        return table, datetime.strptime(watermark.decode('ascii'), cls.WATERMARK_FORMAT)
+
+
+# ================================================
+# HISTORY ARCHIVE - LIVE + ARCHIVED LEDGERS
+# ================================================
+
+# Append-only ledgers: live table -> (archive table, time column)
+# Native partitioning can't be used here: InnoDB partitioned tables can't have
+# foreign keys, and every unique key would need the date column. Old months are
+# moved to LIKE-copied archive tables instead (same columns and indexes, no FKs).
+HISTORY_TABLES = {
+    'stock_usage': ('stock_usage_archive', 'date_time'),
+    'stock_movements': ('stock_movements_archive', 'created_at'),
+}
+
+VIEW_TABLES.update({f"{table}_all": (table, archive) for table, (archive, _) in HISTORY_TABLES.items()})
+
+ARCHIVE_AFTER_MONTHS = 12       # keep this many whole months in the live tables
+ARCHIVE_CHUNK_SIZE = 1000       # rows per archive transaction
+ARCHIVE_PAUSE_SECONDS = 0.2     # breathing room for writers between chunks
+
+def history_tables_sql() -> List[str]:
+    """DDL for the archive tables"""
+    return [f"CREATE TABLE IF NOT EXISTS {archive} LIKE {table}"
+            for table, (archive, _) in HISTORY_TABLES.items()]
+
+def history_views_sql() -> List[str]:
+    """DDL for the live + archive views"""
+    return [f"CREATE OR REPLACE VIEW {table}_all AS "
+            f"SELECT * FROM {table} UNION ALL SELECT * FROM {archive}"
+            for table, (archive, _) in HISTORY_TABLES.items()]
+
+def history_query(template: str, table: str) -> str:
+    """
+    Expand a query written against {t} to live UNION ALL archive
+    
+    Filters are repeated in each branch so both use their indexes (a
+    UNION view can't always push them down); repeat the params to match.
+    """
+    archive = HISTORY_TABLES[table][0]
+    return f"{template.format(t=table)}\n    UNION ALL\n{template.format(t=archive)}"
+
+def archive_cutoff(months: int = ARCHIVE_AFTER_MONTHS, today: datetime = None) -> datetime:
+    """First day of the oldest month kept live"""
+    today = today or datetime.now()
+    month_index = today.year * 12 + (today.month - 1) - months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+class BackgroundJob(ABC):
+    """Chunked maintenance job on its own thread and connection"""
+    
+    def __init__(self, chunk_size: int, pause: float):
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.stop_event = Event()
+        self.thread = None
+    
+    def start(self):
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        self.stop_event.set()
+    
+    @abstractmethod
+    def run(self):
+        """The job body; runs on the job's thread and should honour stop_event"""
+
+
+class HistoryArchiver(BackgroundJob):
+    """Moves whole old months to the archive tables in small background transactions"""
+    
+    def __init__(self, months: int = ARCHIVE_AFTER_MONTHS,
+                 chunk_size: int = ARCHIVE_CHUNK_SIZE,
+                 pause: float = ARCHIVE_PAUSE_SECONDS):
+        super().__init__(chunk_size, pause)
+        self.months = months
+        self.moved = {table: 0 for table in HISTORY_TABLES}
+    
+    def run(self):
+        """Archive every history table up to the cutoff, chunk by chunk"""
+        cutoff = archive_cutoff(self.months)
+        conn = None
+        try:
+            conn = Database.new_connection()
+            for table in HISTORY_TABLES:
+                while not self.stop_event.is_set():
+                    moved = self.archive_chunk(conn, table, cutoff)
+                    self.moved[table] += moved
+                    if moved < self.chunk_size:
+                        break
+                    self.stop_event.wait(self.pause)
+        except mysql.connector.Error as err:
+            print(f"History archive warning: {err}")
+        finally:
+            if conn:
+                conn.close()
+        
+        if any(self.moved.values()):
+            print(f"History archive: moved {self.moved} (before {cutoff:%Y-%m})")
+    
+    def archive_chunk(self, conn, table: str, cutoff: datetime) -> int:
+        """Copy then delete one chunk of old rows in a single short transaction"""
+        archive, time_column = HISTORY_TABLES[table]
+        cursor = conn.cursor()
+        try:
+            # Oldest rows first, straight off the time index
+            cursor.execute(f"""
+                SELECT id FROM {table}
+                WHERE {time_column} < %s
+                ORDER BY {time_column}, id
+                LIMIT %s
+            """, (cutoff, self.chunk_size))
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                conn.commit()
+                return 0
+            
+            placeholders = ", ".join(["%s"] * len(ids))
+            # Plain INSERT: an id already in the archive (e.g. after an AUTO_INCREMENT
+            # reset) fails the chunk instead of being skipped and then deleted
+            cursor.execute(f"INSERT INTO {archive} SELECT * FROM {table} WHERE id IN ({placeholders})",
+                           tuple(ids))
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", tuple(ids))
+            conn.commit()
+            Database.mark_written(table, archive)
+            return len(ids)
+        except mysql.connector.Error:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+BACKFILL_CHUNK_SIZE = 5000     # stock_usage ids per backfill transaction
+
+class UsageSpareIdBackfill(BackgroundJob):
+    """Fills stock_usage.spare_id for rows written before the column existed"""
+    
+    TABLES = ('stock_usage', 'stock_usage_archive')
+    
+    def __init__(self, chunk_size: int = BACKFILL_CHUNK_SIZE, pause: float = ARCHIVE_PAUSE_SECONDS):
+        super().__init__(chunk_size, pause)
+        self.updated = {table: 0 for table in self.TABLES}
+    
+    def run(self):
+        """Walk each table's id range in chunks; each chunk is its own transaction"""
+        conn = None
+        try:
+            conn = Database.new_connection()
+            for table in self.TABLES:
+                cursor = conn.cursor()
+                cursor.execute(f"SELECT MIN(id), MAX(id) FROM {table} WHERE spare_id IS NULL")
+                first_id, last_id = cursor.fetchone()
+                cursor.close()
+                conn.commit()
+                if first_id is None:
+                    continue
+                
+                start = first_id
+                while start <= last_id and not self.stop_event.is_set():
+                    self.updated[table] += self.backfill_chunk(conn, table, start, start + self.chunk_size - 1)
+                    start += self.chunk_size
+                    self.stop_event.wait(self.pause)
+        except mysql.connector.Error as err:
+            print(f"Usage backfill warning: {err}")
+        finally:
+            if conn:
+                conn.close()
+        
+        if any(self.updated.values()):
+            print(f"Usage backfill: set spare_id on {self.updated}")
+    
+    def backfill_chunk(self, conn, table: str, first_id: int, last_id: int) -> int:
+        """Resolve item_name -> spareparts.id for one primary-key range"""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"""
+                UPDATE {table} u
+                JOIN spareparts s ON s.spare_name = u.item_name
+                SET u.spare_id = s.id
+                WHERE u.id BETWEEN %s AND %s AND u.spare_id IS NULL
+            """, (first_id, last_id))
+            count = cursor.rowcount
+            conn.commit()
+            if count:
+                Database.mark_written(table)
+            return count
+        except mysql.connector.Error:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+# ================================================
+# FORECASTING - CONSUMPTION & DAYS OF COVER
+# ================================================
+
+FORECAST_HISTORY_DAYS = 5 * 365
+FORECAST_WINDOWS = (30, 90, 365)    # trailing windows for consumption rates
+FORECAST_RATE_WINDOW = 90           # window used for days of cover and min_stock
+FORECAST_LEAD_TIME_DAYS = 14
+FORECAST_SERVICE_Z = 1.65           # ~95% service level
+
+def load_usage_history(days: int = FORECAST_HISTORY_DAYS, snapshot: ReportSnapshot = None):
+    """
+    Load catalog and usage history as columnar arrays in one query each
+    
+    Returns (catalog, usage): catalog columns are id, name, stock, min_stock;
+    usage columns are spare_id, age_days (0 = today), qty. Both queries
+    read the same snapshot, so stock and usage agree.
+    """
+    if np is None:
+        raise RuntimeError("Forecasting requires NumPy (pip install numpy)")
+    
+    with report_snapshot(snapshot) as snapshot:
+        catalog_rows = snapshot.query("SELECT id, spare_name, stock, min_stock FROM spareparts ORDER BY id")
+        # Rows not yet backfilled fall back to a name lookup
+        usage_rows = snapshot.query(history_query("""
+            SELECT COALESCE(u.spare_id,
+                            (SELECT s.id FROM spareparts s WHERE s.spare_name = u.item_name LIMIT 1)),
+                   DATEDIFF(CURDATE(), u.date_time) AS age_days,
+                   u.qty_used
+            FROM {t} u
+            WHERE u.date_time >= CURDATE() - INTERVAL %s DAY
+        """, 'stock_usage'), (days, days))
+    usage_rows = [row for row in usage_rows if row[0] is not None]
+    
+    catalog = {
+        'id': np.array([row[0] for row in catalog_rows], dtype=np.int64),
+        'name': [row[1] for row in catalog_rows],
+        'stock': np.array([row[2] or 0 for row in catalog_rows], dtype=np.float64),
+        'min_stock': np.array([row[3] or 0 for row in catalog_rows], dtype=np.int64),
+    }
+    usage = np.array(usage_rows, dtype=np.int64).reshape(-1, 3)
+    return catalog, {'spare_id': usage[:, 0], 'age_days': usage[:, 1], 'qty': usage[:, 2]}
+
+def forecast_consumption(catalog: dict, usage: dict,
+                         windows=FORECAST_WINDOWS,
+                         rate_window: int = FORECAST_RATE_WINDOW,
+                         lead_time_days: int = FORECAST_LEAD_TIME_DAYS,
+                         service_z: float = FORECAST_SERVICE_Z) -> dict:
+    """
+    Consumption rates, variability and days of cover for every spare at once
+    
+    All per-spare aggregation is done with bincount over usage rows, so the
+    cost is O(usage rows + spares) with no per-item SQL or Python loops.
+    """
+    ids = catalog['id']
+    n = len(ids)
+    
+    # Map each usage row to its catalog position (catalog ids are sorted)
+    age = usage['age_days']
+    qty = usage['qty'].astype(np.float64)
+    pos = np.searchsorted(ids, usage['spare_id'])
+    known = (pos < n) & (age >= 0)
+    known[known] = ids[pos[known]] == usage['spare_id'][known]
+    pos, age, qty = pos[known], age[known], qty[known]
+    
+    # Average daily consumption over each trailing window
+    rates = {}
+    for window in windows:
+        recent = age < window
+        rates[window] = np.bincount(pos[recent], weights=qty[recent], minlength=n) / window
+    
+    # Daily variability over the rate window (days without usage count as zero)
+    recent = age < rate_window
+    day_keys = pos[recent].astype(np.int64) * rate_window + age[recent]
+    days, inverse = np.unique(day_keys, return_inverse=True)
+    daily_totals = np.bincount(inverse, weights=qty[recent])
+    sum_squares = np.bincount(days // rate_window, weights=daily_totals ** 2, minlength=n)
+    rate = rates.get(rate_window)
+    if rate is None:
+        rate = np.bincount(pos[recent], weights=qty[recent], minlength=n) / rate_window
+    std = np.sqrt(np.maximum(sum_squares / rate_window - rate ** 2, 0.0))
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_of_cover = np.where(rate > 0, catalog['stock'] / rate, np.inf)
+    
+    # Safety stock for the lead time plus expected lead-time demand
+    suggested_min = np.ceil(rate * lead_time_days + service_z * std * np.sqrt(lead_time_days))
+    
+    return {
+        'id': ids,
+        'name': catalog['name'],
+        'stock': catalog['stock'],
+        'min_stock': catalog['min_stock'],
+        'rates': rates,
+        'rate': rate,
+        'std': std,
+        'days_of_cover': days_of_cover,
+        'suggested_min': suggested_min.astype(np.int64),
+    }
+
+
+# ================================================
+# REPORT ENGINE - PROCESS POOL ANALYTICS
+# ================================================
+
+REPORT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+REPORT_SHARDS = 16              # per report; results stream back shard by shard
+REPORT_HISTORY_DAYS = 5 * 365
+
+# Input columns are array typecode + raw bytes, so a shard pickles as a few
+# buffers instead of a list of row tuples.
+
+def pack_columns(columns: dict) -> dict:
+    return {name: (column.typecode, column.tobytes()) for name, column in columns.items()}
+
+def unpack_columns(packed: dict) -> dict:
+    columns = {}
+    for name, (typecode, data) in packed.items():
+        column = array(typecode)
+        column.frombytes(data)
+        columns[name] = column
+    return columns
+
+def shard_columns(columns: dict, key: str, shards: int) -> List[dict]:
+    """Split columns sorted by `key` into packed shards that never split a key"""
+    keys = columns[key]
+    n = len(keys)
+    bounds = [0]
+    for i in range(1, shards):
+        cut = bisect_left(keys, keys[n * i // shards]) if n else 0
+        if cut > bounds[-1]:
+            bounds.append(cut)
+    bounds.append(n)
+    return [pack_columns({name: column[start:end] for name, column in columns.items()})
+            for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+# -------- Worker functions (run in the process pool) --------
+
+def usage_rollup_shard(packed: dict) -> List[Tuple]:
+    """(spare_id, total, months used, average per used month, peak month, peak qty)"""
+    columns = unpack_columns(packed)
+    months = {}
+    for spare_id, month, qty in zip(columns['spare_id'], columns['month'], columns['qty']):
+        per_spare = months.setdefault(spare_id, {})
+        per_spare[month] = per_spare.get(month, 0) + qty
+    
+    rows = []
+    for spare_id, per_month in months.items():
+        total = sum(per_month.values())
+        peak_month, peak_qty = max(per_month.items(), key=lambda item: item[1])
+        rows.append((spare_id, total, len(per_month), total / len(per_month),
+                     f"{peak_month // 12}-{peak_month % 12 + 1:02d}", peak_qty))
+    return rows
+
+def pq_variance_shard(packed: dict) -> List[Tuple]:
+    """(spare_id, checks, mean variance, mean |variance|, std dev, % off, net shrinkage)"""
+    columns = unpack_columns(packed)
+    stats = {}
+    for spare_id, variance in zip(columns['spare_id'], columns['variance']):
+        entry = stats.setdefault(spare_id, [0, 0, 0, 0, 0, 0])   # n, sum, sum abs, sum sq, off, shrink
+        entry[0] += 1
+        entry[1] += variance
+        entry[2] += abs(variance)
+        entry[3] += variance * variance
+        entry[4] += variance != 0
+        entry[5] += min(variance, 0)
+    
+    rows = []
+    for spare_id, (n, total, total_abs, total_sq, off, shrink) in stats.items():
+        mean = total / n
+        std = max(total_sq / n - mean * mean, 0.0) ** 0.5
+        rows.append((spare_id, n, mean, total_abs / n, std, off / n, -shrink))
+    return rows
+
+def machine_matrix_shard(packed: dict) -> dict:
+    """Machine code -> {spare_id: qty} for one shard of spares"""
+    columns = unpack_columns(packed)
+    matrix = {}
+    for spare_id, machine, qty in zip(columns['spare_id'], columns['machine'], columns['qty']):
+        per_machine = matrix.setdefault(machine, {})
+        per_machine[spare_id] = per_machine.get(spare_id, 0) + qty
+    return matrix
+
+
+# -------- Loaders (run in the app process, off the UI thread) --------
+
+def load_usage_columns(days: int = REPORT_HISTORY_DAYS,
+                       snapshot: ReportSnapshot = None) -> Tuple[dict, StringDictionary]:
+    """Usage history as columns sorted by spare_id; machines dictionary-encoded"""
+    with report_snapshot(snapshot) as snapshot:
+        rows = snapshot.query(history_query("""
+            SELECT spare_id, YEAR(date_time) * 12 + MONTH(date_time) - 1, qty_used, machine_name
+            FROM {t}
+            WHERE spare_id IS NOT NULL AND date_time >= CURDATE() - INTERVAL %s DAY
+        """, 'stock_usage'), (days, days))
+    rows.sort(key=lambda row: row[0])
+    
+    machines = StringDictionary()
+    columns = {
+        'spare_id': array('i', (row[0] for row in rows)),
+        'month': array('i', (row[1] for row in rows)),
+        'qty': array('i', (row[2] or 0 for row in rows)),
+        'machine': array('i', (machines.encode(row[3] or "-") for row in rows)),
+    }
+    return columns, machines
+
+def load_pq_columns(snapshot: ReportSnapshot = None) -> dict:
+    """Physical count variances as columns sorted by spare_id"""
+    with report_snapshot(snapshot) as snapshot:
+        rows = snapshot.query(
+            "SELECT spare_id, variance FROM physical_quantity WHERE check_date IS NOT NULL ORDER BY spare_id")
+    return {
+        'spare_id': array('i', (row[0] for row in rows)),
+        'variance': array('i', (row[1] or 0 for row in rows)),
+    }
+
+
+_report_pool = None
+
+def report_pool() -> ProcessPoolExecutor:
+    """Shared worker processes, started on first use"""
+    global _report_pool
+    if _report_pool is None:
+        # spawn, not fork: the app process has Tk and live DB threads
+        _report_pool = ProcessPoolExecutor(max_workers=REPORT_WORKERS,
+                                           mp_context=multiprocessing.get_context('spawn'))
+    return _report_pool
+
+def shutdown_report_pool():
+    global _report_pool
+    if _report_pool is not None:
+        _report_pool.shutdown(wait=False, cancel_futures=True)
+        _report_pool = None
+
+
+class ReportJob:
+    """
+    One analytics report run on the process pool
+    
+    Data is loaded on a thread, split into spare_id shards and fanned out;
+    on_partial(result) is called per finished shard and on_done() at the
+    end, both from the job thread. cancel() drops shards not yet started.
+    """
+    
+    # report -> (loader, worker)
+    REPORTS = {
+        'usage_rollup': ('usage', usage_rollup_shard),
+        'pq_variance': ('pq', pq_variance_shard),
+        'machine_matrix': ('usage', machine_matrix_shard),
+    }
+    
+    def __init__(self, report: str, on_partial, on_done, on_error, shards: int = REPORT_SHARDS):
+        self.report = report
+        self.on_partial = on_partial
+        self.on_done = on_done
+        self.on_error = on_error
+        self.shards = shards
+        self.cancel_event = Event()
+        self.futures = []
+        self.machines = None
+        self.total = 0
+    
+    def start(self):
+        Thread(target=self.run, daemon=True).start()
+    
+    def cancel(self):
+        self.cancel_event.set()
+        for future in self.futures:
+            future.cancel()
+    
+    def run(self):
+        try:
+            source, worker = self.REPORTS[self.report]
+            if source == 'usage':
+                columns, self.machines = load_usage_columns()
+            else:
+                columns = load_pq_columns()
+            if self.cancel_event.is_set():
+                return
+            
+            shards = shard_columns(columns, 'spare_id', self.shards)
+            self.total = len(shards)
+            pool = report_pool()
+            self.futures = [pool.submit(worker, shard) for shard in shards]
+            for done, future in enumerate(as_completed(self.futures), 1):
+                if self.cancel_event.is_set():
+                    return
+                self.on_partial(future.result(), done, self.total)
+            self.on_done()
+        except CancelledError:
+            pass
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                shutdown_report_pool()  # start fresh workers next run
+            if not self.cancel_event.is_set():
+                self.on_error(e)
+
+
+# ================================================
+# MOVEMENT HISTORY - KEYSET-PAGED LEDGER MERGE
+# ================================================
+
+HISTORY_PAGE_SIZE = 200
+
+# Per-spare ledgers: (label, table, time column, kind, signed qty, by, notes,
+# extra filter). Each is read newest first off its (spare_id, time) index;
+# InnoDB appends the primary key to secondary indexes, so (time, id) keyset
+# seeks stay on it.
+# 'Out' movements mirror stock_usage rows and 'Adjust'/'Transfer' movements
+# mirror stock_adjustments rows, so only receipts ('In') are taken from the
+# movement ledger - every event is listed once.
+HISTORY_MOVEMENT_QTY = "CASE movement_type WHEN 'Out' THEN -quantity ELSE quantity END"
+HISTORY_USAGE_NOTES = "CONCAT_WS(' - ', NULLIF(machine_name, ''), NULLIF(notes, ''))"
+HISTORY_SOURCES = [
+    ('Movement', 'stock_movements', 'created_at',
+     'movement_type', HISTORY_MOVEMENT_QTY, 'created_by', 'notes', "AND movement_type = 'In'"),
+    ('Movement', 'stock_movements_archive', 'created_at',
+     'movement_type', HISTORY_MOVEMENT_QTY, 'created_by', 'notes', "AND movement_type = 'In'"),
+    ('Usage', 'stock_usage', 'date_time',
+     "'Issue'", '-qty_used', 'issued_by', HISTORY_USAGE_NOTES, ""),
+    ('Usage', 'stock_usage_archive', 'date_time',
+     "'Issue'", '-qty_used', 'issued_by', HISTORY_USAGE_NOTES, ""),
+    ('Adjustment', 'stock_adjustments', 'adjustment_date',
+     'adjustment_type', 'difference', 'adjusted_by', 'reason', ""),
+]
+
+def history_source_rows(conn, spare_id: int, source: tuple, page_size: int = HISTORY_PAGE_SIZE):
+    """
+    Yield (time, id, label, kind, qty, by, notes) for one ledger, newest first
+    
+    Pages with a (time, id) keyset cursor instead of OFFSET, so every page is
+    an index seek no matter how deep the user has scrolled.
+    """
+    label, table, time_column, kind, qty, by, notes, extra = source
+    select = f"""
+        SELECT {time_column}, id, {kind}, {qty}, {by}, {notes}
+        FROM {table}
+        WHERE spare_id = %s AND {time_column} IS NOT NULL {extra} {{after}}
+        ORDER BY {time_column} DESC, id DESC
+        LIMIT %s
+    """
+    first_page = select.format(after="")
+    next_page = select.format(after=f"AND ({time_column} < %s OR ({time_column} = %s AND id < %s))")
+    
+    last = None
+    while True:
+        cursor = conn.cursor()
+        try:
+            if last is None:
+                cursor.execute(first_page, (spare_id, page_size))
+            else:
+                cursor.execute(next_page, (spare_id, last[0], last[0], last[1], page_size))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        conn.commit()   # end the read snapshot between pages
+        
+        for when, row_id, row_kind, row_qty, row_by, row_notes in rows:
+            yield (when, row_id, label, row_kind, row_qty, row_by, row_notes)
+        if len(rows) < page_size:
+            return
+        last = (rows[-1][0], rows[-1][1])
+
+
+class MovementHistory:
+    """Lazy newest-first merge of every ledger for one spare"""
+    
+    def __init__(self, spare_id: int, page_size: int = HISTORY_PAGE_SIZE):
+        self.spare_id = spare_id
+        self.conn = Database.new_read_connection()
+        sources = [history_source_rows(self.conn, spare_id, source, page_size)
+                   for source in HISTORY_SOURCES]
+        # Sources only fetch their next page when the merge reaches its end
+        self.rows = heapq.merge(*sources, key=lambda row: (row[0], row[1]), reverse=True)
+        self.boundary = None    # (time, id) of the last merged row
+        self.seen = set()       # ledger labels already returned at that boundary
+        self.exhausted = False
+    
+    def next_page(self, count: int = HISTORY_PAGE_SIZE) -> list:
+        """Next `count` merged rows (fewer once history runs out)"""
+        page = []
+        for row in self.rows:
+            # A row can be seen twice if the archiver moves it mid-scroll. Both
+            # copies share a (time, id) merge key, so only that run is remembered.
+            boundary = (row[0], row[1])
+            if boundary != self.boundary:
+                self.boundary, self.seen = boundary, set()
+            if row[2] in self.seen:
+                continue
+            self.seen.add(row[2])
+            page.append(row)
+            if len(page) >= count:
+                return page
+        self.exhausted = True
+        return page
+    
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+
+# ================================================
+# RECONCILIATION - LEDGERS VS STOCK
+# ================================================
+
+RECONCILE_RANGE_SIZE = 5000     # spare ids per worker task
+RECONCILE_WORKERS = 4
+RECONCILE_BATCH_SIZE = 500      # corrective adjustments per transaction
+
+# Net In/Out per spare over live + archived movements. 'Adjust' and 'Transfer'
+# movements mirror stock_adjustments rows, which are summed separately.
+RECONCILE_MOVEMENTS_SQL = history_query("""
+    SELECT spare_id,
+           SUM(CASE movement_type WHEN 'In' THEN quantity
+                                  WHEN 'Out' THEN -quantity
+                                  ELSE 0 END)
+    FROM {t}
+    WHERE spare_id BETWEEN %s AND %s
+    GROUP BY spare_id
+""", 'stock_movements')
+
+RECONCILE_ADJUSTMENTS_SQL = """
+    SELECT spare_id, SUM(difference)
+    FROM stock_adjustments
+    WHERE spare_id BETWEEN %s AND %s
+    GROUP BY spare_id
+"""
+
+# Only posts if stock hasn't moved since the check
+RECONCILE_CORRECTION_SQL = """
+    INSERT INTO stock_adjustments
+    (spare_id, spare_name, adjustment_type, old_qty, new_qty, difference,
+     reason, adjusted_by, adjustment_date)
+    SELECT id, spare_name, %s, %s, stock, stock - %s, %s, %s, NOW()
+    FROM spareparts
+    WHERE id = %s AND stock = %s
+"""
+
+# (adjustment type, reason) booked for ledger gaps. Correction is kept for
+# real drift; Opening is the stock a spare had before its ledgers started.
+CORRECTION_ENTRY = ('Correction', 'Ledger reconciliation')
+OPENING_ENTRY = ('Opening', 'Opening balance')
+
+def reconcile_range(first_id: int, last_id: int) -> List[Tuple]:
+    """(spare_id, name, stock, expected) for each mismatched spare in an id range"""
+    # Stock and both ledgers read from one snapshot
+    with ReportSnapshot() as snapshot:
+        spares = snapshot.query("SELECT id, spare_name, stock FROM spareparts WHERE id BETWEEN %s AND %s",
+                                (first_id, last_id))
+        
+        expected = {}
+        for spare_id, net in snapshot.query(RECONCILE_MOVEMENTS_SQL, (first_id, last_id) * 2):
+            expected[spare_id] = expected.get(spare_id, 0) + int(net or 0)
+        for spare_id, net in snapshot.query(RECONCILE_ADJUSTMENTS_SQL, (first_id, last_id)):
+            expected[spare_id] = expected.get(spare_id, 0) + int(net or 0)
+    
+    return [(spare_id, name, stock or 0, expected.get(spare_id, 0))
+            for spare_id, name, stock in spares
+            if (stock or 0) != expected.get(spare_id, 0)]
+
+def reconcile_stock(workers: int = RECONCILE_WORKERS,
+                    range_size: int = RECONCILE_RANGE_SIZE,
+                    progress=None) -> List[Tuple]:
+    """
+    Recompute expected stock for the whole catalog from the ledgers
+    
+    The id space is split into ranges checked in parallel, each worker on its
+    own connection. progress(done, total) is called as ranges finish.
+    """
+    bounds = Database.execute_query("SELECT MIN(id), MAX(id) FROM spareparts", fetch=True)
+    if not bounds or bounds[0][0] is None:
+        return []
+    first_id, last_id = bounds[0]
+    ranges = [(start, min(start + range_size - 1, last_id))
+              for start in range(first_id, last_id + 1, range_size)]
+    
+    mismatches = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(reconcile_range, start, end) for start, end in ranges]
+        for done, future in enumerate(as_completed(futures), 1):
+            mismatches.extend(future.result())
+            if progress:
+                progress(done, len(ranges))
+    
+    mismatches.sort()
+    return mismatches
+
+def post_corrections(mismatches: List[Tuple], adjusted_by: str = "Reconciliation",
+                     batch_size: int = RECONCILE_BATCH_SIZE, entry: Tuple[str, str] = CORRECTION_ENTRY) -> int:
+    """Book an adjustment (a Correction by default) for each mismatch so the ledger matches stock"""
+    adjustment_type, reason = entry
+    posted = 0
+    conn = Database.new_connection()
+    try:
+        cursor = conn.cursor()
+        for start in range(0, len(mismatches), batch_size):
+            batch = mismatches[start:start + batch_size]
+            try:
+                cursor.executemany(RECONCILE_CORRECTION_SQL, [
+                    (adjustment_type, expected, expected, reason, adjusted_by, spare_id, stock)
+                    for spare_id, _, stock, expected in batch])
+                posted += cursor.rowcount
+                conn.commit()
+                Database.mark_written('stock_adjustments')
+            except mysql.connector.Error:
+                conn.rollback()
+                raise
+        cursor.close()
+    finally:
+        conn.close()
+    return posted
+
+def book_opening_balances(adjusted_by: str = "System") -> int:
+    """
+    Book an Opening adjustment for every spare whose stock its ledgers don't explain
+    
+    Run once when the ledgers start (seed data, the migration that adds the
+    Opening type); gaps found later are drift for reconciliation.
+    """
+    return post_corrections(reconcile_stock(), adjusted_by, entry=OPENING_ENTRY)
+
+
+# ================================================
+# STOCK ISSUE - SHARED WRITE PATH
+# ================================================
+
+class InsufficientStockError(ValueError):
+    """Requested quantity exceeds system stock"""
+    
+    def __init__(self, item_name: str, stock: int, requested: int):
+        self.item_name = item_name
+        self.stock = stock
+        self.requested = requested
+        super().__init__(f"Not enough system stock for {item_name}: {stock} in stock, {requested} requested")
+
+
+def issue_spare(conn, qty_used: int, machine_name: str, notes: str = "",
+                spare_name: str = None, spare_id: int = None,
+                issued_by: str = "ME Operator") -> Tuple:
+    """
+    Issue stock for one spare in a single transaction on the given connection
+    
+    The spare is looked up by id or name and locked while stock is checked.
+    Returns (spare_id, name, product_no, old_stock, new_stock, min_stock).
+    Raises ValueError for a quantity below 1, LookupError for an unknown
+    spare, InsufficientStockError when stock is short.
+    """
+    if qty_used <= 0:
+        raise ValueError(f"Quantity must be positive, got {qty_used}")
+    cursor = conn.cursor()
+    try:
+        if spare_id is not None:
+            cursor.execute("""
+                SELECT id, spare_name, product_number, stock, min_stock
+                FROM spareparts WHERE id = %s FOR UPDATE
+            """, (spare_id,))
+        else:
+            cursor.execute("""
+                SELECT id, spare_name, product_number, stock, min_stock
+                FROM spareparts WHERE spare_name = %s LIMIT 1 FOR UPDATE
+            """, (spare_name,))
+        result = cursor.fetchone()
+        if not result:
+            raise LookupError(f"Item not found: {spare_name if spare_id is None else spare_id}")
+        
+        spare_id, item_name, product_no, current_stock, min_stock = result
+        current_stock = current_stock or 0
+        if qty_used > current_stock:
+            raise InsufficientStockError(item_name, current_stock, qty_used)
+        new_stock = current_stock - qty_used
+        now = datetime.now()
+        
+        # Update spareparts stock
+        cursor.execute("""
+            UPDATE spareparts 
+            SET stock = %s 
+            WHERE id = %s
+        """, (new_stock, spare_id))
+        
+        # Insert into stock_usage
+        cursor.execute("""
+            INSERT INTO stock_usage 
+            (spare_id, date_time, item_name, item_number, qty_stock, qty_used, machine_name, notes, issued_by)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, (spare_id, now, item_name, product_no, current_stock, qty_used, machine_name, notes, issued_by))
+        
+        # Update physical_quantity
+        cursor.execute("""
+            INSERT INTO physical_quantity 
+            (spare_id, product_number, spare_name, system_qty, physical_qty, 
+             variance, checked_by, check_date, notes, status)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'Pending')
+            ON DUPLICATE KEY UPDATE
+            system_qty = VALUES(system_qty),
+            check_date = VALUES(check_date),
+            notes = VALUES(notes)
+        """, (spare_id, product_no, item_name, new_stock, new_stock, 0, issued_by, now, notes))
+        
+        # Keep the indexed default ordering current
+        refresh_status_priority(cursor, [spare_id])
+        
+        # Record movement
+        cursor.execute("""
+            INSERT INTO stock_movements 
+            (spare_id, spare_name, movement_type, quantity, notes, created_by, created_at)
+            VALUES (%s, %s, 'Out', %s, %s, %s, %s)
+        """, (spare_id, item_name, qty_used, notes, issued_by, now))
+        
+        conn.commit()
+        Database.mark_written('spareparts', 'physical_quantity', 'stock_usage', 'stock_movements')
+        return spare_id, item_name, product_no, current_stock, new_stock, min_stock
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+class IssueQueue:
+    """
+    Asynchronous issue writer for rapid mode
+    
+    Issues are written in order by one worker thread on its own connection;
+    on_result(ticket, result, error) is called from that thread afterwards.
+    """
+    
+    def __init__(self, on_result):
+        self.on_result = on_result
+        self.pending = queue.Queue()
+        self.thread = None
+        self.next_ticket = 0
+    
+    def submit(self, spare_id: int, qty: int, machine_name: str, notes: str) -> int:
+        """Queue one issue; returns its ticket number"""
+        self.next_ticket += 1
+        self.pending.put((self.next_ticket, spare_id, qty, machine_name, notes))
+        if self.thread is None:
+            self.thread = Thread(target=self.run, daemon=True)
+            self.thread.start()
+        return self.next_ticket
+    
+    def stop(self):
+        self.pending.put(None)
+    
+    def run(self):
+        conn = None
+        while True:
+            job = self.pending.get()
+            if job is None:
+                break
+            ticket, spare_id, qty, machine_name, notes = job
+            try:
+                if conn is None:
+                    conn = Database.new_connection()
+                result = issue_spare(conn, qty, machine_name, notes, spare_id=spare_id)
+                self.on_result(ticket, result, None)
+            except Exception as e:
+                if isinstance(e, mysql.connector.Error) and Database.is_connection_lost(e):
+                    conn = None     # reopen for the next issue
+                self.on_result(ticket, None, e)
+        if conn:
+            conn.close()
+
+
+# ================================================
+# STOCK ADJUSTMENTS - BATCHED SERVICE
+# ================================================
+
+ADJUSTMENT_TYPES = ('Correction', 'Damage', 'Loss', 'Found', 'Transfer')
+ADJUSTMENT_LOCK_CHUNK = 1000    # ids per locking SELECT / set-based UPDATE
+
+# Sign each adjustment type must have (None = either)
+ADJUSTMENT_SIGNS = {'Correction': None, 'Damage': -1, 'Loss': -1, 'Found': 1, 'Transfer': -1}
+
+
+class AdjustmentError(ValueError):
+    """A batch failed validation; errors lists (line number, message)"""
+    
+    def __init__(self, errors: List[Tuple[int, str]]):
+        self.errors = errors
+        super().__init__("; ".join(f"line {line}: {message}" for line, message in errors[:10]))
+
+
+def apply_adjustments(lines, adjusted_by: str, conn=None) -> Dict[int, Tuple[str, int, int]]:
+    """
+    Post many stock adjustments in one transaction
+    
+    lines are (spare_id, adjustment_type, difference, reason). Affected
+    spares are locked in id order, every line is validated against the
+    locked stock, and nothing is written unless all lines pass. Returns
+    spare_id -> (name, new stock, min_stock) for the adjusted spares, ready
+    for SparepartApp.note_stock_changes.
+    """
+    lines = list(lines)
+    if not lines:
+        return {}
+    
+    own_conn = conn is None
+    conn = conn or Database.new_connection()
+    cursor = conn.cursor()
+    try:
+        # Lock in id order so concurrent batches can't deadlock each other
+        spare_ids = sorted({line[0] for line in lines})
+        current = {}
+        for start in range(0, len(spare_ids), ADJUSTMENT_LOCK_CHUNK):
+            chunk = spare_ids[start:start + ADJUSTMENT_LOCK_CHUNK]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(f"SELECT id, spare_name, stock, min_stock FROM spareparts "
+                           f"WHERE id IN ({placeholders}) ORDER BY id FOR UPDATE", tuple(chunk))
+            for spare_id, name, stock, min_stock in cursor.fetchall():
+                current[spare_id] = [name, stock or 0, min_stock or 0]
+        
+        # Validate in order; several lines for one spare apply one after another
+        now = datetime.now()
+        errors = []
+        adjustment_rows = []
+        movement_rows = []
+        for number, (spare_id, adjustment_type, difference, reason) in enumerate(lines, 1):
+            if spare_id not in current:
+                errors.append((number, f"unknown spare id {spare_id}"))
+                continue
+            if adjustment_type not in ADJUSTMENT_TYPES:
+                errors.append((number, f"unknown adjustment type {adjustment_type!r}"))
+                continue
+            sign = ADJUSTMENT_SIGNS[adjustment_type]
+            if difference == 0 or (sign and difference * sign < 0):
+                errors.append((number, f"{adjustment_type} can't change stock by {difference:+d}"))
+                continue
+            
+            name, old_qty, _ = current[spare_id]
+            new_qty = old_qty + difference
+            if new_qty < 0:
+                errors.append((number, f"{name}: only {old_qty} in stock"))
+                continue
+            current[spare_id][1] = new_qty
+            
+            adjustment_rows.append((spare_id, name, adjustment_type, old_qty, new_qty,
+                                    difference, reason, adjusted_by, now))
+            movement_type = 'Transfer' if adjustment_type == 'Transfer' else 'Adjust'
+            movement_rows.append((spare_id, name, movement_type, difference, reason, adjusted_by, now))
+        
+        if errors:
+            raise AdjustmentError(errors)
+        
+        # Multi-row inserts (executemany batches INSERT ... VALUES)
+        cursor.executemany("""
+            INSERT INTO stock_adjustments
+            (spare_id, spare_name, adjustment_type, old_qty, new_qty, difference,
+             reason, adjusted_by, adjustment_date)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, adjustment_rows)
+        cursor.executemany("""
+            INSERT INTO stock_movements
+            (spare_id, spare_name, movement_type, quantity, notes, created_by, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, movement_rows)
+        
+        # One set-based UPDATE per chunk with the final stock of each spare
+        changed = sorted({row[0] for row in adjustment_rows})
+        for start in range(0, len(changed), ADJUSTMENT_LOCK_CHUNK):
+            chunk = changed[start:start + ADJUSTMENT_LOCK_CHUNK]
+            cases = " ".join(["WHEN %s THEN %s"] * len(chunk))
+            placeholders = ", ".join(["%s"] * len(chunk))
+            params = [value for spare_id in chunk for value in (spare_id, current[spare_id][1])]
+            cursor.execute(f"UPDATE spareparts SET stock = CASE id {cases} END WHERE id IN ({placeholders})",
+                           tuple(params) + tuple(chunk))
+            refresh_status_priority(cursor, chunk)
+        
+        conn.commit()
+        Database.mark_written('spareparts', 'stock_adjustments', 'stock_movements')
+        return {spare_id: tuple(current[spare_id]) for spare_id in changed}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        if own_conn:
+            conn.close()
+
+
+# ================================================
+# CATALOG EDITS - OPTIMISTIC BATCH FLUSH
+# ================================================
+
+# Editable spareparts columns, in the order edited rows carry them
+CATALOG_EDIT_COLUMNS = ('spare_name', 'material_type', 'min_stock', 'rack_location')
+CATALOG_FLUSH_CHUNK = 500   # rows per set-based UPDATE
+
+# Optimistic concurrency uses catalog_version, bumped only by catalog edits:
+# updated_at has 1 s resolution and also moves on every issue/adjustment
+CATALOG_QUERY = """
+    SELECT id, product_number, spare_name, material_type, min_stock, rack_location, catalog_version
+    FROM spareparts
+    ORDER BY spare_name
+"""
+
+def flush_catalog_edits(edits: dict, conn=None) -> Tuple[dict, dict]:
+    """
+    Write edited catalog rows in one transaction
+    
+    edits maps spare_id -> (values in CATALOG_EDIT_COLUMNS order,
+    catalog_version when loaded). Rows edited elsewhere since then are left
+    alone. Returns (saved, conflicts): saved maps spare_id -> (new
+    catalog_version, stock), conflicts maps spare_id -> (current values, current
+    catalog_version), or None if deleted.
+    """
+    if not edits:
+        return {}, {}
+    
+    own_conn = conn is None
+    conn = conn or Database.new_connection()
+    cursor = conn.cursor()
+    columns = ", ".join(CATALOG_EDIT_COLUMNS)
+    try:
+        # Lock the edited rows, then compare against what the editor loaded
+        spare_ids = sorted(edits)
+        current = {}
+        for start in range(0, len(spare_ids), CATALOG_FLUSH_CHUNK):
+            chunk = spare_ids[start:start + CATALOG_FLUSH_CHUNK]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(f"SELECT id, {columns}, catalog_version FROM spareparts "
+                           f"WHERE id IN ({placeholders}) ORDER BY id FOR UPDATE", tuple(chunk))
+            for row in cursor.fetchall():
+                current[row[0]] = (tuple(row[1:-1]), row[-1])
+        
+        conflicts = {spare_id: current.get(spare_id) for spare_id in spare_ids
+                     if spare_id not in current or current[spare_id][1] != edits[spare_id][1]}
+        to_save = [spare_id for spare_id in spare_ids if spare_id not in conflicts]
+        
+        # One UPDATE per chunk: a CASE per column keyed on id
+        for start in range(0, len(to_save), CATALOG_FLUSH_CHUNK):
+            chunk = to_save[start:start + CATALOG_FLUSH_CHUNK]
+            cases = " ".join(["WHEN %s THEN %s"] * len(chunk))
+            assignments = ", ".join(f"{column} = CASE id {cases} END" for column in CATALOG_EDIT_COLUMNS)
+            assignments += ", catalog_version = catalog_version + 1"
+            placeholders = ", ".join(["%s"] * len(chunk))
+            params = []
+            for position in range(len(CATALOG_EDIT_COLUMNS)):
+                for spare_id in chunk:
+                    params.extend((spare_id, edits[spare_id][0][position]))
+            cursor.execute(f"UPDATE spareparts SET {assignments} WHERE id IN ({placeholders})",
+                           tuple(params) + tuple(chunk))
+            refresh_status_priority(cursor, chunk)
+        
+        # New versions, so the editor can keep editing without a reload,
+        # and stock for the alert index (min_stock may have changed)
+        saved = {}
+        for start in range(0, len(to_save), CATALOG_FLUSH_CHUNK):
+            chunk = to_save[start:start + CATALOG_FLUSH_CHUNK]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(f"SELECT id, catalog_version, stock FROM spareparts WHERE id IN ({placeholders})",
+                           tuple(chunk))
+            saved.update((spare_id, (version, stock or 0)) for spare_id, version, stock in cursor.fetchall())
+        
+        conn.commit()
+        Database.mark_written('spareparts')
+        return saved, conflicts
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        if own_conn:
+            conn.close()
+
+
+# ================================================
+# DIAGNOSTICS - MAIN LOOP STALL MONITOR
+# ================================================
+
+STALL_LOG_PATH = os.path.join(APP_DATA_DIR, 'stalls.log')
+
+class StallMonitor:
+    """
+    Watchdog for the Tk main loop
+    
+    A heartbeat scheduled with after() measures how late each tick fires.
+    A monitor thread notices when the heartbeat stops and samples the main
+    thread's stack, so a stall can be blamed on the handler that caused it.
+    """
+    
+    TICK_MS = 100
+    THRESHOLD_MS = 250      # lateness that counts as a stall
+    SAMPLE_INTERVAL = 0.05  # how often the monitor thread checks the heartbeat
+    HISTORY = 6000          # tick latencies kept (~10 minutes)
+    MAX_STALLS = 200
+    BUCKETS_MS = (16, 50, 100, 250, 500, 1000, 2000, 5000)
+    
+    def __init__(self, root, threshold_ms: int = THRESHOLD_MS):
+        self.root = root
+        self.threshold = threshold_ms / 1000.0
+        self.latencies = deque(maxlen=self.HISTORY)
+        self.stalls = deque(maxlen=self.MAX_STALLS)   # (started, duration_ms, handler, stack)
+        self.stall_count = 0    # all stalls so far, including ones rolled out of the deque
+        self.main_ident = threading.main_thread().ident
+        self.stop_event = Event()
+        self.last_tick = None
+        self.sample = None      # (handler, stack) of the stall in progress
+        self.started = datetime.now()
+    
+    def start(self):
+        self.last_tick = time.perf_counter()
+        self.root.after(self.TICK_MS, self.tick)
+        Thread(target=self.watch, daemon=True).start()
+    
+    def stop(self):
+        self.stop_event.set()
+    
+    def tick(self):
+        """Heartbeat in the main loop"""
+        if self.stop_event.is_set():
+            return
+        now = time.perf_counter()
+        late = max(now - self.last_tick - self.TICK_MS / 1000.0, 0.0)
+        self.latencies.append(late * 1000)
+        
+        if late >= self.threshold:
+            handler, stack = self.sample or ("unknown", "")
+            self.stalls.append((datetime.now(), late * 1000, handler, stack))
+            self.stall_count += 1
+        self.sample = None
+        
+        self.last_tick = now
+        self.root.after(self.TICK_MS, self.tick)
+    
+    def watch(self):
+        """Monitor thread: sample the main thread once per stall"""
+        while not self.stop_event.wait(self.SAMPLE_INTERVAL):
+            overdue = time.perf_counter() - self.last_tick - self.TICK_MS / 1000.0
+            if overdue >= self.threshold and self.sample is None:
+                frame = sys._current_frames().get(self.main_ident)
+                if frame is not None:
+                    stack = traceback.extract_stack(frame)
+                    self.sample = (self.handler_name(stack), "".join(traceback.format_list(stack)))
+    
+    @staticmethod
+    def handler_name(stack) -> str:
+        """First named application frame entered from a tkinter callback"""
+        tk_dir = os.path.dirname(tk.__file__)
+        in_tk = False
+        for frame in stack:
+            if frame.filename.startswith(tk_dir):
+                in_tk = True
+            elif in_tk and frame.name not in ('<lambda>', 'wrapper'):   # skip Profiler.wrap shims
+                return frame.name
+        return stack[-1].name if stack else "unknown"
+    
+    def histogram(self) -> List[Tuple[str, int]]:
+        """(bucket label, tick count) over the rolling latency window"""
+        counts = [0] * (len(self.BUCKETS_MS) + 1)
+        for latency in self.latencies:
+            counts[bisect_left(self.BUCKETS_MS, latency)] += 1
+        labels = [f"≤ {limit} ms" for limit in self.BUCKETS_MS] + [f"> {self.BUCKETS_MS[-1]} ms"]
+        return list(zip(labels, counts))
+    
+    def by_handler(self) -> List[Tuple[str, int, float, float]]:
+        """(handler, stalls, total ms, worst ms), worst offenders first"""
+        totals = {}
+        for _, duration, handler, _ in self.stalls:
+            count, total, worst = totals.get(handler, (0, 0.0, 0.0))
+            totals[handler] = (count + 1, total + duration, max(worst, duration))
+        return sorted(((handler, *values) for handler, values in totals.items()),
+                      key=lambda row: row[2], reverse=True)
+    
+    def report(self) -> str:
+        """Plain-text summary for the log"""
+        lines = [f"=== Stall report {self.started:%Y-%m-%d %H:%M:%S} - {datetime.now():%Y-%m-%d %H:%M:%S} ===",
+                 f"threshold {self.threshold * 1000:.0f} ms, {len(self.latencies)} ticks, {len(self.stalls)} stalls",
+                 "", "Tick lateness:"]
+        lines += [f"  {label:>10}  {count}" for label, count in self.histogram()]
+        lines += ["", "By handler:"]
+        lines += [f"  {handler:<30} {count:>4} stalls  {total:>8.0f} ms total  {worst:>6.0f} ms worst"
+                  for handler, count, total, worst in self.by_handler()]
+        for started, duration, handler, stack in self.stalls:
+            lines += ["", f"--- {started:%H:%M:%S} {duration:.0f} ms in {handler}", stack.rstrip()]
+        return "\n".join(lines) + "\n\n"
+    
+    def dump(self, path: str = STALL_LOG_PATH):
+        """Append the report to the stall log if anything stalled"""
+        if not self.stalls:
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(self.report())
+        except OSError as err:
+            print(f"Stall log warning: {err}")
+
+
+# ================================================
+# VIRTUAL TREEVIEW - WINDOWED RENDERING
+# ================================================
+
+class VirtualTreeview:
+    """
+    ttk.Treeview that only holds the rows on screen
+    
+    rows is the full display order (any hashable row keys, e.g. snapshot
+    indices); row_values(row) returns (values, tags). A small pool of real
+    items, one page plus BUFFER, is recycled as the view scrolls, so
+    rendering costs the same for 100 rows or 1M. Selection is tracked by row
+    key, not tree item, and survives scrolling, filtering and re-sorting.
+    on_select(row) is called when the user selects a row.
+    """
+    
+    BUFFER = 2          # spare items past the last visible row
+    WHEEL_UNITS = 3     # rows per mouse wheel notch
+    
+    def __init__(self, parent, columns, row_values, on_select=None, height: int = 25, **options):
+        self.tree = ttk.Treeview(parent, columns=columns, show='headings', height=height,
+                                 selectmode='browse', **options)
+        self.row_values = row_values
+        self.on_select = on_select
+        self.yscrollcommand = None
+        self.rows = []
+        self.top = 0            # position in rows of the first visible row
+        self.selected = None    # selected row key
+        self.selected_position = None   # its position in rows, None if not shown
+        self.items = []         # pooled tree items; items[k] shows rows[top + k]
+        self.attached = 0
+        
+        self.tree.bind('<<TreeviewSelect>>', self.on_tree_select)
+        self.tree.bind('<Configure>', lambda e: self.render())
+        self.tree.bind('<MouseWheel>', self.on_wheel)
+        self.tree.bind('<Button-4>', lambda e: self.scroll(-self.WHEEL_UNITS))
+        self.tree.bind('<Button-5>', lambda e: self.scroll(self.WHEEL_UNITS))
+        for key, step in (('<Up>', -1), ('<Down>', 1), ('<Prior>', 'page_up'), ('<Next>', 'page_down'),
+                          ('<Home>', 'home'), ('<End>', 'end')):
+            self.tree.bind(key, lambda e, step=step: self.move_selection(step))
+    
+    # -------- Data --------
+    
+    def set_rows(self, rows):
+        """Show a new row order; keeps the scroll position and the selection if still present"""
+        self.rows = rows if isinstance(rows, list) else list(rows)
+        self.locate_selection()
+        self.render()
+    
+    def select(self, row, position: int = None):
+        """Select a row key without calling on_select (None clears)"""
+        self.selected = row
+        if position is None:
+            self.locate_selection()
+        else:
+            self.selected_position = position
+        self.render()
+    
+    def locate_selection(self):
+        """Find the selected row's position; one scan per new row order, not per keypress"""
+        self.selected_position = None
+        if self.selected is not None:
+            try:
+                self.selected_position = self.rows.index(self.selected)
+            except ValueError:
+                pass
+    
+    def row_at(self, y: int):
+        """Row key under a y coordinate, or None"""
+        item = self.tree.identify_row(y)
+        return self.row_at_item(item) if item else None
+    
+    # -------- Scrolling --------
+    
+    def page_size(self) -> int:
+        """Rows that fit in the widget right now"""
+        if self.attached:
+            box = self.tree.bbox(self.items[0])
+            if box:
+                header, row_height = box[1], box[3]
+                return max(1, (self.tree.winfo_height() - header) // max(row_height, 1))
+        return int(self.tree.cget('height'))
+    
+    def yview(self, *args):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', n, 'units' | 'pages')"""
+        if not args:
+            return self.fractions()
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * len(self.rows))
+            self.render()
+        elif args[0] == 'scroll':
+            count = int(args[1])
+            self.scroll(count * self.page_size() if args[2] == 'pages' else count)
+    
+    def scroll(self, rows: int):
+        self.top += rows
+        self.render()
+        return 'break'
+    
+    def on_wheel(self, event):
+        notches = event.delta / 120
+        return self.scroll(-self.WHEEL_UNITS * (int(notches) or (1 if notches > 0 else -1)))
+    
+    def see(self, position: int):
+        """Scroll so the row at position is visible"""
+        page = self.page_size()
+        if position < self.top:
+            self.top = position
+        elif position >= self.top + page:
+            self.top = position - page + 1
+    
+    def fractions(self) -> Tuple[float, float]:
+        if not self.rows:
+            return 0.0, 1.0
+        total = len(self.rows)
+        return self.top / total, min(self.top + self.page_size(), total) / total
+    
+    # -------- Selection --------
+    
+    def on_tree_select(self, event):
+        """User click: translate the pooled item back to its row key"""
+        selection = self.tree.selection()
+        if not selection:
+            return
+        row = self.row_at_item(selection[0])
+        if row is None or row == self.selected:
+            return  # our own render restoring the selection
+        self.selected = row
+        self.selected_position = self.top + self.items.index(selection[0])
+        # A click on the partly visible last row brings it fully into view
+        self.see(self.selected_position)
+        self.render()
+        if self.on_select:
+            self.on_select(row)
+    
+    def row_at_item(self, item):
+        position = self.top + self.items.index(item)
+        return self.rows[position] if position < len(self.rows) else None
+    
+    def move_selection(self, step):
+        """Keyboard navigation over the full row list"""
+        if not self.rows:
+            return 'break'
+        page = self.page_size()
+        current = self.selected_position
+        if step == 'home':
+            position = 0
+        elif step == 'end':
+            position = len(self.rows) - 1
+        elif current is None:
+            position = self.top
+        elif step == 'page_up':
+            position = current - page
+        elif step == 'page_down':
+            position = current + page
+        else:
+            position = current + step
+        position = max(0, min(position, len(self.rows) - 1))
+        
+        self.see(position)
+        self.selected = self.rows[position]
+        self.selected_position = position
+        self.render()
+        if self.on_select:
+            self.on_select(self.selected)
+        return 'break'
+    
+    # -------- Rendering --------
+    
+    def render(self):
+        """Fill the item pool from rows[top:]; O(page size), independent of row count"""
+        page = self.page_size()
+        self.top = max(0, min(self.top, len(self.rows) - page))
+        count = min(page + self.BUFFER, len(self.rows) - self.top)
+        
+        # items[:attached] are in the tree in order: reattach pooled items
+        # first, grow the pool only past them, detach the surplus
+        tree = self.tree
+        for k in range(self.attached, min(count, len(self.items))):
+            tree.move(self.items[k], '', k)
+        while len(self.items) < count:
+            self.items.append(tree.insert('', 'end'))
+        if count < self.attached:
+            tree.detach(*self.items[count:self.attached])
+        self.attached = count
+        
+        selected_item = None
+        if self.selected_position is not None and self.top <= self.selected_position < self.top + count:
+            selected_item = self.items[self.selected_position - self.top]
+        for k in range(count):
+            values, tags = self.row_values(self.rows[self.top + k])
+            tree.item(self.items[k], values=values, tags=tags)
+        
+        # The pool never scrolls itself; the view is moved by changing top
+        tree.yview_moveto(0)
+        current = tree.selection()
+        if selected_item is None:
+            if current:
+                tree.selection_remove(*current)
+        elif current != (selected_item,):
+            tree.selection_set(selected_item)
+            tree.focus(selected_item)
+        
+        if self.yscrollcommand:
+            self.yscrollcommand(*self.fractions())
+
+
+# ================================================
+# LOADING SCREEN - UNTUK STARTUP YANG LEBIH SMOOTH
+# ================================================
+
+class LoadingScreen:
+    """Loading screen untuk startup aplikasi"""
+    
+    def __init__(self):
+        self.root = tk.Tk()
+        self.root.title("Loading...")
+        self.root.geometry("400x250")
+        self.root.resizable(False, False)
+        self.root.configure(bg='#2c3e50')
+        self.root.overrideredirect(True)
+        
+        # Create UI first
+        self.create_ui()
+        
+        # Center window after creation
+        self.center_window()
+        
+    def center_window(self):
+        """Center window on screen"""
+        center_window_on_screen(self.root, 400, 250)
+    
+    def create_ui(self):
+        """Create loading UI"""
+        # Icon
+        tk.Label(self.root,
+                text="📊",
+                font=('Segoe UI', 48),
+                bg='#2c3e50',
+                fg='white').pack(pady=(30, 10))
+        
+        # Title
+        tk.Label(self.root,
+                text="Sparepart Management",
+                font=('Segoe UI', 16, 'bold'),
+                bg='#2c3e50',
+                fg='white').pack()
+        
+        tk.Label(self.root,
+                text="with PQT System",
+                font=('Segoe UI', 12),
+                bg='#2c3e50',
+                fg='#bdc3c7').pack()
+        
+        # Status label
+        self.status_label = tk.Label(self.root,
+                                     text="Initializing...",
+                                     font=('Segoe UI', 10),
+                                     bg='#2c3e50',
+                                     fg='#ecf0f1')
+        self.status_label.pack(pady=(20, 10))
+        
+        # Progress bar
+        self.progress = ttk.Progressbar(self.root,
+                                       length=300,
+                                       mode='indeterminate')
+        self.progress.pack(pady=(0, 20))
+        self.progress.start(10)
+    
+    def update_status(self, text):
+        """Update status text"""
+        self.status_label.config(text=text)
+        self.root.update()
+    
+    def close(self):
+        """Close loading screen"""
+        self.progress.stop()
+        self.root.destroy()
+
+
+# ================================================
+# MAIN APPLICATION - OPTIMIZED
+# ================================================
+
+class SparepartApp:
     """Main application with Physical Quantity Tracking - OPTIMIZED"""
     
-    def __init__(self, loading_screen=None):
-        self.loading_screen = loading_screen
-        self.root = tk.Tk()
-        self.root.title("Sparepart Management - PQt System")
-        self.root.geometry("1600x900")
-        self.root.configure(bg='#f5f6fa')
+    def __init__(self, loading_screen=None):
+        self.loading_screen = loading_screen
+        self.root = tk.Tk()
+        self.root.title("Sparepart Management - PQt System")
+        self.root.geometry("1600x900")
+        self.root.configure(bg='#f5f6fa')
+        
+        # Withdraw window during initialization
+        self.root.withdraw()
+        
+        # Modern color scheme
+        self.colors = {
+            'primary': '#2c3e50',
+            'primary_light': '#34495e',
+            'secondary': '#3498db',
+            'accent': '#e74c3c',
+            'success': '#2ecc71',
+            'warning': '#f39c12',
+            'danger': '#c0392b',
+            'light': '#ecf0f1',
+            'dark': '#2c3e50',
+            'gray': '#bdc3c7',
+            'card': '#ffffff',
+        }
+        
+        # Data cache (columnar snapshot; visible_rows are its row indices in display order)
+        self.parts_data_cache = PartsTable()
+        self.visible_rows = []
+        self.selected_spare_id = None
+        
+        # Client-side sorting: [(column, descending), ...], most significant first
+        self.ui_prefs = load_ui_prefs()
+        self.sort_spec = [(col, bool(desc)) for col, desc in self.ui_prefs.get('parts_sort', [])
+                          if col in self.SORT_COLUMNS]
+        self.sort_keys = {}
+        self.row_order = []
+        
+        # Server-side FULLTEXT hits for the search box: spare_id -> rank
+        self.search_hits = None
+        self.search_hits_term = None
+        self.search_truncated = False
+        self.search_job = None
+        self.fulltext_available = True
+        self.items_cache = []
+        self.item_index = PrefixIndex()
+        self.snapshot_watermark = None
+        self.window_shown = False
+        self.parts_loading = False
+        
+        # Low/out-of-stock alerts, kept current by write paths and the delta feed
+        self.alert_index = StockAlertIndex()
+        self.alert_window = None
+        self.rapid_window = None
+        
+        # Moves old stock_usage / stock_movements months to the archive tables
+        self.history_archiver = HistoryArchiver()
+        self.usage_backfill = UsageSpareIdBackfill()
+        
+        # Main-loop watchdog from the start, so slow startup stages are caught too
+        self.stall_monitor = StallMonitor(self.root)
+        self.stall_monitor.start()
+        self.root.bind('<F12>', lambda e: self.open_diagnostics())
+        self.root.bind('<F9>', lambda e: self.open_rapid_issue())
+        
+        # Initialize in stages
+        self.initialize()
+    
+    def initialize(self):
+        """Initialize application in stages"""
+        try:
+            if self.loading_screen:
+                self.loading_screen.update_status("Setting up styles...")
+            self.setup_styles()
+            
+            if self.loading_screen:
+                self.loading_screen.update_status("Creating layout...")
+            self.create_layout()
+            
+            if self.loading_screen:
+                self.loading_screen.update_status("Loading data...")
+            
+            # Paint the last snapshot right away, reconcile it in the background
+            snapshot = SnapshotCache.load()
+            if snapshot:
+                self.parts_data_cache, self.snapshot_watermark = snapshot
+                self.alert_index = StockAlertIndex.build(self.parts_data_cache)
+                self.populate_tree(self.parts_data_cache)
+                self.show_main_window()
+                self.on_alerts_changed()
+            
+            # Load data in background thread
+            self.parts_loading = True
+            self.data_queue = queue.Queue()
+            self.load_thread = Thread(target=self.load_data_background, daemon=True)
+            self.load_thread.start()
+            
+            # Check data loading progress
+            self.check_data_loading()
+            
+        except Exception as e:
+            messagebox.showerror("Initialization Error", f"Failed to initialize: {str(e)}")
+            self.root.destroy()
+    
+    def load_data_background(self):
+        """Load data in background thread"""
+        try:
+            with Database.worker_connection():
+                # Load items for picker and build the prefix index once
+                query = """
+                    SELECT DISTINCT s.spare_name, s.product_number, s.material_type
+                    FROM spareparts s
+                    WHERE s.stock > 0 
+                    ORDER BY s.spare_name
+                """
+                results = Database.execute_query(query, fetch=True, cache=True)
+                
+                if results:
+                    self.data_queue.put(('items', PrefixIndex.build(results)))
+                
+                # Load parts list (delta against the snapshot, else first page then the rest)
+                self.data_queue.put(('parts', self.fetch_parts(
+                    on_first_page=lambda page: self.data_queue.put(('first_page', page)))))
+            
+            # Signal completion
+            self.data_queue.put(('complete', None))
+            
+        except Exception as e:
+            self.data_queue.put(('error', str(e)))
+    
+    def check_data_loading(self):
+        """Check if data loading is complete"""
+        try:
+            while True:
+                msg_type, data = self.data_queue.get_nowait()
+                
+                if msg_type == 'items':
+                    self.item_index = data
+                    self.items_cache = data.search('')
+                    self.item_combo['values'] = self.items_cache
+                    if self.items_cache:
+                        self.item_combo.set(self.items_cache[0])
+                        self.on_item_selected()
+                
+                elif msg_type == 'first_page':
+                    self.parts_data_cache = data
+                    self.populate_tree(self.parts_data_cache)
+                    if not self.window_shown:
+                        self.show_main_window()
+                
+                elif msg_type == 'parts':
+                    self.on_parts_loaded(data)
+                
+                elif msg_type == 'complete':
+                    # Data loading complete
+                    if self.window_shown:
+                        return
+                    if self.loading_screen:
+                        self.loading_screen.update_status("Ready!")
+                        self.root.after(500, self.show_main_window)
+                    else:
+                        self.show_main_window()
+                    return
+                
+                elif msg_type == 'error':
+                    self.parts_loading = False
+                    messagebox.showerror("Data Loading Error", f"Failed to load data: {data}")
+                    if not self.window_shown:
+                        self.show_main_window()
+                    return
+        
+        except queue.Empty:
+            # Keep checking
+            self.root.after(100, self.check_data_loading)
+    
+    def show_main_window(self):
+        """Show main window after loading"""
+        if self.loading_screen:
+            self.loading_screen.close()
+            self.loading_screen = None
+        
+        # Ensure window is centered before showing
+        self.root.update_idletasks()
+        self.center_window()
+        self.root.deiconify()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.window_shown = True
+        
+        # Start the delta feed and, once the UI has settled, the history archiver
+        self.root.after(self.DELTA_POLL_MS, self.poll_delta)
+        self.root.after(self.ARCHIVE_DELAY_MS, self.history_archiver.start)
+        self.root.after(self.ARCHIVE_DELAY_MS, self.usage_backfill.start)
+        Database.start_keepalive()
+    
+    def fetch_parts(self, on_first_page=None, check_deleted: bool = True):
+        """
+        Fetch parts list in a worker thread and refresh the on-disk snapshot
+        
+        Returns (table, watermark, delta); delta is (changed rows, live ids)
+        for a delta refresh and None for a full load.
+        """
+        base_table, since = self.parts_data_cache, self.snapshot_watermark
+        delta = None
+        
+        if since is not None:
+            changed, live_ids, watermark = fetch_parts_delta(since, check_deleted)
+            delta = (changed, live_ids)
+            if not changed and (live_ids is None or len(live_ids) == len(set(base_table.ids))):
+                # Nothing changed: keep the table and the snapshot file as they are
+                return base_table, watermark or since, delta
+            table = merge_parts_delta(base_table, changed, live_ids)
+        else:
+            table, watermark = fetch_parts_snapshot(on_first_page)
+        
+        if watermark is None:
+            # No database answer: keep showing what we have
+            return base_table, since, ([], None)
+        
+        try:
+            SnapshotCache.save(table, watermark)
+        except OSError as e:
+            print(f"Snapshot cache warning: {e}")
+        
+        return table, watermark, delta
+    
+    def populate_tree(self, table: PartsTable):
+        """
+        Show a new columnar snapshot in the parts list
+        
+        Only the visible page is rendered (VirtualTreeview), so this is one
+        sort plus a page of item updates however large the catalog is.
+        """
+        # New snapshot: drop cached sort keys and show rows in the current sort order
+        self.sort_keys = {}
+        self.row_order = self.sorted_rows()
+        
+        # Row indices changed: carry the selection over by spare id
+        selected = None
+        if self.selected_spare_id is not None:
+            try:
+                selected = table.ids.index(self.selected_spare_id)
+            except ValueError:
+                self.selected_spare_id = None
+        self.parts_view.selected = selected
+        
+        # Keep the active filter after a reload
+        if self.filter_var.get() != "all" or self.search_var.get():
+            self.apply_filter()
+        else:
+            self.visible_rows = list(self.row_order)
+            self.parts_view.set_rows(self.visible_rows)
+    
+    def parts_row_values(self, i: int):
+        """VirtualTreeview callback: (values, tags) of snapshot row i"""
+        table = self.parts_data_cache
+        row = table.row(i)
+        code = table.status_codes[i]
+        return ((STATUS_ICONS[code], row.name, row.material, row.sys_qty, row.phy_qty,
+                 format_variance(row.variance), row.rack or "-", row.last_check),
+                STATUS_TAGS[code])
+    
+    def setup_styles(self):
+        """Configure custom styles"""
+        style = ttk.Style()
+        style.theme_use('clam')
+        
+        # Configure colors
+        style.configure('TLabel', background=self.colors['light'])
+        style.configure('TFrame', background=self.colors['light'])
+        
+        # Configure treeview
+        style.configure('Treeview',
+                       background='white',
+                       foreground='black',
+                       fieldbackground='white',
+                       borderwidth=1,
+                       relief='flat')
+        style.map('Treeview', background=[('selected', '#3498db')])
+        
+        style.configure('Treeview.Heading',
+                       background=self.colors['primary_light'],
+                       foreground='white',
+                       relief='flat',
+                       font=('Segoe UI', 10, 'bold'))
+        
+        style.map('Treeview.Heading',
+                 background=[('active', self.colors['primary'])])
+    
+    def create_layout(self):
+        """Create main application layout"""
+        # Header
+        self.create_header()
+        
+        # Main content
+        main_container = tk.PanedWindow(self.root, 
+                                       orient='horizontal', 
+                                       bg=self.colors['light'], 
+                                       sashwidth=10,
+                                       sashrelief='raised',
+                                       sashpad=5)
+        main_container.pack(fill='both', expand=True, padx=10, pady=10)
+        
+        # Left: Input Form
+        form_container = self.create_input_form()
+        main_container.add(form_container, minsize=800, stretch='always')
+        
+        # Right: Parts List
+        list_container = self.create_parts_list()
+        main_container.add(list_container, minsize=700, stretch='always')
+    
+    def create_header(self):
+        """Create application header"""
+        header_frame = tk.Frame(self.root, 
+                               bg=self.colors['primary'], 
+                               height=80)
+        header_frame.pack(fill='x', side='top')
+        header_frame.pack_propagate(False)
+        
+        # Title
+        title_frame = tk.Frame(header_frame, bg=self.colors['primary'])
+        title_frame.pack(side='left', padx=30, pady=20)
+        
+        tk.Label(title_frame,
+                text="📊",
+                font=('Segoe UI', 24),
+                bg=self.colors['primary'],
+                fg='white').pack(side='left', padx=(0, 15))
+        
+        title_label = tk.Label(title_frame,
+                              text="SPAREPART MANAGEMENT WITH PQT",
+                              font=('Segoe UI', 18, 'bold'),
+                              bg=self.colors['primary'],
+                              fg='white')
+        title_label.pack(side='left')
+        
+        # Buttons
+        button_frame = tk.Frame(header_frame, bg=self.colors['primary'])
+        button_frame.pack(side='right', padx=20)
+        
+        buttons = [
+            ("🔐 Admin", self.open_admin_login, self.colors['warning']),
+            ("⚡ Rapid Issue", self.open_rapid_issue, self.colors['primary_light']),
+            ("📋 PQt Check", self.open_pqt_check, self.colors['success']),
+            ("📊 Reports", self.open_reports, self.colors['secondary']),
+            ("🔔 Alerts", self.open_alerts, self.colors['accent']),
+        ]
+        
+        self.header_buttons = {}
+        for text, command, color in buttons:
+            btn = tk.Button(button_frame,
+                           text=text,
+                           command=command,
+                           bg=color,
+                           fg='white',
+                           font=('Segoe UI', 10, 'bold'),
+                           relief='flat',
+                           cursor='hand2',
+                           padx=15,
+                           pady=5,
+                           activebackground=color,
+                           activeforeground='white')
+            btn.pack(side='left', padx=5)
+            self.header_buttons[command.__name__] = btn
+    
+    def create_input_form(self):
+        """Create the input form"""
+        form_container = tk.Frame(self.root, 
+                                 bg=self.colors['card'],
+                                 relief='flat',
+                                 bd=1)
+        
+        # Form title
+        form_header = tk.Frame(form_container, 
+                              bg=self.colors['secondary'], 
+                              height=50)
+        form_header.pack(fill='x', side='top')
+        form_header.pack_propagate(False)
+        
+        tk.Label(form_header,
+                text="📤 PENGAMBILAN SPAREPART (ME)",
+                font=('Segoe UI', 14, 'bold'),
+                bg=self.colors['secondary'],
+                fg='white').pack(pady=13)
+        
+        # Form content
+        form_content = tk.Frame(form_container, bg=self.colors['card'])
+        form_content.pack(fill='both', expand=True, padx=30, pady=30)
+        
+        # Create form fields
+        self.create_form_fields(form_content)
+        
+        # Update time
+        self.update_datetime()
+        
+        return form_container
+    
+    def create_form_fields(self, parent):
+        """Create form input fields"""
+        row = 0
+        
+        # Date & Time
+        tk.Label(parent,
+                text="📅 Date & Time:",
+                font=('Segoe UI', 11, 'bold'),
+                bg=self.colors['card'],
+                fg=self.colors['primary']).grid(row=row, column=0, sticky='w', pady=(0, 10))
+        
+        self.datetime_label = tk.Label(parent,
+                                      text=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                                      font=('Segoe UI', 11),
+                                      bg=self.colors['card'],
+                                      fg=self.colors['dark'])
+        self.datetime_label.grid(row=row, column=1, sticky='w', pady=(0, 10))
+        row += 1
+        
+        ttk.Separator(parent, orient='horizontal').grid(row=row, column=0, 
+                                                       columnspan=2, sticky='ew', 
+                                                       pady=20)
+        row += 1
+        
+        # Item Selection
+        tk.Label(parent,
+                text="🔧 Select Item:",
+                font=('Segoe UI', 11),
+                bg=self.colors['card']).grid(row=row, column=0, sticky='w', pady=(0, 10))
+        
+        self.item_combo = ttk.Combobox(parent,
+                                      font=('Segoe UI', 11),
+                                      width=40)
+        self.item_combo.grid(row=row, column=1, sticky='w', pady=(0, 10))
+        self.item_combo.bind('<<ComboboxSelected>>', self.on_item_selected)
+        self.item_combo.bind('<KeyRelease>', self.on_item_typed)
+        self.item_combo.bind('<Return>', self.on_item_entered)
+        row += 1
+        
+        # Item Details
+        details_frame = tk.LabelFrame(parent, 
+                                     text="Item Details",
+                                     font=('Segoe UI', 10, 'bold'),
+                                     bg=self.colors['card'],
+                                     fg=self.colors['primary'],
+                                     relief='solid',
+                                     bd=1)
+        details_frame.grid(row=row, column=0, columnspan=2, sticky='ew', pady=20)
+        details_frame.grid_columnconfigure(1, weight=1)
+        details_frame.grid_columnconfigure(3, weight=1)
+        
+        # Configure padding for details frame content
+        details_frame_inner = tk.Frame(details_frame, bg=self.colors['card'], padx=15, pady=10)
+        details_frame_inner.pack(fill='both', expand=True)
+        
+        self.create_item_details(details_frame_inner)
+        row += 1
+        
+        # Quantity to take
+        tk.Label(parent,
+                text="➖ Quantity to Take:",
+                font=('Segoe UI', 11),
+                bg=self.colors['card']).grid(row=row, column=0, sticky='w', pady=(20, 5))
+        
+        self.qty_entry = tk.Entry(parent,
+                                 font=('Segoe UI', 12),
+                                 width=15,
+                                 relief='solid',
+                                 bd=2,
+                                 bg='white')
+        self.qty_entry.grid(row=row, column=1, sticky='w', pady=(20, 5))
+        row += 1
+        
+        # Machine Name
+        tk.Label(parent,
+                text="🏭 Machine Name:",
+                font=('Segoe UI', 11),
+                bg=self.colors['card']).grid(row=row, column=0, sticky='w', pady=(15, 5))
+        
+        self.machine_entry = tk.Entry(parent,
+                                     font=('Segoe UI', 12),
+                                     width=30,
+                                     relief='solid',
+                                     bd=2,
+                                     bg='white')
+        self.machine_entry.grid(row=row, column=1, sticky='w', pady=(15, 5))
+        row += 1
+        
+        # Request ID (Optional)
+        tk.Label(parent,
+                text="📝 Request ID (Optional):",
+                font=('Segoe UI', 11),
+                bg=self.colors['card']).grid(row=row, column=0, sticky='w', pady=(15, 5))
+        
+        self.req_entry = tk.Entry(parent,
+                                 font=('Segoe UI', 12),
+                                 width=30,
+                                 relief='solid',
+                                 bd=2,
+                                 bg='white')
+        self.req_entry.grid(row=row, column=1, sticky='w', pady=(15, 5))
+        row += 1
+        
+        # Notes
+        tk.Label(parent,
+                text="📋 Notes:",
+                font=('Segoe UI', 11),
+                bg=self.colors['card']).grid(row=row, column=0, sticky='w', pady=(15, 5))
+        
+        self.notes_text = tk.Text(parent,
+                                 font=('Segoe UI', 11),
+                                 height=4,
+                                 width=40,
+                                 relief='solid',
+                                 bd=2,
+                                 bg='white')
+        self.notes_text.grid(row=row, column=1, sticky='w', pady=(15, 5))
+        row += 1
+        
+        # Button Frame
+        button_frame = tk.Frame(parent, bg=self.colors['card'])
+        button_frame.grid(row=row, column=0, columnspan=2, pady=30)
+        
+        # Submit Button
+        submit_btn = tk.Button(button_frame,
+                              text="✅ SUBMIT PENGAMBILAN",
+                              command=self.submit_transaction,
+                              bg=self.colors['accent'],
+                              fg='white',
+                              font=('Segoe UI', 12, 'bold'),
+                              relief='flat',
+                              cursor='hand2',
+                              height=2,
+                              width=20,
+                              activebackground='#c0392b',
+                              activeforeground='white')
+        submit_btn.pack(side='left', padx=10)
+        
+        # Clear Button
+        clear_btn = tk.Button(button_frame,
+                             text="🗑️ CLEAR FORM",
+                             command=self.clear_form,
+                             bg=self.colors['gray'],
+                             fg='white',
+                             font=('Segoe UI', 11, 'bold'),
+                             relief='flat',
+                             cursor='hand2',
+                             height=2,
+                             width=15,
+                             activebackground='#95a5a6',
+                             activeforeground='white')
+        clear_btn.pack(side='left', padx=10)
+    
+    def create_item_details(self, parent):
+        """Create item details display"""
+        details = [
+            ("Item No:", 'item_no_label', '-', self.colors['primary']),
+            ("Material:", 'material_label', '-', self.colors['primary']),
+            ("System Stock:", 'system_qty_label', '0', self.colors['primary']),
+            ("Physical Qty:", 'physical_qty_label', '0', self.colors['warning']),
+            ("Variance:", 'variance_label', '0', '#6c757d'),
+            ("Rack Location:", 'rack_label', 'Not Assigned', self.colors['success']),
+        ]
+        
+        self.detail_labels = {}
+        
+        for i, (label_text, name, default_value, color) in enumerate(details):
+            row = i
+            col = 0
+            
+            # Label
+            tk.Label(parent,
+                    text=label_text,
+                    font=('Segoe UI', 10, 'bold'),
+                    bg=self.colors['card'],
+                    fg=self.colors['dark']).grid(row=row, column=col, sticky='w', padx=(0, 10), pady=5)
+            
+            # Value
+            value_label = tk.Label(parent,
+                                  text=default_value,
+                                  font=('Segoe UI', 10),
+                                  bg=self.colors['card'],
+                                  fg=color,
+                                  anchor='w',
+                                  width=20)
+            value_label.grid(row=row, column=col+1, sticky='w', pady=5)
+            
+            self.detail_labels[name] = value_label
+    
+    def create_parts_list(self):
+        """Create the parts list with PQt status"""
+        list_container = tk.Frame(self.root, 
+                                 bg=self.colors['card'],
+                                 relief='flat',
+                                 bd=1)
+        
+        # List header
+        list_header = tk.Frame(list_container, 
+                              bg=self.colors['primary_light'], 
+                              height=50)
+        list_header.pack(fill='x', side='top')
+        list_header.pack_propagate(False)
+        
+        tk.Label(list_header,
+                text="📋 INVENTORY STATUS WITH PQT",
+                font=('Segoe UI', 14, 'bold'),
+                bg=self.colors['primary_light'],
+                fg='white').pack(pady=13)
+        
+        # Filter controls
+        self.create_filter_controls(list_container)
+        
+        # Treeview
+        self.create_treeview(list_container)
+        
+        return list_container
+    
+    def create_filter_controls(self, parent):
+        """Create filter controls for parts list"""
+        filter_frame = tk.Frame(parent, bg=self.colors['card'])
+        filter_frame.pack(fill='x', padx=15, pady=15)
+        
+        # Filter label
+        tk.Label(filter_frame,
+                text="Filter by Status:",
+                font=('Segoe UI', 10, 'bold'),
+                bg=self.colors['card']).pack(side='left', padx=(0, 10))
+        
+        # Status filter
+        self.filter_var = tk.StringVar(value="all")
+        statuses = [
+            ("All", "all"),
+            ("✅ In Stock", "in_stock"),
+            ("🟡 Low Stock", "low_stock"),
+            ("🔴 Out of Stock", "out_of_stock"),
+            ("📊 Needs PQt", "needs_pqt"),
+            ("❌ Variance", "variance")
+        ]
+        
+        for text, value in statuses:
+            btn = tk.Radiobutton(filter_frame,
+                                text=text,
+                                variable=self.filter_var,
+                                value=value,
+                                command=self.apply_filter,
+                                bg=self.colors['card'],
+                                font=('Segoe UI', 9),
+                                cursor='hand2',
+                                selectcolor=self.colors['light'])
+            btn.pack(side='left', padx=5)
+        
+        # Search frame
+        search_frame = tk.Frame(parent, bg=self.colors['card'])
+        search_frame.pack(fill='x', padx=15, pady=(0, 15))
+        
+        # Search label
+        tk.Label(search_frame,
+                text="🔍 Search:",
+                font=('Segoe UI', 10, 'bold'),
+                bg=self.colors['card']).pack(side='left', padx=(0, 10))
+        
+        # Search entry
+        self.search_var = tk.StringVar()
+        self.search_var.trace('w', lambda *args: self.on_search_changed())
+        
+        search_entry = tk.Entry(search_frame,
+                               textvariable=self.search_var,
+                               font=('Segoe UI', 11),
+                               width=25,
+                               relief='solid',
+                               bd=2,
+                               bg='white')
+        search_entry.pack(side='left', padx=(0, 10))
+        
+        # Shown when the ranked server search hit SEARCH_LIMIT
+        self.search_info_label = tk.Label(search_frame,
+                                          text="",
+                                          font=('Segoe UI', 9),
+                                          bg=self.colors['card'],
+                                          fg='#7f8c8d')
+        self.search_info_label.pack(side='left')
+        
+        # Buttons
+        btn_frame = tk.Frame(search_frame, bg=self.colors['card'])
+        btn_frame.pack(side='right', fill='x', expand=True)
+        
+        refresh_btn = tk.Button(btn_frame,
+                               text="🔄 Refresh",
+                               command=self.load_parts_list,
+                               bg=self.colors['primary'],
+                               fg='white',
+                               font=('Segoe UI', 9, 'bold'),
+                               relief='flat',
+                               cursor='hand2',
+                               padx=10,
+                               pady=5,
+                               activebackground=self.colors['primary_light'],
+                               activeforeground='white')
+        refresh_btn.pack(side='right', padx=5)
+        
+        export_btn = tk.Button(btn_frame,
+                              text="📥 Export",
+                              command=self.export_data,
+                              bg=self.colors['success'],
+                              fg='white',
+                              font=('Segoe UI', 9, 'bold'),
+                              relief='flat',
+                              cursor='hand2',
+                              padx=10,
+                              pady=5,
+                              activebackground='#27ae60',
+                              activeforeground='white')
+        export_btn.pack(side='right', padx=5)
+    
+    def create_treeview(self, parent):
+        """Create treeview for parts list"""
+        tree_frame = tk.Frame(parent, bg=self.colors['card'])
+        tree_frame.pack(fill='both', expand=True, padx=15, pady=(0, 15))
+        
+        # Create Treeview
+        columns = ('status', 'name', 'material', 'sys_qty', 'phy_qty', 'variance', 'rack', 'last_check')
+        self.parts_view = VirtualTreeview(tree_frame,
+                                          columns,
+                                          self.parts_row_values,
+                                          on_select=self.on_tree_select,
+                                          height=25)
+        self.parts_tree = self.parts_view.tree
+        
+        # Configure columns
+        column_config = [
+            ('status', 'Status', 80, 'center'),
+            ('name', 'Spare Name', 250, 'w'),
+            ('material', 'Material', 120, 'w'),
+            ('sys_qty', 'System Qty', 90, 'center'),
+            ('phy_qty', 'Physical Qty', 90, 'center'),
+            ('variance', 'Variance', 90, 'center'),
+            ('rack', 'Rack', 70, 'center'),
+            ('last_check', 'Last Check', 120, 'center'),
+        ]
+        
+        self.column_headings = {}
+        for col, heading, width, anchor in column_config:
+            self.column_headings[col] = heading
+            self.parts_tree.heading(col, text=heading,
+                                    command=lambda c=col: self.sort_by_column(c))
+            self.parts_tree.column(col, width=width, anchor=anchor, minwidth=50)
+        self.update_sort_headings()
         
-        # Withdraw window during initialization
-        self.root.withdraw()
+        # Scrollbars
+        vsb = ttk.Scrollbar(tree_frame, 
+                           orient='vertical', 
+                           command=self.parts_view.yview)
+        hsb = ttk.Scrollbar(tree_frame, 
+                           orient='horizontal', 
+                           command=self.parts_tree.xview)
+        self.parts_view.yscrollcommand = vsb.set
+        self.parts_tree.configure(xscrollcommand=hsb.set)
         
-        # Modern color scheme
-        self.colors = {
-            'primary': '#2c3e50',
-            'primary_light': '#34495e',
-            'secondary': '#3498db',
-            'accent': '#e74c3c',
-            'success': '#2ecc71',
-            'warning': '#f39c12',
-            'danger': '#c0392b',
-            'light': '#ecf0f1',
-            'dark': '#2c3e50',
-            'gray': '#bdc3c7',
-            'card': '#ffffff',
+        # Layout
+        self.parts_tree.grid(row=0, column=0, sticky='nsew')
+        vsb.grid(row=0, column=1, sticky='ns')
+        hsb.grid(row=1, column=0, sticky='ew')
+        
+        # Configure grid weights
+        tree_frame.grid_rowconfigure(0, weight=1)
+        tree_frame.grid_columnconfigure(0, weight=1)
+        
+        # Configure tags with colors
+        tag_colors = {
+            'match': '#d4edda',
+            'variance': '#fff3cd',
+            'missing': '#f8d7da',
+            'low_stock': '#ffe6cc',
+            'no_check': '#f0f0f0',
         }
         
-        # Data cache
-        self.parts_data_cache = []
-        self.items_cache = []
+        for tag, color in tag_colors.items():
+            self.parts_tree.tag_configure(tag, background=color)
         
-        # Initialize in stages
-        self.initialize()
+        # Selection comes through parts_view's on_select
+        self.parts_tree.bind('<Double-1>', self.on_tree_double_click)
     
-    def initialize(self):
-        """Initialize application in stages"""
+    def update_datetime(self):
+        """Update date time label"""
         try:
-            if self.loading_screen:
-                self.loading_screen.update_status("Setting up styles...")
-            self.setup_styles()
+            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self.datetime_label.config(text=current_time)
+            self.root.after(1000, self.update_datetime)
+        except:
+            pass
+    
+    def load_parts_list(self, check_deleted: bool = True, quiet: bool = False):
+        """Load parts list with PQt data"""
+        if self.parts_loading:
+            return
+        try:
+            # Start background thread for loading
+            self.parts_loading = True
+            Thread(target=self._load_parts_background, args=(check_deleted, quiet), daemon=True).start()
+        except Exception as e:
+            self.parts_loading = False
+            messagebox.showerror("Error", f"Failed to start data loading: {str(e)}")
+    
+    def _load_parts_background(self, check_deleted: bool = True, quiet: bool = False):
+        """Background thread for loading parts"""
+        try:
+            with Database.worker_connection():
+                result = self.fetch_parts(check_deleted=check_deleted)
             
-            if self.loading_screen:
-                self.loading_screen.update_status("Creating layout...")
-            self.create_layout()
+            # Update UI in main thread
+            self.root.after(0, lambda: self.on_parts_loaded(result))
             
-            if self.loading_screen:
-                self.loading_screen.update_status("Loading data...")
+        except Exception as e:
+            self.root.after(0, lambda error=e: self.on_parts_failed(error, quiet))
+    
+    def on_parts_failed(self, error, quiet: bool = False):
+        """Report a failed load in the main thread"""
+        self.parts_loading = False
+        if quiet:
+            print(f"Delta refresh warning: {error}")
+        else:
+            messagebox.showerror("Error", f"Failed to load parts: {str(error)}")
+    
+    def on_parts_loaded(self, result):
+        """Apply a freshly loaded parts list in the main thread"""
+        self.parts_loading = False
+        table, self.snapshot_watermark, delta = result
+        
+        # Alerts: full rebuild only on a full load, otherwise O(changed rows)
+        if delta is None:
+            self.alert_index = StockAlertIndex.build(table)
+            self.on_alerts_changed()
+        else:
+            if self.alert_index.apply_rows(*delta):
+                self.on_alerts_changed()
+            self.update_item_index(self.parts_data_cache, *delta)
+        
+        if table is not self.parts_data_cache:
+            self.parts_data_cache = table
+            self.populate_tree(self.parts_data_cache)
+    
+    def note_stock_changes(self, changes: dict):
+        """
+        Apply this station's committed writes to the alert index right away
+        
+        changes maps spare_id -> (name, stock, min_stock), as returned by
+        apply_adjustments; other stations' writes arrive with the delta feed.
+        """
+        changed = False
+        for spare_id, (name, stock, min_stock) in changes.items():
+            changed |= self.alert_index.update(spare_id, name, stock, min_stock or 0)
+        if changed:
+            self.on_alerts_changed()
+    
+    def update_item_index(self, old_table: PartsTable, rows, live_ids: Optional[set] = None):
+        """
+        Keep the picker's in-stock index in step with changed PARTS_COLUMNS rows
+        
+        Restocked spares come back, spares at 0 or deleted go, and renamed
+        spares lose their old name. old_table is the snapshot before the rows.
+        """
+        if not rows and live_ids is None:
+            return
+        changed_ids = {row[0] for row in rows}
+        for spare_id, name in zip(old_table.ids, old_table.names):
+            if spare_id in changed_ids or (live_ids is not None and spare_id not in live_ids):
+                self.item_index.remove(name)
+        for row in rows:
+            if (row[3] or 0) > 0:
+                self.item_index.add(row[1], row[11] if len(row) > 11 else None, row[2])
+        self.on_item_typed()
+    
+    def poll_delta(self):
+        """Delta feed: pick up other workstations' changes every DELTA_POLL_MS"""
+        if self.snapshot_watermark is not None:
+            self.load_parts_list(check_deleted=False, quiet=True)
+        self.root.after(self.DELTA_POLL_MS, self.poll_delta)
+    
+    def on_search_changed(self):
+        """Search box edit: filter locally now, ask the FULLTEXT index once typing pauses"""
+        self.apply_filter()
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+            self.search_job = None
+        if self.fulltext_available and fulltext_terms(self.search_var.get())[0]:
+            self.search_job = self.root.after(self.SEARCH_DEBOUNCE_MS, self.run_search)
+    
+    def run_search(self):
+        """Run the server-side search for the current text in a worker thread"""
+        self.search_job = None
+        term = self.search_var.get()
+        Thread(target=self._search_background, args=(term,), daemon=True).start()
+    
+    def _search_background(self, term: str):
+        try:
+            with Database.worker_connection():
+                ids = search_catalog(term)
+            self.root.after(0, lambda: self.on_search_results(term, ids))
+        except Exception as e:
+            self.root.after(0, lambda error=e: self.on_search_failed(error))
+    
+    def on_search_results(self, term: str, ids):
+        """Apply ranked hits if the search text hasn't moved on meanwhile"""
+        if term != self.search_var.get() or ids is None:
+            return
+        self.search_hits = {spare_id: rank for rank, spare_id in enumerate(ids)}
+        self.search_hits_term = term
+        self.search_truncated = len(ids) >= SEARCH_LIMIT
+        self.apply_filter()
+    
+    def on_search_failed(self, error):
+        # No FULLTEXT index (migration not applied yet): stay on the local filter
+        if getattr(error, 'errno', None) == FULLTEXT_MISSING_ERRNO:
+            self.fulltext_available = False
+        print(f"Catalog search warning: {error}")
+    
+    def apply_filter(self):
+        """
+        Apply filter to parts list - reads the columnar snapshot
+        
+        Rows match the search by local substring or, once the server has
+        answered for the current text, by FULLTEXT hit. Unless a column sort
+        is active, ranked hits come first and local-only matches follow.
+        """
+        filter_type = self.filter_var.get()
+        search_text = self.search_var.get()
+        search_term = search_text.lower()
+        table = self.parts_data_cache
+        hits = self.search_hits if search_text and self.search_hits_term == search_text else None
+        
+        # Collect matching rows in the current sort order
+        matching = []
+        ids = table.ids
+        names = table.names
+        materials = table.material.values
+        material_codes = table.material_codes
+        
+        for i in self.row_order:
+            # Apply search filter: fragments like "205" only match locally,
+            # product numbers and multi-word queries only via the server
+            if search_term and (search_term not in (names[i] or "").lower() and
+                                search_term not in (materials[material_codes[i]] or "").lower() and
+                                (hits is None or ids[i] not in hits)):
+                continue
             
-            # Load data in background thread
-            self.data_queue = queue.Queue()
-            self.load_thread = Thread(target=self.load_data_background, daemon=True)
-            self.load_thread.start()
+            # Apply type filter
+            if self.should_show_item(filter_type, table.status_codes[i]):
+                matching.append(i)
+        
+        if hits is not None and not self.sort_spec:
+            unranked = len(hits)
+            matching.sort(key=lambda i: hits.get(ids[i], unranked))
+        
+        self.search_info_label.config(
+            text=f"Ranked search shows the top {SEARCH_LIMIT} - refine to see more"
+            if hits is not None and self.search_truncated else "")
+        self.visible_rows = matching
+        self.parts_view.set_rows(matching)
+    
+    # Delta feed interval for changes made at other workstations
+    DELTA_POLL_MS = 15000
+    SEARCH_DEBOUNCE_MS = 250
+    ARCHIVE_DELAY_MS = 60000
+    
+    # Columns that can be sorted client-side (the Status heading restores default order)
+    SORT_COLUMNS = ('name', 'material', 'sys_qty', 'phy_qty', 'variance', 'rack', 'last_check')
+    MAX_SORT_COLUMNS = 3
+    
+    def get_sort_keys(self, column: str):
+        """Cached sort keys for a column of the current snapshot"""
+        keys = self.sort_keys.get(column)
+        if keys is None:
+            keys = self.sort_keys[column] = build_sort_keys(self.parts_data_cache, column)
+        return keys
+    
+    def sorted_rows(self) -> List[int]:
+        """Row indices in sort order; stable on top of the default (status, name) order"""
+        order = list(range(len(self.parts_data_cache)))
+        for column, descending in reversed(self.sort_spec):
+            order.sort(key=self.get_sort_keys(column).__getitem__, reverse=descending)
+        return order
+    
+    def sort_by_column(self, column: str):
+        """Heading click: sort by column, toggling direction when already primary"""
+        if column not in self.SORT_COLUMNS:
+            self.sort_spec = []
+        else:
+            descending = bool(self.sort_spec) and self.sort_spec[0] == (column, False)
+            others = [spec for spec in self.sort_spec if spec[0] != column]
+            self.sort_spec = ([(column, descending)] + others)[:self.MAX_SORT_COLUMNS]
+        
+        self.update_sort_headings()
+        self.ui_prefs['parts_sort'] = self.sort_spec
+        save_ui_prefs(self.ui_prefs)
+        
+        # Re-order the visible rows; only the current page is re-rendered
+        self.row_order = self.sorted_rows()
+        visible = set(self.visible_rows)
+        self.visible_rows = [i for i in self.row_order if i in visible]
+        self.parts_view.set_rows(self.visible_rows)
+    
+    def update_sort_headings(self):
+        """Show sort direction arrows on sorted headings"""
+        ranks = {col: (rank, desc) for rank, (col, desc) in enumerate(self.sort_spec)}
+        for col, heading in self.column_headings.items():
+            if col in ranks:
+                rank, descending = ranks[col]
+                heading += " ▼" if descending else " ▲"
+                if len(self.sort_spec) > 1:
+                    heading += str(rank + 1)
+            self.parts_tree.heading(col, text=heading)
+    
+    # Status codes shown by each filter button
+    FILTER_STATUS_CODES = {
+        "in_stock": (STATUS_MATCH,),
+        "low_stock": (STATUS_LOW,),
+        "out_of_stock": (STATUS_MISSING,),
+        "needs_pqt": (STATUS_NO_CHECK,),
+        "variance": (STATUS_VARIANCE, STATUS_UNVERIFIED),
+    }
+    
+    def should_show_item(self, filter_type: str, status: int) -> bool:
+        """Determine if item should be shown based on filter"""
+        if filter_type == "all":
+            return True
+        return status in self.FILTER_STATUS_CODES.get(filter_type, ())
+    
+    def on_item_selected(self, event=None):
+        """When item is selected from combobox"""
+        item_name = self.item_combo.get()
+        if not item_name:
+            return
+        
+        try:
+            row = lookup_item(item_name)
             
-            # Check data loading progress
-            self.check_data_loading()
+            if row:
+                spare_id, product_no, material, sys_qty, phy_qty, variance, rack, min_stock = row
+                
+                # Update details labels
+                self.detail_labels['item_no_label'].config(text=product_no or "-")
+                self.detail_labels['material_label'].config(text=material or "-")
+                self.detail_labels['system_qty_label'].config(text=str(sys_qty))
+                self.detail_labels['physical_qty_label'].config(text=str(phy_qty))
+                
+                # Variance display with color
+                variance_display = format_variance(variance)
+                variance_label = self.detail_labels['variance_label']
+                variance_label.config(text=variance_display)
+                
+                if variance > 0:
+                    variance_label.config(fg="#28a745", font=('Segoe UI', 10, 'bold'))
+                elif variance < 0:
+                    variance_label.config(fg="#dc3545", font=('Segoe UI', 10, 'bold'))
+                else:
+                    variance_label.config(fg="#6c757d", font=('Segoe UI', 10))
+                
+                self.detail_labels['rack_label'].config(text=rack if rack else "Not Assigned")
+                
+                # Highlight if low stock
+                sys_qty_label = self.detail_labels['system_qty_label']
+                if sys_qty <= min_stock:
+                    sys_qty_label.config(fg=self.colors['warning'], font=('Segoe UI', 10, 'bold'))
+                else:
+                    sys_qty_label.config(fg=self.colors['primary'], font=('Segoe UI', 10))
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load item details: {str(e)}")
+    
+    def on_item_typed(self, event=None):
+        """Narrow picker values to the top prefix matches while typing"""
+        if event is not None and event.keysym in ('Up', 'Down', 'Return', 'Escape', 'Tab'):
+            return
+        
+        self.items_cache = self.item_index.search(self.item_combo.get())
+        self.item_combo['values'] = self.items_cache
+    
+    def on_item_entered(self, event=None):
+        """Pick the typed item, or the best match when it is only a prefix"""
+        text = self.item_combo.get().strip()
+        if text and text not in self.item_index:
+            matches = self.item_index.search(text, limit=1)
+            if not matches:
+                return
+            self.item_combo.set(matches[0])
+        self.on_item_selected()
+    
+    def on_tree_select(self, i: int):
+        """When snapshot row i is selected in the parts list"""
+        table = self.parts_data_cache
+        self.selected_spare_id = table.ids[i]
+        
+        self.item_combo.set(table.names[i])
+        self.on_item_selected()
+    
+    def on_tree_double_click(self, event):
+        """Handle double-click on treeview item: select it and open its history"""
+        i = self.parts_view.row_at(event.y)
+        if i is None:
+            return
+        if i != self.parts_view.selected:
+            self.parts_view.select(i)
+            self.on_tree_select(i)
+        MovementHistoryWindow(self, self.parts_data_cache.ids[i], self.parts_data_cache.names[i])
+    
+    def submit_transaction(self):
+        """Submit pengambilan sparepart with PQt tracking"""
+        # Get values
+        item_name = self.item_combo.get()
+        qty_str = self.qty_entry.get().strip()
+        machine_name = self.machine_entry.get().strip()
+        req_id = self.req_entry.get().strip()
+        notes = self.notes_text.get("1.0", tk.END).strip()
+        
+        # Validation
+        if not all([item_name, qty_str, machine_name]):
+            messagebox.showwarning("Validation", 
+                                 "Please fill Item Name, Qty, and Machine Name!")
+            return
+        
+        # Validate quantity
+        is_valid, qty_used, error_msg = validate_integer(qty_str)
+        if not is_valid:
+            messagebox.showwarning("Validation", error_msg)
+            self.qty_entry.focus_set()
+            return
+        
+        try:
+            conn = Database.get_connection()
+            if not conn:
+                messagebox.showerror("Error", "Database connection failed!")
+                return
+            
+            spare_id, item_name, _, current_stock, new_stock, min_stock = issue_spare(
+                conn, qty_used, machine_name, notes, spare_name=item_name)
+            
+            # Keep picker index in step with in-stock items
+            if new_stock == 0:
+                self.item_index.remove(item_name)
+                self.on_item_typed()
+            
+            # Alerts update from the write itself, not the next reload
+            if self.alert_index.update(spare_id, item_name, new_stock, min_stock):
+                self.on_alerts_changed()
+            
+            # Success message
+            success_msg = (
+                f"✅ Sparepart taken successfully!\n\n"
+                f"• Item: {item_name}\n"
+                f"• Qty Taken: {qty_used}\n"
+                f"• System Stock: {current_stock} → {new_stock}\n"
+                f"• Machine: {machine_name}"
+            )
+            messagebox.showinfo("Success", success_msg)
+            
+            # Clear form and refresh data
+            self.clear_form()
+            self.load_parts_list()
             
+        except LookupError:
+            messagebox.showerror("Error", "Item not found!")
+        except InsufficientStockError as e:
+            messagebox.showerror("Insufficient Stock",
+                               f"Not enough system stock!\n\n"
+                               f"System Stock: {e.stock}\n"
+                               f"Requested: {e.requested}")
+        except mysql.connector.Error as e:
+            messagebox.showerror("Database Error", f"Transaction failed: {str(e)}")
         except Exception as e:
-            messagebox.showerror("Initialization Error", f"Failed to initialize: {str(e)}")
+            messagebox.showerror("Error", f"Transaction failed: {str(e)}")
+    
+    def clear_form(self):
+        """Clear form fields"""
+        self.qty_entry.delete(0, tk.END)
+        self.machine_entry.delete(0, tk.END)
+        self.req_entry.delete(0, tk.END)
+        self.notes_text.delete("1.0", tk.END)
+        self.qty_entry.focus_set()
+    
+    def open_admin_login(self):
+        """Open admin login"""
+        AdminLoginWindow(self).run()
+    
+    def open_rapid_issue(self):
+        """Open scanner-driven rapid issue mode"""
+        if self.rapid_window and self.rapid_window.root.winfo_exists():
+            self.rapid_window.root.lift()
+            return
+        self.rapid_window = RapidIssueWindow(self)
+    
+    def open_diagnostics(self):
+        """Open main-loop stall diagnostics"""
+        DiagnosticsWindow(self)
+    
+    def open_alerts(self):
+        """Open stock alert panel"""
+        if self.alert_window and self.alert_window.root.winfo_exists():
+            self.alert_window.root.lift()
+            return
+        self.alert_window = StockAlertWindow(self)
+    
+    def on_alerts_changed(self):
+        """Refresh alert count and the open alert panel"""
+        button = self.header_buttons.get('open_alerts')
+        if button:
+            count = len(self.alert_index)
+            button.config(text=f"🔔 Alerts ({count})" if count else "🔔 Alerts")
+        if self.alert_window and self.alert_window.root.winfo_exists():
+            self.alert_window.refresh()
+    
+    def open_pqt_check(self):
+        """Open PQt check window"""
+        messagebox.showinfo("PQt Check", "PQt Check feature coming soon!")
+    
+    def open_reports(self):
+        """Open reports"""
+        ReportsWindow(self)
+    
+    def export_data(self):
+        """Export the filtered parts list to CSV"""
+        path = filedialog.asksaveasfilename(
+            parent=self.root,
+            title="Export Parts List",
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv")],
+            initialfile=f"parts_{datetime.now().strftime('%Y%m%d_%H%M')}.csv")
+        if not path:
+            return
+        
+        table = self.parts_data_cache
+        try:
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(["Status", "Spare Name", "Material", "System Qty", "Physical Qty",
+                                 "Variance", "Rack", "Last Check", "Min Stock", "PQt Status"])
+                for i in self.visible_rows:
+                    row = table.row(i)
+                    writer.writerow([STATUS_ICONS[table.status_codes[i]], row.name, row.material or "",
+                                     row.sys_qty, row.phy_qty, format_variance(row.variance),
+                                     row.rack or "", row.last_check, row.min_stock, row.pqt_status])
+            messagebox.showinfo("Export", f"Exported {len(self.visible_rows)} rows to:\n{path}")
+        except OSError as e:
+            messagebox.showerror("Export", f"Export failed: {str(e)}")
+    
+    def center_window(self):
+        """Center window on screen"""
+        center_window_on_screen(self.root)
+    
+    def on_closing(self):
+        """Handle window closing"""
+        if messagebox.askokcancel("Quit", "Do you want to quit?"):
+            self.history_archiver.stop()
+            self.usage_backfill.stop()
+            self.stall_monitor.stop()
+            self.stall_monitor.dump()
+            shutdown_report_pool()
+            Database.close_connection()
             self.root.destroy()
     
-    def load_data_background(self):
-        """Load data in background thread"""
+    def run(self):
+        """Run application"""
         try:
-            # Load items for combo
-            query = """
-                SELECT DISTINCT s.spare_name 
-                FROM spareparts s
-                WHERE s.stock > 0 
-                ORDER BY s.spare_name
-            """
-            results = Database.execute_query(query, fetch=True)
-            
-            if results:
-                items = [row[0] for row in results]
-                self.data_queue.put(('items', items))
-            
-            # Load parts list
-            query = """
-                SELECT 
-                    s.id,
-                    s.spare_name,
-                    s.material_type,
-                    s.stock as system_qty,
-                    COALESCE(p.physical_qty, s.stock) as physical_qty,
-                    COALESCE(p.variance, 0) as variance,
-                    s.rack_location,
-                    COALESCE(DATE_FORMAT(p.check_date, '%Y-%m-%d'), 'Never') as last_check,
-                    s.min_stock,
-                    COALESCE(p.status, 'Pending') as pqt_status
-                FROM spareparts s
-                LEFT JOIN physical_quantity p ON s.id = p.spare_id
-                ORDER BY 
-                    CASE 
-                        WHEN s.stock = 0 THEN 1
-                        WHEN COALESCE(p.variance, 0) != 0 THEN 2
-                        WHEN s.stock <= s.min_stock AND s.stock > 0 THEN 3
-                        ELSE 4
-                    END,
-                    s.spare_name
-            """
-            results = Database.execute_query(query, fetch=True)
-            
-            if results:
-                self.data_queue.put(('parts', results))
-            
-            # Signal completion
-            self.data_queue.put(('complete', None))
-            
+            self.root.mainloop()
         except Exception as e:
-            self.data_queue.put(('error', str(e)))
+            messagebox.showerror("Error", f"Application error: {str(e)}")
+        finally:
+            Database.close_connection()
+
+
+# ================================================
+# ADMIN LOGIN WINDOW
+# ================================================
+
+class AdminLoginWindow:
+    """Admin login window"""
     
-    def check_data_loading(self):
-        """Check if data loading is complete"""
-        try:
-            while True:
-                msg_type, data = self.data_queue.get_nowait()
-                
-                if msg_type == 'items':
-                    self.items_cache = data
-                    self.item_combo['values'] = data
-                    if data:
-                        self.item_combo.set(data[0])
-                        self.on_item_selected()
-                
-                elif msg_type == 'parts':
-                    self.parts_data_cache = data
-                    self.populate_tree(data)
-                
-                elif msg_type == 'complete':
-                    # Data loading complete
-                    if self.loading_screen:
-                        self.loading_screen.update_status("Ready!")
-                        self.root.after(500, self.show_main_window)
-                    else:
-                        self.show_main_window()
-                    return
-                
-                elif msg_type == 'error':
-                    messagebox.showerror("Data Loading Error", f"Failed to load data: {data}")
-                    self.show_main_window()
-                    return
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.root = tk.Toplevel() if parent else tk.Tk()
+        self.root.title("🔐 ADMIN ACCESS")
+        self.root.geometry("500x500")
+        self.root.resizable(False, False)
+        self.root.configure(bg='#f5f6fa')
         
-        except queue.Empty:
-            # Keep checking
-            self.root.after(100, self.check_data_loading)
-    
-    def show_main_window(self):
-        """Show main window after loading"""
-        if self.loading_screen:
-            self.loading_screen.close()
+        if parent:
+            self.root.transient(parent.root)
+            self.root.grab_set()
         
-        # Ensure window is centered before showing
+        # Create UI first
+        self.create_ui()
+        
+        # Force center after all widgets are created
         self.root.update_idletasks()
         self.center_window()
+        
+        # Ensure window is visible and centered
         self.root.deiconify()
-        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.root.lift()
+        self.root.focus_force()
     
-    def populate_tree(self, data):
-        """Populate treeview with data"""
-        self.parts_tree.delete(*self.parts_tree.get_children())
-        
-        for row in data:
-            spare_id, name, material, sys_qty, phy_qty, variance, rack, last_check, min_stock, pqt_status = row
-            
-            status_icon, tags = get_status_info(sys_qty, phy_qty, variance, min_stock, pqt_status)
-            
-            self.parts_tree.insert('', 'end',
-                values=(status_icon, name, material, sys_qty, phy_qty, 
-                       format_variance(variance), rack or "-", last_check),
-                tags=tags)
+    def center_window(self):
+        """Center window on screen"""
+        center_window_on_screen(self.root, 500, 500)
     
-    def setup_styles(self):
-        """Configure custom styles"""
-        style = ttk.Style()
-        style.theme_use('clam')
+    def create_ui(self):
+        """Create login UI"""
+        main_frame = tk.Frame(self.root, bg='#f5f6fa')
+        main_frame.pack(fill='both', expand=True, padx=20, pady=20)
         
-        # Configure colors
-        style.configure('TLabel', background=self.colors['light'])
-        style.configure('TFrame', background=self.colors['light'])
+        # Header
+        header_frame = tk.Frame(main_frame, bg='#2c3e50', height=120)
+        header_frame.pack(fill='x', pady=(0, 20))
+        header_frame.pack_propagate(False)
         
-        # Configure treeview
-        style.configure('Treeview',
-                       background='white',
-                       foreground='black',
-                       fieldbackground='white',
-                       borderwidth=1,
-                       relief='flat')
-        style.map('Treeview', background=[('selected', '#3498db')])
+        title_frame = tk.Frame(header_frame, bg='#2c3e50')
+        title_frame.pack(expand=True)
         
-        style.configure('Treeview.Heading',
-                       background=self.colors['primary_light'],
-                       foreground='white',
-                       relief='flat',
-                       font=('Segoe UI', 10, 'bold'))
+        tk.Label(title_frame,
+                text="🔐",
+                font=('Segoe UI', 36),
+                bg='#2c3e50',
+                fg='white').pack()
         
-        style.map('Treeview.Heading',
-                 background=[('active', self.colors['primary'])])
-    
-    def create_layout(self):
-        """Create main application layout"""
-        # Header
-        self.create_header()
+        tk.Label(title_frame,
+                text="ADMIN ACCESS",
+                font=('Segoe UI', 20, 'bold'),
+                bg='#2c3e50',
+                fg='white').pack(pady=(5, 0))
         
-        # Main content
-        main_container = tk.PanedWindow(self.root, 
-                                       orient='horizontal', 
-                                       bg=self.colors['light'], 
-                                       sashwidth=10,
-                                       sashrelief='raised',
-                                       sashpad=5)
-        main_container.pack(fill='both', expand=True, padx=10, pady=10)
+        tk.Label(title_frame,
+                text="Secure Administrative Login",
+                font=('Segoe UI', 11),
+                bg='#2c3e50',
+                fg='#bdc3c7').pack()
+        
+        # Login form
+        form_frame = tk.Frame(main_frame, bg='white', padx=30, pady=30)
+        form_frame.pack(fill='both', expand=True)
+        
+        # Username
+        tk.Label(form_frame,
+                text="Username",
+                font=('Segoe UI', 11, 'bold'),
+                bg='white',
+                fg='#2c3e50').pack(anchor='w', pady=(0, 5))
+        
+        self.username_entry = tk.Entry(form_frame,
+                                      font=('Segoe UI', 12),
+                                      width=30,
+                                      relief='solid',
+                                      bd=2)
+        self.username_entry.pack(fill='x', pady=(0, 20))
+        
+        # Password
+        tk.Label(form_frame,
+                text="Password",
+                font=('Segoe UI', 11, 'bold'),
+                bg='white',
+                fg='#2c3e50').pack(anchor='w', pady=(0, 5))
+        
+        password_frame = tk.Frame(form_frame, bg='white')
+        password_frame.pack(fill='x', pady=(0, 20))
+        
+        self.password_var = tk.StringVar()
+        self.password_entry = tk.Entry(password_frame,
+                                      textvariable=self.password_var,
+                                      font=('Segoe UI', 12),
+                                      width=30,
+                                      show='•',
+                                      relief='solid',
+                                      bd=2)
+        self.password_entry.pack(side='left', fill='x', expand=True)
+        
+        self.show_password = False
+        self.toggle_btn = tk.Button(password_frame,
+                                   text="👁️",
+                                   command=self.toggle_password,
+                                   bg='#ecf0f1',
+                                   fg='#7f8c8d',
+                                   font=('Segoe UI', 10),
+                                   relief='flat',
+                                   cursor='hand2',
+                                   width=4)
+        self.toggle_btn.pack(side='right', padx=(10, 0))
+        
+        # Error label
+        self.error_label = tk.Label(form_frame,
+                                   text="",
+                                   font=('Segoe UI', 10),
+                                   bg='white',
+                                   fg='#e74c3c',
+                                   height=2)
+        self.error_label.pack(fill='x', pady=(0, 10))
+        
+        # Login button
+        self.login_btn = tk.Button(form_frame,
+                                  text="🔓 LOGIN",
+                                  command=self.do_login,
+                                  bg='#3498db',
+                                  fg='white',
+                                  font=('Segoe UI', 12, 'bold'),
+                                  relief='flat',
+                                  cursor='hand2',
+                                  height=2,
+                                  width=20)
+        self.login_btn.pack(pady=(0, 20))
+        
+        # Footer
+        footer_frame = tk.Frame(main_frame, bg='#f5f6fa')
+        footer_frame.pack(fill='x')
+        
+        if self.parent:
+            back_btn = tk.Button(footer_frame,
+                                text="← Back to Main",
+                                command=self.back_to_main,
+                                bg='#95a5a6',
+                                fg='white',
+                                font=('Segoe UI', 10),
+                                relief='flat',
+                                cursor='hand2',
+                                padx=15,
+                                pady=8)
+            back_btn.pack()
+        
+        self.username_entry.focus_set()
+        self.password_entry.bind('<Return>', lambda e: self.do_login())
+        self.root.bind('<Escape>', lambda e: self.root.destroy())
+    
+    def toggle_password(self):
+        """Toggle password visibility"""
+        self.show_password = not self.show_password
+        if self.show_password:
+            self.password_entry.config(show='')
+            self.toggle_btn.config(text="🙈")
+        else:
+            self.password_entry.config(show='•')
+            self.toggle_btn.config(text="👁️")
+    
+    def do_login(self):
+        """Authenticate admin"""
+        username = self.username_entry.get().strip()
+        password = self.password_entry.get()
         
-        # Left: Input Form
-        form_container = self.create_input_form()
-        main_container.add(form_container, minsize=800, stretch='always')
+        self.error_label.config(text="")
         
-        # Right: Parts List
-        list_container = self.create_parts_list()
-        main_container.add(list_container, minsize=700, stretch='always')
-    
-    def create_header(self):
-        """Create application header"""
-        header_frame = tk.Frame(self.root, 
-                               bg=self.colors['primary'], 
-                               height=80)
-        header_frame.pack(fill='x', side='top')
-        header_frame.pack_propagate(False)
+        if not username:
+            self.error_label.config(text="⚠️ Please enter username")
+            self.username_entry.focus_set()
+            return
         
-        # Title
-        title_frame = tk.Frame(header_frame, bg=self.colors['primary'])
-        title_frame.pack(side='left', padx=30, pady=20)
+        if not password:
+            self.error_label.config(text="⚠️ Please enter password")
+            self.password_entry.focus_set()
+            return
         
-        tk.Label(title_frame,
-                text="📊",
-                font=('Segoe UI', 24),
-                bg=self.colors['primary'],
-                fg='white').pack(side='left', padx=(0, 15))
+        # Simple authentication
+        valid_users = {
+            "admin": "admin123",
+            "user": "user123",
+            "me": "me123"
+        }
         
-        title_label = tk.Label(title_frame,
-                              text="SPAREPART MANAGEMENT WITH PQT",
-                              font=('Segoe UI', 18, 'bold'),
-                              bg=self.colors['primary'],
-                              fg='white')
-        title_label.pack(side='left')
+        if username in valid_users and valid_users[username] == password:
+            self.error_label.config(text="✅ Login successful!", fg='#27ae60')
+            self.login_btn.config(text="✅ ACCESS GRANTED", bg='#27ae60')
+            self.root.after(1000, self.login_successful)
+        else:
+            self.error_label.config(text="❌ Invalid username or password")
+            self.password_entry.delete(0, tk.END)
+            self.password_entry.focus_set()
+    
+    def login_successful(self):
+        """Handle successful login: open the catalog editor"""
+        self.root.destroy()
+        if self.parent:
+            AdminCatalogWindow(self.parent)
+        else:
+            messagebox.showinfo("Admin Access", "Welcome to Admin Panel!")
+    
+    def back_to_main(self):
+        """Return to main application"""
+        self.root.destroy()
+        if self.parent:
+            self.parent.root.deiconify()
+    
+    def run(self):
+        """Run login window"""
+        self.root.mainloop()
+
+
+# ================================================
+# ADMIN CATALOG EDITOR
+# ================================================
+
+class AdminCatalogWindow:
+    """Bulk editor for spare names, materials, min stock and rack locations"""
+    
+    # Tree columns: (column, heading, width, index into CATALOG_EDIT_COLUMNS or None)
+    COLUMNS = [
+        ('product_no', 'Product No', 120, None),
+        ('name', 'Spare Name', 280, 0),
+        ('material', 'Material', 150, 1),
+        ('min_stock', 'Min Stock', 90, 2),
+        ('rack', 'Rack', 120, 3),
+    ]
+    
+    def __init__(self, app):
+        self.app = app
+        self.product_nos = {}   # spare_id -> product number (read-only)
+        self.values = {}        # spare_id -> edited values, CATALOG_EDIT_COLUMNS order
+        self.original = {}      # spare_id -> values as last loaded/saved
+        self.versions = {}      # spare_id -> catalog_version as last loaded/saved
+        self.dirty = set()
+        self.editor = None
+        self.saving = False
         
-        # Buttons
-        button_frame = tk.Frame(header_frame, bg=self.colors['primary'])
-        button_frame.pack(side='right', padx=20)
+        self.root = tk.Toplevel(app.root)
+        self.root.title("🛠 CATALOG EDITOR")
+        self.root.geometry("900x600")
+        self.root.configure(bg='#f5f6fa')
+        self.root.transient(app.root)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
-        buttons = [
-            ("🔐 Admin", self.open_admin_login, self.colors['warning']),
-            ("📋 PQt Check", self.open_pqt_check, self.colors['success']),
-            ("📊 Reports", self.open_reports, self.colors['secondary']),
-        ]
+        self.create_ui()
         
-        for text, command, color in buttons:
-            btn = tk.Button(button_frame,
-                           text=text,
-                           command=command,
-                           bg=color,
-                           fg='white',
-                           font=('Segoe UI', 10, 'bold'),
-                           relief='flat',
-                           cursor='hand2',
-                           padx=15,
-                           pady=5,
-                           activebackground=color,
-                           activeforeground='white')
-            btn.pack(side='left', padx=5)
+        self.root.update_idletasks()
+        center_window_on_screen(self.root, 900, 600)
+        
+        Thread(target=self._load_background, daemon=True).start()
     
-    def create_input_form(self):
-        """Create the input form"""
-        form_container = tk.Frame(self.root, 
-                                 bg=self.colors['card'],
-                                 relief='flat',
-                                 bd=1)
+    def create_ui(self):
+        """Create editor UI"""
+        header_frame = tk.Frame(self.root, bg='#2c3e50', height=50)
+        header_frame.pack(fill='x')
+        header_frame.pack_propagate(False)
         
-        # Form title
-        form_header = tk.Frame(form_container, 
-                              bg=self.colors['secondary'], 
-                              height=50)
-        form_header.pack(fill='x', side='top')
-        form_header.pack_propagate(False)
+        tk.Label(header_frame,
+                text="🛠 CATALOG EDITOR - double-click a cell to edit",
+                font=('Segoe UI', 12, 'bold'),
+                bg='#2c3e50',
+                fg='white').pack(pady=12)
         
-        tk.Label(form_header,
-                text="📤 PENGAMBILAN SPAREPART (ME)",
-                font=('Segoe UI', 14, 'bold'),
-                bg=self.colors['secondary'],
-                fg='white').pack(pady=13)
+        toolbar = tk.Frame(self.root, bg='#f5f6fa')
+        toolbar.pack(fill='x', padx=10, pady=(10, 0))
         
-        # Form content
-        form_content = tk.Frame(form_container, bg=self.colors['card'])
-        form_content.pack(fill='both', expand=True, padx=30, pady=30)
+        tk.Label(toolbar, text="Search:", font=('Segoe UI', 9), bg='#f5f6fa').pack(side='left')
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add('write', lambda *args: self.apply_filter())
+        tk.Entry(toolbar, textvariable=self.search_var, font=('Segoe UI', 9), width=30).pack(side='left', padx=5)
         
-        # Create form fields
-        self.create_form_fields(form_content)
+        self.save_btn = tk.Button(toolbar,
+                                  text="💾 Save",
+                                  command=self.save,
+                                  bg='#27ae60',
+                                  fg='white',
+                                  font=('Segoe UI', 9, 'bold'),
+                                  relief='flat',
+                                  cursor='hand2',
+                                  padx=10,
+                                  pady=5,
+                                  state='disabled')
+        self.save_btn.pack(side='right')
         
-        # Update time
-        self.update_datetime()
+        self.revert_btn = tk.Button(toolbar,
+                                    text="↺ Revert",
+                                    command=self.revert,
+                                    bg='#95a5a6',
+                                    fg='white',
+                                    font=('Segoe UI', 9, 'bold'),
+                                    relief='flat',
+                                    cursor='hand2',
+                                    padx=10,
+                                    pady=5,
+                                    state='disabled')
+        self.revert_btn.pack(side='right', padx=5)
         
-        return form_container
-    
-    def create_form_fields(self, parent):
-        """Create form input fields"""
-        row = 0
+        self.status_label = tk.Label(toolbar, text="Loading catalog...", font=('Segoe UI', 9),
+                                     bg='#f5f6fa', fg='#7f8c8d')
+        self.status_label.pack(side='left', padx=10)
         
-        # Date & Time
-        tk.Label(parent,
-                text="📅 Date & Time:",
-                font=('Segoe UI', 11, 'bold'),
-                bg=self.colors['card'],
-                fg=self.colors['primary']).grid(row=row, column=0, sticky='w', pady=(0, 10))
+        frame = tk.Frame(self.root, bg='white')
+        frame.pack(fill='both', expand=True, padx=10, pady=10)
         
-        self.datetime_label = tk.Label(parent,
-                                      text=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                      font=('Segoe UI', 11),
-                                      bg=self.colors['card'],
-                                      fg=self.colors['dark'])
-        self.datetime_label.grid(row=row, column=1, sticky='w', pady=(0, 10))
-        row += 1
+        self.tree = ttk.Treeview(frame, columns=[col for col, _, _, _ in self.COLUMNS], show='headings')
+        for col, heading, width, _ in self.COLUMNS:
+            self.tree.heading(col, text=heading)
+            self.tree.column(col, width=width, anchor='w', minwidth=50)
+        self.tree.tag_configure('dirty', background='#fff3cd')
+        self.tree.tag_configure('conflict', background='#f8d7da')
         
-        ttk.Separator(parent, orient='horizontal').grid(row=row, column=0, 
-                                                       columnspan=2, sticky='ew', 
-                                                       pady=20)
-        row += 1
+        vsb = ttk.Scrollbar(frame, orient='vertical', command=self.tree.yview)
+        self.tree.configure(yscrollcommand=vsb.set)
+        self.tree.pack(side='left', fill='both', expand=True)
+        vsb.pack(side='right', fill='y')
         
-        # Item Selection
-        tk.Label(parent,
-                text="🔧 Select Item:",
-                font=('Segoe UI', 11),
-                bg=self.colors['card']).grid(row=row, column=0, sticky='w', pady=(0, 10))
+        self.tree.bind('<Double-1>', self.begin_edit)
+    
+    # -------- Loading --------
+    
+    def _load_background(self):
+        try:
+            with Database.worker_connection():
+                rows = Database.execute_query(CATALOG_QUERY, fetch=True) or []
+            self.root.after(0, lambda: self.show_catalog(rows))
+        except Exception as e:
+            self.root.after(0, lambda error=e: self.status_label.config(text=f"Load failed: {error}"))
+    
+    def show_catalog(self, rows):
+        """Fill the grid; tree item ids are spare ids"""
+        for spare_id, product_no, name, material, min_stock, rack, version in rows:
+            # NULLs stay None so an untouched empty cell is never written back as ""
+            values = (name, material, min_stock, rack)
+            self.product_nos[spare_id] = product_no or ""
+            self.values[spare_id] = list(values)
+            self.original[spare_id] = values
+            self.versions[spare_id] = version
+            self.tree.insert('', 'end', iid=str(spare_id), values=self.row_values(spare_id))
+        self.update_status()
+    
+    @staticmethod
+    def display(value) -> str:
+        return "" if value is None else str(value)
+    
+    def row_values(self, spare_id):
+        return (self.product_nos[spare_id], *(self.display(value) for value in self.values[spare_id]))
+    
+    def apply_filter(self):
+        """Show rows whose name, material or rack contains the search text"""
+        term = self.search_var.get().strip().lower()
+        position = 0
+        for spare_id, values in self.values.items():
+            item = str(spare_id)
+            if term and not any(term in self.display(value).lower() for value in values):
+                self.tree.detach(item)
+            else:
+                self.tree.reattach(item, '', position)
+                position += 1
+    
+    # -------- Editing --------
+    
+    def begin_edit(self, event):
+        """Overlay an entry on the double-clicked cell"""
+        self.end_edit()
+        item = self.tree.identify_row(event.y)
+        column = self.tree.identify_column(event.x)
+        if not item or not column:
+            return
+        _, _, _, field = self.COLUMNS[int(column[1:]) - 1]
+        if field is None:
+            return
+        bbox = self.tree.bbox(item, column)
+        if not bbox:
+            return  # row scrolled out of view
+        x, y, width, height = bbox
         
-        self.item_combo = ttk.Combobox(parent,
-                                      font=('Segoe UI', 11),
-                                      width=40,
-                                      state='readonly')
-        self.item_combo.grid(row=row, column=1, sticky='w', pady=(0, 10))
-        self.item_combo.bind('<<ComboboxSelected>>', self.on_item_selected)
-        row += 1
+        self.editor = tk.Entry(self.tree, font=('Segoe UI', 9))
+        self.editor.insert(0, self.display(self.values[int(item)][field]))
+        self.editor.select_range(0, tk.END)
+        self.editor.place(x=x, y=y, width=width, height=height)
+        self.editor.focus_set()
+        self.editor.bind('<Return>', lambda e: self.end_edit(int(item), field))
+        self.editor.bind('<FocusOut>', lambda e: self.end_edit(int(item), field))
+        self.editor.bind('<Escape>', lambda e: self.end_edit())
+    
+    def end_edit(self, spare_id=None, field=None):
+        """Close the cell editor, keeping its value if spare_id is given"""
+        if not self.editor:
+            return
+        editor, self.editor = self.editor, None
+        text = editor.get().strip()
+        editor.destroy()
+        if spare_id is None:
+            return
         
-        # Item Details
-        details_frame = tk.LabelFrame(parent, 
-                                     text="Item Details",
-                                     font=('Segoe UI', 10, 'bold'),
-                                     bg=self.colors['card'],
-                                     fg=self.colors['primary'],
-                                     relief='solid',
-                                     bd=1)
-        details_frame.grid(row=row, column=0, columnspan=2, sticky='ew', pady=20)
-        details_frame.grid_columnconfigure(1, weight=1)
-        details_frame.grid_columnconfigure(3, weight=1)
+        if CATALOG_EDIT_COLUMNS[field] == 'min_stock':
+            try:
+                value = int(text)
+                if value < 0:
+                    raise ValueError
+            except ValueError:
+                messagebox.showwarning("Catalog", "Min stock must be a whole number ≥ 0", parent=self.root)
+                return
+        elif CATALOG_EDIT_COLUMNS[field] == 'spare_name' and not text:
+            messagebox.showwarning("Catalog", "Spare name cannot be empty", parent=self.root)
+            return
+        else:
+            # Nullable text columns: cleared means NULL
+            value = text or None
         
-        # Configure padding for details frame content
-        details_frame_inner = tk.Frame(details_frame, bg=self.colors['card'], padx=15, pady=10)
-        details_frame_inner.pack(fill='both', expand=True)
+        self.values[spare_id][field] = value
+        self.mark(spare_id)
+        self.update_status()
+    
+    def mark(self, spare_id, conflict: bool = False):
+        """Track and tag a row as dirty (changed from its loaded values) or clean"""
+        item = str(spare_id)
+        if tuple(self.values[spare_id]) != self.original[spare_id]:
+            self.dirty.add(spare_id)
+            self.tree.item(item, values=self.row_values(spare_id), tags=('conflict',) if conflict else ('dirty',))
+        else:
+            self.dirty.discard(spare_id)
+            self.tree.item(item, values=self.row_values(spare_id), tags=())
+    
+    def update_status(self):
+        count = len(self.dirty)
+        self.save_btn.config(text=f"💾 Save ({count})" if count else "💾 Save",
+                             state='normal' if count and not self.saving else 'disabled')
+        self.revert_btn.config(state='normal' if count else 'disabled')
+        self.status_label.config(text=f"{len(self.values)} spares, {count} changed")
+    
+    def revert(self):
+        """Drop all unsaved edits"""
+        self.end_edit()
+        for spare_id in list(self.dirty):
+            self.values[spare_id] = list(self.original[spare_id])
+            self.mark(spare_id)
+        self.update_status()
+    
+    # -------- Saving --------
+    
+    def save(self):
+        """Flush only the dirty rows in one transaction on a worker thread"""
+        self.end_edit()
+        if not self.dirty or self.saving:
+            return
+        edits = {spare_id: (tuple(self.values[spare_id]), self.versions[spare_id])
+                 for spare_id in self.dirty}
+        self.saving = True
+        self.update_status()
+        self.status_label.config(text=f"Saving {len(edits)} rows...")
+        Thread(target=self._save_background, args=(edits,), daemon=True).start()
+    
+    def _save_background(self, edits):
+        try:
+            saved, conflicts = flush_catalog_edits(edits)
+            self.root.after(0, lambda: self.on_saved(edits, saved, conflicts))
+        except Exception as e:
+            self.root.after(0, lambda error=e: self.on_save_failed(error))
+    
+    def on_save_failed(self, error):
+        self.saving = False
+        self.update_status()
+        messagebox.showerror("Catalog", f"Save failed: {str(error)}", parent=self.root)
+    
+    def on_saved(self, edits, saved, conflicts):
+        """Apply the flush result locally, then let the main list pick it up as a delta"""
+        self.saving = False
         
-        self.create_item_details(details_frame_inner)
-        row += 1
+        for spare_id, (version, _) in saved.items():
+            old_name = self.original[spare_id][0]
+            self.original[spare_id] = edits[spare_id][0]
+            self.versions[spare_id] = version
+            self.mark(spare_id)
+            # Keep the type-ahead picker in step with renames and material changes
+            name, material = edits[spare_id][0][:2]
+            if old_name in self.app.item_index:
+                self.app.item_index.remove(old_name)
+                self.app.item_index.add(name, self.product_nos[spare_id], material)
+        # Alerts follow renames and min_stock edits now, not at the next delta
+        self.app.note_stock_changes({spare_id: (edits[spare_id][0][0], stock, edits[spare_id][0][2])
+                                     for spare_id, (_, stock) in saved.items()})
         
-        # Quantity to take
-        tk.Label(parent,
-                text="➖ Quantity to Take:",
-                font=('Segoe UI', 11),
-                bg=self.colors['card']).grid(row=row, column=0, sticky='w', pady=(20, 5))
+        # Rebase conflicting rows on the current database version, keeping the edits
+        for spare_id, current in conflicts.items():
+            if current is None:
+                self.values[spare_id] = list(self.original[spare_id])
+                self.mark(spare_id)
+                continue
+            self.original[spare_id], self.versions[spare_id] = current
+            self.mark(spare_id, conflict=True)
         
-        self.qty_entry = tk.Entry(parent,
-                                 font=('Segoe UI', 12),
-                                 width=15,
-                                 relief='solid',
-                                 bd=2,
-                                 bg='white')
-        self.qty_entry.grid(row=row, column=1, sticky='w', pady=(20, 5))
-        row += 1
+        self.update_status()
+        if saved:
+            self.app.load_parts_list(check_deleted=False, quiet=True)
+        if conflicts:
+            messagebox.showwarning("Catalog",
+                                   f"Saved {len(saved)} rows. {len(conflicts)} rows were changed at "
+                                   f"another station and were not saved; they are highlighted in red "
+                                   f"with your edits kept - review and save again to overwrite.",
+                                   parent=self.root)
+    
+    def on_closing(self):
+        self.end_edit()
+        if self.dirty and not messagebox.askyesno("Catalog",
+                                                  f"Discard {len(self.dirty)} unsaved changes?",
+                                                  parent=self.root):
+            return
+        self.root.destroy()
+
+
+# ================================================
+# STOCK ALERT PANEL
+# ================================================
+
+class StockAlertWindow:
+    """Live low/out-of-stock alerts and reorder list"""
+    
+    def __init__(self, app):
+        self.app = app
+        self.root = tk.Toplevel(app.root)
+        self.root.title("🔔 STOCK ALERTS")
+        self.root.geometry("700x500")
+        self.root.configure(bg='#f5f6fa')
+        self.root.transient(app.root)
         
-        # Machine Name
-        tk.Label(parent,
-                text="🏭 Machine Name:",
-                font=('Segoe UI', 11),
-                bg=self.colors['card']).grid(row=row, column=0, sticky='w', pady=(15, 5))
+        self.create_ui()
+        self.refresh()
         
-        self.machine_entry = tk.Entry(parent,
-                                     font=('Segoe UI', 12),
-                                     width=30,
-                                     relief='solid',
-                                     bd=2,
-                                     bg='white')
-        self.machine_entry.grid(row=row, column=1, sticky='w', pady=(15, 5))
-        row += 1
+        self.root.update_idletasks()
+        center_window_on_screen(self.root, 700, 500)
+    
+    def create_ui(self):
+        """Create alert panel UI"""
+        header_frame = tk.Frame(self.root, bg='#c0392b', height=50)
+        header_frame.pack(fill='x')
+        header_frame.pack_propagate(False)
         
-        # Request ID (Optional)
-        tk.Label(parent,
-                text="📝 Request ID (Optional):",
-                font=('Segoe UI', 11),
-                bg=self.colors['card']).grid(row=row, column=0, sticky='w', pady=(15, 5))
+        self.summary_label = tk.Label(header_frame,
+                                      text="",
+                                      font=('Segoe UI', 12, 'bold'),
+                                      bg='#c0392b',
+                                      fg='white')
+        self.summary_label.pack(pady=12)
         
-        self.req_entry = tk.Entry(parent,
-                                 font=('Segoe UI', 12),
-                                 width=30,
-                                 relief='solid',
-                                 bd=2,
-                                 bg='white')
-        self.req_entry.grid(row=row, column=1, sticky='w', pady=(15, 5))
-        row += 1
+        notebook = ttk.Notebook(self.root)
+        notebook.pack(fill='both', expand=True, padx=10, pady=10)
         
-        # Notes
-        tk.Label(parent,
-                text="📋 Notes:",
-                font=('Segoe UI', 11),
-                bg=self.colors['card']).grid(row=row, column=0, sticky='w', pady=(15, 5))
+        # Alerts tab
+        alerts_frame = tk.Frame(notebook, bg='white')
+        notebook.add(alerts_frame, text="Alerts")
+        self.alerts_tree = self.create_tree(alerts_frame, [
+            ('status', 'Status', 70, 'center'),
+            ('name', 'Spare Name', 300, 'w'),
+            ('stock', 'Stock', 90, 'center'),
+            ('min_stock', 'Min Stock', 90, 'center'),
+        ])
+        self.alerts_tree.tag_configure('missing', background='#f8d7da')
+        self.alerts_tree.tag_configure('low_stock', background='#ffe6cc')
         
-        self.notes_text = tk.Text(parent,
-                                 font=('Segoe UI', 11),
-                                 height=4,
-                                 width=40,
-                                 relief='solid',
-                                 bd=2,
-                                 bg='white')
-        self.notes_text.grid(row=row, column=1, sticky='w', pady=(15, 5))
-        row += 1
+        # Reorder tab
+        reorder_frame = tk.Frame(notebook, bg='white')
+        notebook.add(reorder_frame, text="Reorder List")
+        self.reorder_tree = self.create_tree(reorder_frame, [
+            ('name', 'Spare Name', 300, 'w'),
+            ('stock', 'Stock', 90, 'center'),
+            ('min_stock', 'Min Stock', 90, 'center'),
+            ('order_qty', 'Order Qty', 90, 'center'),
+        ])
         
-        # Button Frame
-        button_frame = tk.Frame(parent, bg=self.colors['card'])
-        button_frame.grid(row=row, column=0, columnspan=2, pady=30)
+        tk.Button(reorder_frame,
+                 text="📥 Export Reorder List",
+                 command=self.export_reorder_list,
+                 bg='#2ecc71',
+                 fg='white',
+                 font=('Segoe UI', 9, 'bold'),
+                 relief='flat',
+                 cursor='hand2',
+                 padx=10,
+                 pady=5).pack(anchor='e', padx=10, pady=(0, 10))
+    
+    def create_tree(self, parent, column_config):
+        """Create a treeview with scrollbar"""
+        frame = tk.Frame(parent, bg='white')
+        frame.pack(fill='both', expand=True, padx=10, pady=10)
         
-        # Submit Button
-        submit_btn = tk.Button(button_frame,
-                              text="✅ SUBMIT PENGAMBILAN",
-                              command=self.submit_transaction,
-                              bg=self.colors['accent'],
-                              fg='white',
-                              font=('Segoe UI', 12, 'bold'),
-                              relief='flat',
-                              cursor='hand2',
-                              height=2,
-                              width=20,
-                              activebackground='#c0392b',
-                              activeforeground='white')
-        submit_btn.pack(side='left', padx=10)
+        tree = ttk.Treeview(frame,
+                            columns=[col for col, _, _, _ in column_config],
+                            show='headings',
+                            selectmode='browse')
+        for col, heading, width, anchor in column_config:
+            tree.heading(col, text=heading)
+            tree.column(col, width=width, anchor=anchor, minwidth=50)
         
-        # Clear Button
-        clear_btn = tk.Button(button_frame,
-                             text="🗑️ CLEAR FORM",
-                             command=self.clear_form,
-                             bg=self.colors['gray'],
-                             fg='white',
-                             font=('Segoe UI', 11, 'bold'),
-                             relief='flat',
-                             cursor='hand2',
-                             height=2,
-                             width=15,
-                             activebackground='#95a5a6',
-                             activeforeground='white')
-        clear_btn.pack(side='left', padx=10)
+        vsb = ttk.Scrollbar(frame, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=vsb.set)
+        tree.pack(side='left', fill='both', expand=True)
+        vsb.pack(side='right', fill='y')
+        return tree
     
-    def create_item_details(self, parent):
-        """Create item details display"""
-        details = [
-            ("Item No:", 'item_no_label', '-', self.colors['primary']),
-            ("Material:", 'material_label', '-', self.colors['primary']),
-            ("System Stock:", 'system_qty_label', '0', self.colors['primary']),
-            ("Physical Qty:", 'physical_qty_label', '0', self.colors['warning']),
-            ("Variance:", 'variance_label', '0', '#6c757d'),
-            ("Rack Location:", 'rack_label', 'Not Assigned', self.colors['success']),
-        ]
+    def refresh(self):
+        """Redraw from the alert index (only breaching spares, so this stays small)"""
+        index = self.app.alert_index
+        out_of_stock = index.out_of_stock_count()
+        self.summary_label.config(
+            text=f"🔴 {out_of_stock} out of stock   🟡 {len(index) - out_of_stock} low stock")
         
-        self.detail_labels = {}
+        self.alerts_tree.delete(*self.alerts_tree.get_children())
+        for spare_id, name, stock, min_stock in index.sorted_alerts():
+            code = STATUS_MISSING if stock <= 0 else STATUS_LOW
+            self.alerts_tree.insert('', 'end',
+                values=(STATUS_ICONS[code], name, stock, min_stock),
+                tags=STATUS_TAGS[code])
         
-        for i, (label_text, name, default_value, color) in enumerate(details):
-            row = i
-            col = 0
-            
-            # Label
-            tk.Label(parent,
-                    text=label_text,
-                    font=('Segoe UI', 10, 'bold'),
-                    bg=self.colors['card'],
-                    fg=self.colors['dark']).grid(row=row, column=col, sticky='w', padx=(0, 10), pady=5)
-            
-            # Value
-            value_label = tk.Label(parent,
-                                  text=default_value,
-                                  font=('Segoe UI', 10),
-                                  bg=self.colors['card'],
-                                  fg=color,
-                                  anchor='w',
-                                  width=20)
-            value_label.grid(row=row, column=col+1, sticky='w', pady=5)
-            
-            self.detail_labels[name] = value_label
+        self.reorder_tree.delete(*self.reorder_tree.get_children())
+        for spare_id, name, stock, min_stock, order_qty in index.reorder_list():
+            self.reorder_tree.insert('', 'end', values=(name, stock, min_stock, order_qty))
     
-    def create_parts_list(self):
-        """Create the parts list with PQt status"""
-        list_container = tk.Frame(self.root, 
-                                 bg=self.colors['card'],
-                                 relief='flat',
-                                 bd=1)
+    def export_reorder_list(self):
+        """Export reorder list to CSV"""
+        path = filedialog.asksaveasfilename(
+            parent=self.root,
+            title="Export Reorder List",
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv")],
+            initialfile=f"reorder_{datetime.now().strftime('%Y%m%d_%H%M')}.csv")
+        if not path:
+            return
         
-        # List header
-        list_header = tk.Frame(list_container, 
-                              bg=self.colors['primary_light'], 
-                              height=50)
-        list_header.pack(fill='x', side='top')
-        list_header.pack_propagate(False)
+        try:
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(["Spare ID", "Spare Name", "Stock", "Min Stock", "Order Qty"])
+                writer.writerows(self.app.alert_index.reorder_list())
+        except OSError as e:
+            messagebox.showerror("Export", f"Export failed: {str(e)}", parent=self.root)
+
+
+# ================================================
+# MOVEMENT HISTORY WINDOW
+# ================================================
+
+class MovementHistoryWindow:
+    """Per-spare movement, usage and adjustment history, loaded as the user scrolls"""
+    
+    PREFETCH_AT = 0.9   # load the next page once the view passes this fraction
+    
+    def __init__(self, app, spare_id: int, spare_name: str):
+        self.app = app
+        self.spare_id = spare_id
+        self.history = None
+        self.loading = False
+        self.closed = False
+        self.row_count = 0
         
-        tk.Label(list_header,
-                text="📋 INVENTORY STATUS WITH PQT",
-                font=('Segoe UI', 14, 'bold'),
-                bg=self.colors['primary_light'],
-                fg='white').pack(pady=13)
+        self.root = tk.Toplevel(app.root)
+        self.root.title(f"📜 HISTORY - {spare_name}")
+        self.root.geometry("900x550")
+        self.root.configure(bg='#f5f6fa')
+        self.root.transient(app.root)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
-        # Filter controls
-        self.create_filter_controls(list_container)
+        self.create_ui(spare_name)
         
-        # Treeview
-        self.create_treeview(list_container)
+        self.root.update_idletasks()
+        center_window_on_screen(self.root, 900, 550)
         
-        return list_container
+        self.load_more()
     
-    def create_filter_controls(self, parent):
-        """Create filter controls for parts list"""
-        filter_frame = tk.Frame(parent, bg=self.colors['card'])
-        filter_frame.pack(fill='x', padx=15, pady=15)
+    def create_ui(self, spare_name):
+        """Create history UI"""
+        header_frame = tk.Frame(self.root, bg='#2c3e50', height=50)
+        header_frame.pack(fill='x')
+        header_frame.pack_propagate(False)
         
-        # Filter label
-        tk.Label(filter_frame,
-                text="Filter by Status:",
-                font=('Segoe UI', 10, 'bold'),
-                bg=self.colors['card']).pack(side='left', padx=(0, 10))
+        tk.Label(header_frame,
+                text=f"📜 {spare_name}",
+                font=('Segoe UI', 12, 'bold'),
+                bg='#2c3e50',
+                fg='white').pack(pady=12)
         
-        # Status filter
-        self.filter_var = tk.StringVar(value="all")
-        statuses = [
-            ("All", "all"),
-            ("✅ In Stock", "in_stock"),
-            ("🟡 Low Stock", "low_stock"),
-            ("🔴 Out of Stock", "out_of_stock"),
-            ("📊 Needs PQt", "needs_pqt"),
-            ("❌ Variance", "variance")
+        frame = tk.Frame(self.root, bg='white')
+        frame.pack(fill='both', expand=True, padx=10, pady=10)
+        
+        columns = [
+            ('when', 'Date/Time', 140, 'center'),
+            ('source', 'Ledger', 90, 'center'),
+            ('kind', 'Type', 90, 'center'),
+            ('qty', 'Qty', 70, 'center'),
+            ('by', 'By', 120, 'w'),
+            ('notes', 'Notes', 320, 'w'),
         ]
+        self.tree = ttk.Treeview(frame, columns=[col for col, _, _, _ in columns], show='headings')
+        for col, heading, width, anchor in columns:
+            self.tree.heading(col, text=heading)
+            self.tree.column(col, width=width, anchor=anchor, minwidth=50)
         
-        for text, value in statuses:
-            btn = tk.Radiobutton(filter_frame,
-                                text=text,
-                                variable=self.filter_var,
-                                value=value,
-                                command=self.apply_filter,
-                                bg=self.colors['card'],
-                                font=('Segoe UI', 9),
-                                cursor='hand2',
-                                selectcolor=self.colors['light'])
-            btn.pack(side='left', padx=5)
+        self.vsb = ttk.Scrollbar(frame, orient='vertical', command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.on_scroll)
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.vsb.pack(side='right', fill='y')
         
-        # Search frame
-        search_frame = tk.Frame(parent, bg=self.colors['card'])
-        search_frame.pack(fill='x', padx=15, pady=(0, 15))
+        self.status_label = tk.Label(self.root,
+                                     text="Loading...",
+                                     font=('Segoe UI', 9),
+                                     bg='#f5f6fa',
+                                     fg='#7f8c8d')
+        self.status_label.pack(fill='x', padx=10, pady=(0, 8))
+    
+    def on_scroll(self, first, last):
+        """Scrollbar callback; prefetch when the view nears the loaded end"""
+        self.vsb.set(first, last)
+        if float(last) >= self.PREFETCH_AT:
+            self.load_more()
+    
+    def load_more(self):
+        """Fetch the next merged page in a worker thread"""
+        if self.loading or self.closed or (self.history and self.history.exhausted):
+            return
+        self.loading = True
+        Thread(target=self._load_background, daemon=True).start()
+    
+    def _load_background(self):
+        try:
+            if self.history is None:
+                self.history = MovementHistory(self.spare_id)
+            page = self.history.next_page()
+            self.post(lambda: self.show_page(page))
+        except Exception as err:    # mysql.connector.Error included
+            # Bind now: the except target is unset once this block ends
+            self.post(lambda error=err: self.load_failed(error))
+    
+    def post(self, callback):
+        """Hand a result back to the UI thread"""
+        try:
+            self.root.after(0, callback)
+        except (tk.TclError, RuntimeError):
+            # Window (or the main loop) was closed mid-load
+            if self.history:
+                self.history.close()
+    
+    def load_failed(self, error):
+        """Stop paging: the failed ledger reader can't resume where it left off"""
+        self.loading = False
+        if self.history:
+            self.history.close()
+            self.history.exhausted = True
+        if self.closed:
+            return
+        self.status_label.config(text=f"{self.row_count} entries loaded - history incomplete")
+        messagebox.showerror("History", f"Failed to load history: {str(error)}", parent=self.root)
+    
+    def show_page(self, page):
+        """Append one page to the tree"""
+        self.loading = False
+        if self.closed:
+            self.history.close()
+            return
         
-        # Search label
-        tk.Label(search_frame,
-                text="🔍 Search:",
-                font=('Segoe UI', 10, 'bold'),
-                bg=self.colors['card']).pack(side='left', padx=(0, 10))
+        for when, _, source, kind, qty, by, notes in page:
+            self.tree.insert('', 'end', values=(
+                when.strftime('%Y-%m-%d %H:%M'),
+                source,
+                kind or "-",
+                f"{qty:+d}" if qty else "0",
+                by or "-",
+                notes or "",
+            ))
+        self.row_count += len(page)
         
-        # Search entry
-        self.search_var = tk.StringVar()
-        self.search_var.trace('w', lambda *args: self.apply_filter())
+        if self.history.exhausted:
+            self.status_label.config(text=f"{self.row_count} entries")
+            self.history.close()
+        else:
+            self.status_label.config(text=f"{self.row_count} entries loaded - scroll for more")
+            # Keep going if the first pages don't fill the view yet
+            if float(self.tree.yview()[1]) >= self.PREFETCH_AT:
+                self.root.after_idle(self.load_more)
+    
+    def on_closing(self):
+        self.closed = True
+        if self.history and not self.loading:
+            self.history.close()
+        self.root.destroy()
+
+
+# ================================================
+# RAPID ISSUE WINDOW
+# ================================================
+
+class RapidIssueWindow:
+    """
+    Scanner-driven issuing: product number, quantity, machine, Enter
+    
+    Product numbers resolve against an in-memory dict built when the window
+    opens. Issues are queued to IssueQueue and written in the background, so
+    the clerk can scan the next item straight away; results land in the
+    status strip instead of dialogs.
+    """
+    
+    STRIP_ROWS = 50             # most recent issues kept in the status strip
+    REFRESH_DEBOUNCE_MS = 2000  # parts list refresh after the last write settles
+    
+    def __init__(self, app):
+        self.app = app
+        self.index = {}         # product_number -> (spare_id, spare_name)
+        self.current = None     # (spare_id, spare_name, product_number) being issued
+        self.last_machine = ""
+        self.issued = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self.refresh_job = None
+        self.closed = False
+        self.writer = IssueQueue(self.on_issue_result)
         
-        search_entry = tk.Entry(search_frame,
-                               textvariable=self.search_var,
-                               font=('Segoe UI', 11),
-                               width=25,
-                               relief='solid',
-                               bd=2,
-                               bg='white')
-        search_entry.pack(side='left', padx=(0, 10))
+        self.root = tk.Toplevel(app.root)
+        self.root.title("⚡ RAPID ISSUE")
+        self.root.geometry("850x550")
+        self.root.configure(bg='#f5f6fa')
+        self.root.transient(app.root)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.root.bind('<Escape>', lambda e: self.reset_entry())
+        self.root.bind('<F5>', lambda e: self.load_index())
         
-        # Buttons
-        btn_frame = tk.Frame(search_frame, bg=self.colors['card'])
-        btn_frame.pack(side='right', fill='x', expand=True)
+        self.create_ui()
         
-        refresh_btn = tk.Button(btn_frame,
-                               text="🔄 Refresh",
-                               command=self.load_parts_list,
-                               bg=self.colors['primary'],
-                               fg='white',
-                               font=('Segoe UI', 9, 'bold'),
-                               relief='flat',
-                               cursor='hand2',
-                               padx=10,
-                               pady=5,
-                               activebackground=self.colors['primary_light'],
-                               activeforeground='white')
-        refresh_btn.pack(side='right', padx=5)
+        self.root.update_idletasks()
+        center_window_on_screen(self.root, 850, 550)
         
-        export_btn = tk.Button(btn_frame,
-                              text="📥 Export",
-                              command=self.export_data,
-                              bg=self.colors['success'],
-                              fg='white',
-                              font=('Segoe UI', 9, 'bold'),
-                              relief='flat',
-                              cursor='hand2',
-                              padx=10,
-                              pady=5,
-                              activebackground='#27ae60',
-                              activeforeground='white')
-        export_btn.pack(side='right', padx=5)
+        self.load_index()
     
-    def create_treeview(self, parent):
-        """Create treeview for parts list"""
-        tree_frame = tk.Frame(parent, bg=self.colors['card'])
-        tree_frame.pack(fill='both', expand=True, padx=15, pady=(0, 15))
-        
-        # Create Treeview
-        columns = ('status', 'name', 'material', 'sys_qty', 'phy_qty', 'variance', 'rack', 'last_check')
-        self.parts_tree = ttk.Treeview(tree_frame,
-                                      columns=columns,
-                                      show='headings',
-                                      height=25,
-                                      selectmode='browse')
-        
-        # Configure columns
-        column_config = [
-            ('status', 'Status', 80, 'center'),
-            ('name', 'Spare Name', 250, 'w'),
-            ('material', 'Material', 120, 'w'),
-            ('sys_qty', 'System Qty', 90, 'center'),
-            ('phy_qty', 'Physical Qty', 90, 'center'),
-            ('variance', 'Variance', 90, 'center'),
-            ('rack', 'Rack', 70, 'center'),
-            ('last_check', 'Last Check', 120, 'center'),
-        ]
+    def create_ui(self):
+        """Create rapid issue UI"""
+        header_frame = tk.Frame(self.root, bg='#2c3e50', height=50)
+        header_frame.pack(fill='x')
+        header_frame.pack_propagate(False)
         
-        for col, heading, width, anchor in column_config:
-            self.parts_tree.heading(col, text=heading)
-            self.parts_tree.column(col, width=width, anchor=anchor, minwidth=50)
+        tk.Label(header_frame,
+                text="⚡ Rapid Issue - scan product number, qty, machine",
+                font=('Segoe UI', 12, 'bold'),
+                bg='#2c3e50',
+                fg='white').pack(pady=12)
         
-        # Scrollbars
-        vsb = ttk.Scrollbar(tree_frame, 
-                           orient='vertical', 
-                           command=self.parts_tree.yview)
-        hsb = ttk.Scrollbar(tree_frame, 
-                           orient='horizontal', 
-                           command=self.parts_tree.xview)
-        self.parts_tree.configure(yscrollcommand=vsb.set, 
-                                 xscrollcommand=hsb.set)
+        form = tk.Frame(self.root, bg='#f5f6fa')
+        form.pack(fill='x', padx=10, pady=10)
         
-        # Layout
-        self.parts_tree.grid(row=0, column=0, sticky='nsew')
-        vsb.grid(row=0, column=1, sticky='ns')
-        hsb.grid(row=1, column=0, sticky='ew')
+        self.entries = {}
+        for col, (key, label, width) in enumerate([
+                ('code', "Product No.", 22),
+                ('qty', "Qty (Enter = 1)", 8),
+                ('machine', "Machine (Enter = last)", 22)]):
+            tk.Label(form, text=label, font=('Segoe UI', 9, 'bold'),
+                    bg='#f5f6fa', fg='#2c3e50').grid(row=0, column=col, sticky='w', padx=5)
+            entry = tk.Entry(form, font=('Segoe UI', 14), width=width,
+                            relief='solid', bd=1)
+            entry.grid(row=1, column=col, sticky='w', padx=5)
+            self.entries[key] = entry
         
-        # Configure grid weights
-        tree_frame.grid_rowconfigure(0, weight=1)
-        tree_frame.grid_columnconfigure(0, weight=1)
+        self.entries['code'].bind('<Return>', lambda e: self.on_code_entered())
+        self.entries['qty'].bind('<Return>', lambda e: self.on_qty_entered())
+        self.entries['machine'].bind('<Return>', lambda e: self.on_machine_entered())
         
-        # Configure tags with colors
-        tag_colors = {
-            'match': '#d4edda',
-            'variance': '#fff3cd',
-            'missing': '#f8d7da',
-            'low_stock': '#ffe6cc',
-            'no_check': '#f0f0f0',
-        }
+        self.item_label = tk.Label(self.root,
+                                   text="Loading product index...",
+                                   font=('Segoe UI', 11, 'bold'),
+                                   bg='#f5f6fa',
+                                   fg='#7f8c8d',
+                                   anchor='w')
+        self.item_label.pack(fill='x', padx=15)
         
-        for tag, color in tag_colors.items():
-            self.parts_tree.tag_configure(tag, background=color)
+        # Rolling status strip, newest first
+        frame = tk.Frame(self.root, bg='white')
+        frame.pack(fill='both', expand=True, padx=10, pady=10)
         
-        # Bind selection
-        self.parts_tree.bind('<<TreeviewSelect>>', self.on_tree_select)
-        self.parts_tree.bind('<Double-1>', self.on_tree_double_click)
-    
-    def update_datetime(self):
-        """Update date time label"""
-        try:
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            self.datetime_label.config(text=current_time)
-            self.root.after(1000, self.update_datetime)
-        except:
-            pass
+        columns = [
+            ('time', 'Time', 70, 'center'),
+            ('code', 'Product No.', 110, 'w'),
+            ('name', 'Spare Name', 220, 'w'),
+            ('qty', 'Qty', 50, 'center'),
+            ('machine', 'Machine', 120, 'w'),
+            ('result', 'Result', 220, 'w'),
+        ]
+        self.strip = ttk.Treeview(frame, columns=[col for col, _, _, _ in columns], show='headings')
+        for col, heading, width, anchor in columns:
+            self.strip.heading(col, text=heading)
+            self.strip.column(col, width=width, anchor=anchor, minwidth=40)
+        self.strip.tag_configure('pending', foreground='#7f8c8d')
+        self.strip.tag_configure('done', foreground='#27ae60')
+        self.strip.tag_configure('failed', foreground='#c0392b')
+        
+        vsb = ttk.Scrollbar(frame, orient='vertical', command=self.strip.yview)
+        self.strip.configure(yscrollcommand=vsb.set)
+        self.strip.pack(side='left', fill='both', expand=True)
+        vsb.pack(side='right', fill='y')
+        
+        self.status_label = tk.Label(self.root,
+                                     text="",
+                                     font=('Segoe UI', 9),
+                                     bg='#f5f6fa',
+                                     fg='#7f8c8d')
+        self.status_label.pack(fill='x', padx=10, pady=(0, 8))
     
-    def load_parts_list(self):
-        """Load parts list with PQt data"""
-        try:
-            # Start background thread for loading
-            Thread(target=self._load_parts_background, daemon=True).start()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to start data loading: {str(e)}")
+    def load_index(self):
+        """Build the product_number hash index in a worker thread"""
+        Thread(target=self._load_index_background, daemon=True).start()
     
-    def _load_parts_background(self):
-        """Background thread for loading parts"""
+    def _load_index_background(self):
         try:
-            query = """
-                SELECT 
-                    s.id,
-                    s.spare_name,
-                    s.material_type,
-                    s.stock as system_qty,
-                    COALESCE(p.physical_qty, s.stock) as physical_qty,
-                    COALESCE(p.variance, 0) as variance,
-                    s.rack_location,
-                    COALESCE(DATE_FORMAT(p.check_date, '%Y-%m-%d'), 'Never') as last_check,
-                    s.min_stock,
-                    COALESCE(p.status, 'Pending') as pqt_status
-                FROM spareparts s
-                LEFT JOIN physical_quantity p ON s.id = p.spare_id
-                ORDER BY 
-                    CASE 
-                        WHEN s.stock = 0 THEN 1
-                        WHEN COALESCE(p.variance, 0) != 0 THEN 2
-                        WHEN s.stock <= s.min_stock AND s.stock > 0 THEN 3
-                        ELSE 4
-                    END,
-                    s.spare_name
-            """
-            results = Database.execute_query(query, fetch=True)
-            
-            # Update UI in main thread
-            self.root.after(0, lambda: self.populate_tree(results))
-            
+            conn = Database.new_read_connection()
+            try:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT product_number, id, spare_name FROM spareparts
+                    WHERE product_number IS NOT NULL AND product_number <> ''
+                """)
+                index = {str(code).strip().upper(): (spare_id, name)
+                         for code, spare_id, name in cursor.fetchall()}
+                cursor.close()
+            finally:
+                conn.close()
+            self.post(lambda: self.index_loaded(index))
         except Exception as e:
-            self.root.after(0, lambda: messagebox.showerror("Error", f"Failed to load parts: {str(e)}"))
-    
-    def apply_filter(self):
-        """Apply filter to parts list - OPTIMIZED"""
-        filter_type = self.filter_var.get()
-        search_term = self.search_var.get().lower()
-        
-        # Get all items first
-        all_items = self.parts_tree.get_children()
-        
-        # Detach all items
-        for item in all_items:
-            self.parts_tree.detach(item)
-        
-        # Reattach matching items
-        for item in all_items:
-            values = self.parts_tree.item(item)['values']
-            
-            if len(values) < 3:
-                continue
-            
-            name = str(values[1]).lower()
-            material = str(values[2]).lower()
-            status_icon = str(values[0])
-            
-            # Apply search filter
-            if search_term and (search_term not in name and search_term not in material):
-                continue
-            
-            # Apply type filter
-            if self.should_show_item(filter_type, status_icon):
-                self.parts_tree.reattach(item, '', 'end')
+            self.post(lambda error=e: self.index_failed(error))
     
-    def should_show_item(self, filter_type: str, status_icon: str) -> bool:
-        """Determine if item should be shown based on filter"""
-        if filter_type == "all":
-            return True
-        elif filter_type == "in_stock":
-            return "✅" in status_icon
-        elif filter_type == "low_stock":
-            return "🟡" in status_icon
-        elif filter_type == "out_of_stock":
-            return "🔴" in status_icon
-        elif filter_type == "needs_pqt":
-            return "📊" in status_icon
-        elif filter_type == "variance":
-            return "⚠️" in status_icon or "❓" in status_icon
-        return False
+    def index_failed(self, error):
+        if not self.closed:
+            self.item_label.config(text=f"Index load failed: {str(error)}", fg='#c0392b')
     
-    def on_item_selected(self, event=None):
-        """When item is selected from combobox"""
-        item_name = self.item_combo.get()
-        if not item_name:
+    def index_loaded(self, index):
+        if self.closed:
             return
-        
+        self.index = index
+        self.item_label.config(text=f"{len(index)} product numbers indexed - ready to scan", fg='#7f8c8d')
+        self.entries['code'].focus_set()
+    
+    def post(self, callback):
+        """Hand a result back to the UI thread"""
         try:
-            query = """
-                SELECT 
-                    s.id,
-                    s.product_number,
-                    s.material_type,
-                    s.stock as system_qty,
-                    COALESCE(p.physical_qty, s.stock) as physical_qty,
-                    COALESCE(p.variance, 0) as variance,
-                    s.rack_location,
-                    s.min_stock
-                FROM spareparts s
-                LEFT JOIN physical_quantity p ON s.id = p.spare_id
-                WHERE s.spare_name = %s
-            """
-            result = Database.execute_query(query, (item_name,), fetch=True)
-            
-            if result and result[0]:
-                spare_id, product_no, material, sys_qty, phy_qty, variance, rack, min_stock = result[0]
-                
-                # Update details labels
-                self.detail_labels['item_no_label'].config(text=product_no or "-")
-                self.detail_labels['material_label'].config(text=material or "-")
-                self.detail_labels['system_qty_label'].config(text=str(sys_qty))
-                self.detail_labels['physical_qty_label'].config(text=str(phy_qty))
-                
-                # Variance display with color
-                variance_display = format_variance(variance)
-                variance_label = self.detail_labels['variance_label']
-                variance_label.config(text=variance_display)
-                
-                if variance > 0:
-                    variance_label.config(fg="#28a745", font=('Segoe UI', 10, 'bold'))
-                elif variance < 0:
-                    variance_label.config(fg="#dc3545", font=('Segoe UI', 10, 'bold'))
-                else:
-                    variance_label.config(fg="#6c757d", font=('Segoe UI', 10))
-                
-                self.detail_labels['rack_label'].config(text=rack if rack else "Not Assigned")
-                
-                # Highlight if low stock
-                sys_qty_label = self.detail_labels['system_qty_label']
-                if sys_qty <= min_stock:
-                    sys_qty_label.config(fg=self.colors['warning'], font=('Segoe UI', 10, 'bold'))
-                else:
-                    sys_qty_label.config(fg=self.colors['primary'], font=('Segoe UI', 10))
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load item details: {str(e)}")
+            self.app.root.after(0, callback)
+        except (tk.TclError, RuntimeError):
+            pass
     
-    def on_tree_select(self, event):
-        """When item is selected from treeview"""
-        selected = self.parts_tree.selection()
-        if not selected:
+    def on_code_entered(self):
+        code = self.entries['code'].get().strip().upper()
+        if not code:
             return
-            
-        item = self.parts_tree.item(selected[0])
-        item_name = item['values'][1]
-        
-        self.item_combo.set(item_name)
-        self.on_item_selected()
+        hit = self.index.get(code)
+        if hit is None:
+            self.root.bell()
+            self.item_label.config(text=f"❌ Unknown product number: {code} (F5 reloads the index)", fg='#c0392b')
+            self.entries['code'].select_range(0, tk.END)
+            return
+        self.current = (hit[0], hit[1], code)
+        self.item_label.config(text=f"▶ {hit[1]}", fg='#2c3e50')
+        self.entries['qty'].focus_set()
     
-    def on_tree_double_click(self, event):
-        """Handle double-click on treeview item"""
-        self.on_tree_select(event)
+    def on_qty_entered(self):
+        if self.current is None:
+            self.entries['code'].focus_set()
+            return
+        qty_str = self.entries['qty'].get().strip() or "1"
+        is_valid, _, error_msg = validate_integer(qty_str)
+        if not is_valid:
+            self.root.bell()
+            self.item_label.config(text=f"❌ {error_msg}", fg='#c0392b')
+            self.entries['qty'].select_range(0, tk.END)
+            return
+        self.entries['machine'].focus_set()
+        self.entries['machine'].select_range(0, tk.END)
     
-    def submit_transaction(self):
-        """Submit pengambilan sparepart with PQt tracking"""
-        # Get values
-        item_name = self.item_combo.get()
-        qty_str = self.qty_entry.get().strip()
-        machine_name = self.machine_entry.get().strip()
-        req_id = self.req_entry.get().strip()
-        notes = self.notes_text.get("1.0", tk.END).strip()
-        
-        # Validation
-        if not all([item_name, qty_str, machine_name]):
-            messagebox.showwarning("Validation", 
-                                 "Please fill Item Name, Qty, and Machine Name!")
+    def on_machine_entered(self):
+        if self.current is None:
+            self.entries['code'].focus_set()
             return
-        
-        # Validate quantity
-        is_valid, qty_used, error_msg = validate_integer(qty_str)
+        machine_name = self.entries['machine'].get().strip() or self.last_machine
+        if not machine_name:
+            self.root.bell()
+            self.item_label.config(text="❌ Machine name is required", fg='#c0392b')
+            return
+        is_valid, qty, error_msg = validate_integer(self.entries['qty'].get().strip() or "1")
         if not is_valid:
-            messagebox.showwarning("Validation", error_msg)
-            self.qty_entry.focus_set()
+            self.root.bell()
+            self.item_label.config(text=f"❌ {error_msg}", fg='#c0392b')
+            self.entries['qty'].focus_set()
+            self.entries['qty'].select_range(0, tk.END)
             return
-        
-        try:
-            conn = Database.get_connection()
-            if not conn:
-                messagebox.showerror("Error", "Database connection failed!")
-                return
-            
-            cursor = conn.cursor()
-            
-            # Get current stock
-            cursor.execute("""
-                SELECT id, product_number, stock 
-                FROM spareparts 
-                WHERE spare_name = %s
-            """, (item_name,))
-            result = cursor.fetchone()
-            
-            if not result:
-                cursor.close()
-                messagebox.showerror("Error", "Item not found!")
-                return
-            
-            spare_id, product_no, current_stock = result
-            
-            # Check stock availability
-            if qty_used > current_stock:
-                cursor.close()
-                messagebox.showerror("Insufficient Stock",
-                                   f"Not enough system stock!\n\n"
-                                   f"System Stock: {current_stock}\n"
-                                   f"Requested: {qty_used}")
-                return
-            
-            # Calculate new stock
-            new_stock = current_stock - qty_used
-            
-            # Update spareparts stock
-            cursor.execute("""
-                UPDATE spareparts 
-                SET stock = %s 
-                WHERE id = %s
-            """, (new_stock, spare_id))
-            
-            # Insert into stock_usage
-            cursor.execute("""
-                INSERT INTO stock_usage 
-                (date_time, item_name, item_number, qty_stock, qty_used, machine_name, notes, issued_by)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, (datetime.now(), item_name, product_no, current_stock, qty_used, machine_name, notes, "ME Operator"))
-            
-            # Update physical_quantity
-            cursor.execute("""
-                INSERT INTO physical_quantity 
-                (spare_id, product_number, spare_name, system_qty, physical_qty, 
-                 variance, checked_by, check_date, notes, status)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'Pending')
-                ON DUPLICATE KEY UPDATE
-                system_qty = VALUES(system_qty),
-                check_date = VALUES(check_date),
-                notes = VALUES(notes)
-            """, (spare_id, product_no, item_name, new_stock, new_stock, 0, "ME Operator", datetime.now(), notes))
-            
-            # Record movement
-            cursor.execute("""
-                INSERT INTO stock_movements 
-                (spare_id, spare_name, movement_type, quantity, notes, created_by, created_at)
-                VALUES (%s, %s, 'Out', %s, %s, %s, %s)
-            """, (spare_id, item_name, qty_used, notes, "ME Operator", datetime.now()))
-            
-            conn.commit()
-            cursor.close()
-            
-            # Success message
-            success_msg = (
-                f"✅ Sparepart taken successfully!\n\n"
-                f"• Item: {item_name}\n"
-                f"• Qty Taken: {qty_used}\n"
-                f"• System Stock: {current_stock} → {new_stock}\n"
-                f"• Machine: {machine_name}"
-            )
-            messagebox.showinfo("Success", success_msg)
-            
-            # Clear form and refresh data
-            self.clear_form()
-            self.load_parts_list()
-            
-        except mysql.connector.Error as e:
-            messagebox.showerror("Database Error", f"Transaction failed: {str(e)}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Transaction failed: {str(e)}")
+        self.submit(qty, machine_name)
     
-    def clear_form(self):
-        """Clear form fields"""
-        self.qty_entry.delete(0, tk.END)
-        self.machine_entry.delete(0, tk.END)
-        self.req_entry.delete(0, tk.END)
-        self.notes_text.delete("1.0", tk.END)
-        self.qty_entry.focus_set()
+    def submit(self, qty: int, machine_name: str):
+        """Queue the current issue and get ready for the next scan"""
+        spare_id, spare_name, code = self.current
+        ticket = self.writer.submit(spare_id, qty, machine_name, "Rapid issue")
+        self.strip.insert('', 0, iid=str(ticket), tags=('pending',), values=(
+            datetime.now().strftime('%H:%M:%S'), code, spare_name, qty, machine_name, "⏳ queued"))
+        for iid in self.strip.get_children()[self.STRIP_ROWS:]:
+            self.strip.delete(iid)
+        
+        self.last_machine = machine_name
+        self.reset_entry()
+        self.entries['machine'].insert(0, machine_name)
     
-    def open_admin_login(self):
-        """Open admin login"""
-        AdminLoginWindow(self).run()
+    def reset_entry(self):
+        """Clear the scan fields (the machine is kept for the next issue)"""
+        self.current = None
+        self.entries['code'].delete(0, tk.END)
+        self.entries['qty'].delete(0, tk.END)
+        self.entries['machine'].delete(0, tk.END)
+        self.item_label.config(text="Scan product number", fg='#7f8c8d')
+        self.entries['code'].focus_set()
     
-    def open_pqt_check(self):
-        """Open PQt check window"""
-        messagebox.showinfo("PQt Check", "PQt Check feature coming soon!")
+    def on_issue_result(self, ticket, result, error):
+        """IssueQueue callback (worker thread)"""
+        self.post(lambda: self.show_result(ticket, result, error))
     
-    def open_reports(self):
-        """Open reports"""
-        messagebox.showinfo("Reports", "Reports feature coming soon!")
+    def show_result(self, ticket, result, error):
+        """Apply one finished write in the UI thread"""
+        app = self.app
+        if error is None:
+            self.issued += 1
+            spare_id, item_name, _, old_stock, new_stock, min_stock = result
+            if new_stock == 0:
+                app.item_index.remove(item_name)
+            if app.alert_index.update(spare_id, item_name, new_stock, min_stock):
+                app.on_alerts_changed()
+            self.schedule_refresh()
+            text, tag = f"✅ stock {old_stock} → {new_stock}", 'done'
+        else:
+            self.failed += 1
+            if isinstance(error, InsufficientStockError):
+                text = f"❌ only {error.stock} in stock"
+            else:
+                text = f"❌ {str(error)}"
+            tag = 'failed'
+        
+        if self.closed:
+            return
+        if error is not None:
+            self.root.bell()
+        if self.strip.exists(str(ticket)):
+            self.strip.set(str(ticket), 'result', text)
+            self.strip.item(str(ticket), tags=(tag,))
+        minutes = max((time.monotonic() - self.started) / 60, 1 / 60)
+        self.status_label.config(
+            text=f"{self.issued} issued · {self.failed} failed · {self.issued / minutes:.1f}/min")
     
-    def export_data(self):
-        """Export data to CSV"""
-        messagebox.showinfo("Export", "Export feature coming soon!")
+    def schedule_refresh(self):
+        """Debounced delta refresh of the main parts list"""
+        if self.refresh_job is not None:
+            self.app.root.after_cancel(self.refresh_job)
+        self.refresh_job = self.app.root.after(self.REFRESH_DEBOUNCE_MS, self.refresh_parts)
     
-    def center_window(self):
-        """Center window on screen"""
-        center_window_on_screen(self.root)
+    def refresh_parts(self):
+        self.refresh_job = None
+        self.app.on_item_typed()
+        self.app.load_parts_list(check_deleted=False, quiet=True)
     
     def on_closing(self):
-        """Handle window closing"""
-        if messagebox.askokcancel("Quit", "Do you want to quit?"):
-            Database.close_connection()
-            self.root.destroy()
+        # Queued issues still get written; results keep updating the main window
+        self.closed = True
+        self.writer.stop()
+        self.root.destroy()
+
+
+# ================================================
+# DIAGNOSTICS WINDOW
+# ================================================
+
+class DiagnosticsWindow:
+    """Main-loop stalls, worst handlers, sampled stacks and query cache metrics (F12)"""
     
-    def run(self):
-        """Run application"""
-        try:
-            self.root.mainloop()
-        except Exception as e:
-            messagebox.showerror("Error", f"Application error: {str(e)}")
-        finally:
-            Database.close_connection()
+    REFRESH_MS = 2000
+    
+    def __init__(self, app):
+        self.app = app
+        self.monitor = app.stall_monitor
+        self.shown_stalls = None
+        self.root = tk.Toplevel(app.root)
+        self.root.title("🩺 DIAGNOSTICS")
+        self.root.geometry("800x550")
+        self.root.configure(bg='#f5f6fa')
+        self.root.transient(app.root)
+        
+        self.create_ui()
+        self.refresh()
+        
+        self.root.update_idletasks()
+        center_window_on_screen(self.root, 800, 550)
+    
+    def create_ui(self):
+        """Create diagnostics UI"""
+        header_frame = tk.Frame(self.root, bg='#2c3e50', height=50)
+        header_frame.pack(fill='x')
+        header_frame.pack_propagate(False)
+        
+        self.summary_label = tk.Label(header_frame,
+                                      text="",
+                                      font=('Segoe UI', 11, 'bold'),
+                                      bg='#2c3e50',
+                                      fg='white')
+        self.summary_label.pack(pady=12)
+        
+        notebook = ttk.Notebook(self.root)
+        notebook.pack(fill='both', expand=True, padx=10, pady=10)
+        
+        histogram_frame = tk.Frame(notebook, bg='white')
+        notebook.add(histogram_frame, text="Tick Lateness")
+        self.histogram_tree = self.create_tree(histogram_frame, [
+            ('bucket', 'Lateness', 150, 'center'),
+            ('ticks', 'Ticks', 100, 'center'),
+            ('share', 'Share', 100, 'center'),
+        ])
+        
+        handlers_frame = tk.Frame(notebook, bg='white')
+        notebook.add(handlers_frame, text="By Handler")
+        self.handlers_tree = self.create_tree(handlers_frame, [
+            ('handler', 'Handler', 250, 'w'),
+            ('stalls', 'Stalls', 80, 'center'),
+            ('total', 'Total ms', 100, 'center'),
+            ('worst', 'Worst ms', 100, 'center'),
+        ])
+        
+        stalls_frame = tk.Frame(notebook, bg='white')
+        notebook.add(stalls_frame, text="Stalls")
+        self.stalls_tree = self.create_tree(stalls_frame, [
+            ('time', 'Time', 100, 'center'),
+            ('duration', 'Duration ms', 100, 'center'),
+            ('handler', 'Handler', 250, 'w'),
+        ])
+        self.stalls_tree.bind('<<TreeviewSelect>>', self.show_stack)
+        self.stack_text = tk.Text(stalls_frame, height=10, font=('Consolas', 9), wrap='none')
+        self.stack_text.pack(fill='both', padx=10, pady=(0, 10))
+        
+        cache_frame = tk.Frame(notebook, bg='white')
+        notebook.add(cache_frame, text="Query Cache")
+        self.cache_tree = self.create_tree(cache_frame, [
+            ('metric', 'Metric', 200, 'w'),
+            ('value', 'Value', 150, 'center'),
+        ])
+    
+    def create_tree(self, parent, column_config):
+        """Create a treeview with scrollbar"""
+        frame = tk.Frame(parent, bg='white')
+        frame.pack(fill='both', expand=True, padx=10, pady=10)
+        
+        tree = ttk.Treeview(frame,
+                            columns=[col for col, _, _, _ in column_config],
+                            show='headings')
+        for col, heading, width, anchor in column_config:
+            tree.heading(col, text=heading)
+            tree.column(col, width=width, anchor=anchor, minwidth=50)
+        
+        vsb = ttk.Scrollbar(frame, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=vsb.set)
+        tree.pack(side='left', fill='both', expand=True)
+        vsb.pack(side='right', fill='y')
+        return tree
+    
+    def refresh(self):
+        """Redraw from the monitor, then again every REFRESH_MS while open"""
+        if not self.root.winfo_exists():
+            return
+        monitor = self.monitor
+        latencies = list(monitor.latencies)
+        worst = max(latencies, default=0.0)
+        self.summary_label.config(
+            text=f"{len(monitor.stalls)} stalls ≥ {monitor.threshold * 1000:.0f} ms  |  "
+                 f"{len(latencies)} ticks, worst {worst:.0f} ms late")
+        
+        self.histogram_tree.delete(*self.histogram_tree.get_children())
+        for label, count in monitor.histogram():
+            share = count / len(latencies) if latencies else 0.0
+            self.histogram_tree.insert('', 'end', values=(label, count, f"{share:.1%}"))
+        
+        self.handlers_tree.delete(*self.handlers_tree.get_children())
+        for handler, count, total, worst_ms in monitor.by_handler():
+            self.handlers_tree.insert('', 'end', values=(handler, count, f"{total:.0f}", f"{worst_ms:.0f}"))
+        
+        stats = Database.query_cache.stats()
+        self.cache_tree.delete(*self.cache_tree.get_children())
+        for metric, value in (
+                ("Entries", stats['entries']),
+                ("Memory", f"{stats['bytes'] / 1024:.0f} / {Database.query_cache.max_bytes / 1024:.0f} KB"),
+                ("Hits", stats['hits']),
+                ("Misses", stats['misses']),
+                ("Hit rate", f"{stats['hit_rate']:.1%}"),
+                ("Evictions (LRU)", stats['evictions']),
+                ("Invalidations (writes)", stats['invalidations'])):
+            self.cache_tree.insert('', 'end', values=(metric, value))
+        
+        # Item ids are stall sequence numbers, so the selection survives a redraw
+        if monitor.stall_count != self.shown_stalls:
+            self.shown_stalls = monitor.stall_count
+            selected = self.stalls_tree.selection()
+            self.stalls_tree.delete(*self.stalls_tree.get_children())
+            stalls = list(monitor.stalls)
+            first = monitor.stall_count - len(stalls)
+            for seq, (started, duration, handler, _) in enumerate(stalls, first):
+                self.stalls_tree.insert('', 'end', iid=str(seq),
+                                        values=(f"{started:%H:%M:%S}", f"{duration:.0f}", handler))
+            kept = [item for item in selected if self.stalls_tree.exists(item)]
+            if kept:
+                self.stalls_tree.selection_set(kept)
+        
+        self.root.after(self.REFRESH_MS, self.refresh)
+    
+    def show_stack(self, event=None):
+        """Show the sampled stack of the selected stall"""
+        selected = self.stalls_tree.selection()
+        if not selected:
+            return
+        stalls = list(self.monitor.stalls)
+        index = int(selected[0]) - (self.monitor.stall_count - len(stalls))
+        stack = stalls[index][3] if 0 <= index < len(stalls) else ""
+        self.stack_text.delete("1.0", tk.END)
+        self.stack_text.insert("1.0", stack or "(no stack sampled)")
 
 
 # ================================================
-# ADMIN LOGIN WINDOW
+# REPORTS WINDOW
 # ================================================
 
-class AdminLoginWindow:
-    """Admin login window"""
+class ReportsWindow:
+    """Reports and analytics"""
     
-    def __init__(self, parent=None):
-        self.parent = parent
-        self.root = tk.Toplevel() if parent else tk.Tk()
-        self.root.title("🔐 ADMIN ACCESS")
-        self.root.geometry("500x500")
-        self.root.resizable(False, False)
+    FORECAST_DISPLAY_LIMIT = 500
+    
+    def __init__(self, app):
+        self.app = app
+        self.root = tk.Toplevel(app.root)
+        self.root.title("📊 REPORTS")
+        self.root.geometry("1000x600")
         self.root.configure(bg='#f5f6fa')
+        self.root.transient(app.root)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         
-        if parent:
-            self.root.transient(parent.root)
-            self.root.grab_set()
-        
-        # Create UI first
         self.create_ui()
         
-        # Force center after all widgets are created
         self.root.update_idletasks()
-        self.center_window()
-        
-        # Ensure window is visible and centered
-        self.root.deiconify()
-        self.root.lift()
-        self.root.focus_force()
-    
-    def center_window(self):
-        """Center window on screen"""
-        center_window_on_screen(self.root, 500, 500)
+        center_window_on_screen(self.root, 1000, 600)
     
     def create_ui(self):
-        """Create login UI"""
-        main_frame = tk.Frame(self.root, bg='#f5f6fa')
-        main_frame.pack(fill='both', expand=True, padx=20, pady=20)
-        
-        # Header
-        header_frame = tk.Frame(main_frame, bg='#2c3e50', height=120)
-        header_frame.pack(fill='x', pady=(0, 20))
+        """Create reports UI"""
+        header_frame = tk.Frame(self.root, bg='#2c3e50', height=50)
+        header_frame.pack(fill='x')
         header_frame.pack_propagate(False)
         
-        title_frame = tk.Frame(header_frame, bg='#2c3e50')
-        title_frame.pack(expand=True)
-        
-        tk.Label(title_frame,
-                text="🔐",
-                font=('Segoe UI', 36),
+        tk.Label(header_frame,
+                text="📊 REPORTS & ANALYTICS",
+                font=('Segoe UI', 14, 'bold'),
                 bg='#2c3e50',
-                fg='white').pack()
+                fg='white').pack(pady=12)
         
-        tk.Label(title_frame,
-                text="ADMIN ACCESS",
-                font=('Segoe UI', 20, 'bold'),
-                bg='#2c3e50',
-                fg='white').pack(pady=(5, 0))
+        self.notebook = ttk.Notebook(self.root)
+        self.notebook.pack(fill='both', expand=True, padx=10, pady=10)
         
-        tk.Label(title_frame,
-                text="Secure Administrative Login",
-                font=('Segoe UI', 11),
-                bg='#2c3e50',
-                fg='#bdc3c7').pack()
+        self.create_forecast_tab()
+        self.create_reconcile_tab()
+        self.create_analytics_tab()
+    
+    def create_toolbar(self, parent, button_text, command):
+        """Toolbar with a run button and a status label"""
+        toolbar = tk.Frame(parent, bg='white')
+        toolbar.pack(fill='x', padx=10, pady=(10, 0))
         
-        # Login form
-        form_frame = tk.Frame(main_frame, bg='white', padx=30, pady=30)
-        form_frame.pack(fill='both', expand=True)
+        button = tk.Button(toolbar,
+                          text=button_text,
+                          command=command,
+                          bg='#3498db',
+                          fg='white',
+                          font=('Segoe UI', 9, 'bold'),
+                          relief='flat',
+                          cursor='hand2',
+                          padx=10,
+                          pady=5)
+        button.pack(side='left')
         
-        # Username
-        tk.Label(form_frame,
-                text="Username",
-                font=('Segoe UI', 11, 'bold'),
-                bg='white',
-                fg='#2c3e50').pack(anchor='w', pady=(0, 5))
+        status_label = tk.Label(toolbar,
+                               text="",
+                               font=('Segoe UI', 9),
+                               bg='white',
+                               fg='#7f8c8d')
+        status_label.pack(side='left', padx=10)
+        return button, status_label
+    
+    def create_tree(self, parent, column_config):
+        """Create a treeview with scrollbar"""
+        frame = tk.Frame(parent, bg='white')
+        frame.pack(fill='both', expand=True, padx=10, pady=10)
         
-        self.username_entry = tk.Entry(form_frame,
-                                      font=('Segoe UI', 12),
-                                      width=30,
-                                      relief='solid',
-                                      bd=2)
-        self.username_entry.pack(fill='x', pady=(0, 20))
+        tree = ttk.Treeview(frame,
+                            columns=[col for col, _, _, _ in column_config],
+                            show='headings')
+        for col, heading, width, anchor in column_config:
+            tree.heading(col, text=heading)
+            tree.column(col, width=width, anchor=anchor, minwidth=50)
         
-        # Password
-        tk.Label(form_frame,
-                text="Password",
-                font=('Segoe UI', 11, 'bold'),
-                bg='white',
-                fg='#2c3e50').pack(anchor='w', pady=(0, 5))
+        vsb = ttk.Scrollbar(frame, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=vsb.set)
+        tree.pack(side='left', fill='both', expand=True)
+        vsb.pack(side='right', fill='y')
+        return tree
+    
+    # -------- Forecast --------
+    
+    def create_forecast_tab(self):
+        """Consumption forecast: rates, days of cover, suggested min_stock"""
+        frame = tk.Frame(self.notebook, bg='white')
+        self.notebook.add(frame, text="📈 Forecast")
         
-        password_frame = tk.Frame(form_frame, bg='white')
-        password_frame.pack(fill='x', pady=(0, 20))
+        self.forecast_btn, self.forecast_status = self.create_toolbar(
+            frame, "▶ Run Forecast", self.run_forecast)
         
-        self.password_var = tk.StringVar()
-        self.password_entry = tk.Entry(password_frame,
-                                      textvariable=self.password_var,
-                                      font=('Segoe UI', 12),
-                                      width=30,
-                                      show='•',
-                                      relief='solid',
-                                      bd=2)
-        self.password_entry.pack(side='left', fill='x', expand=True)
+        self.forecast_tree = self.create_tree(frame, [
+            ('name', 'Spare Name', 250, 'w'),
+            ('stock', 'Stock', 70, 'center'),
+            ('rate_30', 'Use/Day 30d', 90, 'center'),
+            ('rate_90', 'Use/Day 90d', 90, 'center'),
+            ('rate_365', 'Use/Day 365d', 90, 'center'),
+            ('std', 'Std Dev', 80, 'center'),
+            ('cover', 'Days of Cover', 100, 'center'),
+            ('min_stock', 'Min Stock', 80, 'center'),
+            ('suggested', 'Suggested Min', 100, 'center'),
+        ])
+        self.forecast_tree.tag_configure('low_stock', background='#ffe6cc')
+    
+    def run_forecast(self):
+        """Run forecast in a worker thread"""
+        self.forecast_btn.config(state='disabled')
+        self.forecast_status.config(text="Loading usage history...")
+        Thread(target=self._forecast_background, daemon=True).start()
+    
+    def _forecast_background(self):
+        """Worker: one query per table, then vectorized computation"""
+        try:
+            started = datetime.now()
+            catalog, usage = load_usage_history()
+            result = forecast_consumption(catalog, usage)
+            elapsed = (datetime.now() - started).total_seconds()
+            self.root.after(0, lambda: self.show_forecast(result, len(usage['qty']), elapsed))
+        except Exception as e:
+            self.root.after(0, lambda error=e: self.forecast_failed(error))
+    
+    def forecast_failed(self, error):
+        self.forecast_btn.config(state='normal')
+        self.forecast_status.config(text="")
+        messagebox.showerror("Forecast", f"Forecast failed: {str(error)}", parent=self.root)
+    
+    def show_forecast(self, result, usage_rows, elapsed):
+        """Show the spares with the least days of cover"""
+        self.forecast_btn.config(state='normal')
         
-        self.show_password = False
-        self.toggle_btn = tk.Button(password_frame,
-                                   text="👁️",
-                                   command=self.toggle_password,
-                                   bg='#ecf0f1',
-                                   fg='#7f8c8d',
-                                   font=('Segoe UI', 10),
-                                   relief='flat',
-                                   cursor='hand2',
-                                   width=4)
-        self.toggle_btn.pack(side='right', padx=(10, 0))
+        cover = result['days_of_cover']
+        used = np.flatnonzero(result['rate'] > 0)
+        at_risk = used[np.argsort(cover[used], kind='stable')][:self.FORECAST_DISPLAY_LIMIT]
         
-        # Error label
-        self.error_label = tk.Label(form_frame,
-                                   text="",
-                                   font=('Segoe UI', 10),
-                                   bg='white',
-                                   fg='#e74c3c',
-                                   height=2)
-        self.error_label.pack(fill='x', pady=(0, 10))
+        self.forecast_status.config(
+            text=f"{len(result['id'])} spares, {usage_rows} usage rows, {elapsed:.1f}s - "
+                 f"showing {len(at_risk)} with the least cover")
         
-        # Login button
-        self.login_btn = tk.Button(form_frame,
-                                  text="🔓 LOGIN",
-                                  command=self.do_login,
-                                  bg='#3498db',
-                                  fg='white',
-                                  font=('Segoe UI', 12, 'bold'),
-                                  relief='flat',
-                                  cursor='hand2',
-                                  height=2,
-                                  width=20)
-        self.login_btn.pack(pady=(0, 20))
+        self.forecast_tree.delete(*self.forecast_tree.get_children())
+        rates = result['rates']
+        for i in at_risk:
+            tags = ('low_stock',) if cover[i] < FORECAST_LEAD_TIME_DAYS else ()
+            self.forecast_tree.insert('', 'end', values=(
+                result['name'][i],
+                int(result['stock'][i]),
+                f"{rates[30][i]:.2f}",
+                f"{rates[90][i]:.2f}",
+                f"{rates[365][i]:.2f}",
+                f"{result['std'][i]:.2f}",
+                f"{cover[i]:.0f}",
+                int(result['min_stock'][i]),
+                int(result['suggested_min'][i]),
+            ), tags=tags)
+    
+    # -------- Reconciliation --------
+    
+    def create_reconcile_tab(self):
+        """Ledger vs stock reconciliation"""
+        frame = tk.Frame(self.notebook, bg='white')
+        self.notebook.add(frame, text="⚖ Reconcile")
         
-        # Footer
-        footer_frame = tk.Frame(main_frame, bg='#f5f6fa')
-        footer_frame.pack(fill='x')
+        self.reconcile_btn, self.reconcile_status = self.create_toolbar(
+            frame, "▶ Run Reconciliation", self.run_reconcile)
         
-        if self.parent:
-            back_btn = tk.Button(footer_frame,
-                                text="← Back to Main",
-                                command=self.back_to_main,
-                                bg='#95a5a6',
-                                fg='white',
-                                font=('Segoe UI', 10),
-                                relief='flat',
-                                cursor='hand2',
-                                padx=15,
-                                pady=8)
-            back_btn.pack()
+        self.correct_btn = tk.Button(self.reconcile_btn.master,
+                                     text="✔ Post Corrections",
+                                     command=self.post_reconcile_corrections,
+                                     bg='#27ae60',
+                                     fg='white',
+                                     font=('Segoe UI', 9, 'bold'),
+                                     relief='flat',
+                                     cursor='hand2',
+                                     padx=10,
+                                     pady=5,
+                                     state='disabled')
+        self.correct_btn.pack(side='right')
         
-        self.username_entry.focus_set()
-        self.password_entry.bind('<Return>', lambda e: self.do_login())
-        self.root.bind('<Escape>', lambda e: self.root.destroy())
+        self.reconcile_tree = self.create_tree(frame, [
+            ('name', 'Spare Name', 300, 'w'),
+            ('stock', 'Stock', 90, 'center'),
+            ('expected', 'Ledger', 90, 'center'),
+            ('drift', 'Drift', 90, 'center'),
+        ])
+        self.mismatches = []
     
-    def toggle_password(self):
-        """Toggle password visibility"""
-        self.show_password = not self.show_password
-        if self.show_password:
-            self.password_entry.config(show='')
-            self.toggle_btn.config(text="🙈")
-        else:
-            self.password_entry.config(show='•')
-            self.toggle_btn.config(text="👁️")
+    def run_reconcile(self):
+        """Run reconciliation in a worker thread"""
+        self.reconcile_btn.config(state='disabled')
+        self.correct_btn.config(state='disabled')
+        self.reconcile_status.config(text="Checking ledgers...")
+        Thread(target=self._reconcile_background, daemon=True).start()
     
-    def do_login(self):
-        """Authenticate admin"""
-        username = self.username_entry.get().strip()
-        password = self.password_entry.get()
-        
-        self.error_label.config(text="")
+    def _reconcile_background(self):
+        try:
+            started = datetime.now()
+            
+            def progress(done, total):
+                self.root.after(0, lambda: self.reconcile_status.config(
+                    text=f"Checking ledgers... {done}/{total} ranges"))
+            
+            with Database.worker_connection():
+                mismatches = reconcile_stock(progress=progress)
+            elapsed = (datetime.now() - started).total_seconds()
+            self.root.after(0, lambda: self.show_reconcile(mismatches, elapsed))
+        except Exception as e:
+            self.root.after(0, lambda error=e: self.reconcile_failed(error))
+    
+    def reconcile_failed(self, error):
+        self.reconcile_btn.config(state='normal')
+        self.reconcile_status.config(text="")
+        messagebox.showerror("Reconciliation", f"Reconciliation failed: {str(error)}", parent=self.root)
+    
+    def show_reconcile(self, mismatches, elapsed):
+        """Show spares whose stock disagrees with their ledgers"""
+        self.mismatches = mismatches
+        self.reconcile_btn.config(state='normal')
+        self.correct_btn.config(state='normal' if mismatches else 'disabled')
+        self.reconcile_status.config(text=f"{len(mismatches)} mismatches, {elapsed:.1f}s")
         
-        if not username:
-            self.error_label.config(text="⚠️ Please enter username")
-            self.username_entry.focus_set()
+        self.reconcile_tree.delete(*self.reconcile_tree.get_children())
+        for _, name, stock, expected in mismatches:
+            self.reconcile_tree.insert('', 'end', values=(name, stock, expected, f"{stock - expected:+d}"))
+    
+    def post_reconcile_corrections(self):
+        """Book Correction adjustments for the listed mismatches"""
+        if not messagebox.askyesno("Reconciliation",
+                                   f"Post {len(self.mismatches)} Correction adjustments so the "
+                                   f"ledgers match current stock?",
+                                   parent=self.root):
             return
+        self.reconcile_btn.config(state='disabled')
+        self.correct_btn.config(state='disabled')
+        self.reconcile_status.config(text=f"Posting {len(self.mismatches)} corrections...")
+        Thread(target=self._corrections_background, args=(self.mismatches,), daemon=True).start()
+    
+    def _corrections_background(self, mismatches):
+        try:
+            posted = post_corrections(mismatches)   # own connection
+            self.root.after(0, lambda: self.show_corrections(len(mismatches), posted))
+        except Exception as e:
+            self.root.after(0, lambda error=e: self.corrections_failed(error))
+    
+    def corrections_failed(self, error):
+        self.reconcile_btn.config(state='normal')
+        self.correct_btn.config(state='normal')
+        self.reconcile_status.config(text="")
+        messagebox.showerror("Reconciliation", f"Posting failed: {str(error)}", parent=self.root)
+    
+    def show_corrections(self, count, posted):
+        skipped = count - posted
+        self.reconcile_btn.config(state='normal')
+        self.reconcile_status.config(
+            text=f"Posted {posted} corrections" + (f", {skipped} skipped (stock changed)" if skipped else ""))
+    
+    # -------- Analytics (process pool) --------
+    
+    # report -> (label, tree columns)
+    ANALYTICS_REPORTS = {
+        'usage_rollup': ("Monthly usage rollup", [
+            ('name', 'Spare Name', 250, 'w'),
+            ('total', 'Total Used', 90, 'center'),
+            ('months', 'Months Used', 90, 'center'),
+            ('avg', 'Avg / Month', 90, 'center'),
+            ('peak_month', 'Peak Month', 90, 'center'),
+            ('peak_qty', 'Peak Qty', 80, 'center'),
+        ]),
+        'pq_variance': ("PQt variance analysis", [
+            ('name', 'Spare Name', 250, 'w'),
+            ('checks', 'Checks', 70, 'center'),
+            ('mean', 'Mean Var', 80, 'center'),
+            ('mean_abs', 'Mean |Var|', 80, 'center'),
+            ('std', 'Std Dev', 80, 'center'),
+            ('off', '% Off', 70, 'center'),
+            ('shrinkage', 'Shrinkage', 80, 'center'),
+        ]),
+        'machine_matrix': ("Consumption by machine", [
+            ('machine', 'Machine', 200, 'w'),
+            ('total', 'Total Used', 90, 'center'),
+            ('spares', 'Spares', 70, 'center'),
+            ('top_spare', 'Top Spare', 250, 'w'),
+            ('top_qty', 'Top Qty', 80, 'center'),
+        ]),
+    }
+    
+    def create_analytics_tab(self):
+        """Heavy rollups computed in worker processes, streamed in per shard"""
+        frame = tk.Frame(self.notebook, bg='white')
+        self.notebook.add(frame, text="🧮 Analytics")
         
-        if not password:
-            self.error_label.config(text="⚠️ Please enter password")
-            self.password_entry.focus_set()
-            return
+        self.analytics_btn, self.analytics_status = self.create_toolbar(
+            frame, "▶ Run", self.run_analytics)
         
-        # Simple authentication
-        valid_users = {
-            "admin": "admin123",
-            "user": "user123",
-            "me": "me123"
-        }
+        toolbar = self.analytics_btn.master
+        self.analytics_choice = ttk.Combobox(toolbar,
+                                             values=[label for label, _ in self.ANALYTICS_REPORTS.values()],
+                                             state='readonly',
+                                             width=28)
+        self.analytics_choice.current(0)
+        self.analytics_choice.pack(side='left', padx=(10, 0), before=self.analytics_status)
         
-        if username in valid_users and valid_users[username] == password:
-            self.error_label.config(text="✅ Login successful!", fg='#27ae60')
-            self.login_btn.config(text="✅ ACCESS GRANTED", bg='#27ae60')
-            self.root.after(1000, self.login_successful)
+        self.analytics_cancel_btn = tk.Button(toolbar,
+                                              text="■ Cancel",
+                                              command=self.cancel_analytics,
+                                              bg='#e74c3c',
+                                              fg='white',
+                                              font=('Segoe UI', 9, 'bold'),
+                                              relief='flat',
+                                              cursor='hand2',
+                                              padx=10,
+                                              pady=5,
+                                              state='disabled')
+        self.analytics_cancel_btn.pack(side='right')
+        
+        self.analytics_tree = self.create_tree(frame, [('name', '', 200, 'w')])
+        self.analytics_job = None
+    
+    def run_analytics(self):
+        """Start the selected report on the process pool"""
+        report = list(self.ANALYTICS_REPORTS)[self.analytics_choice.current()]
+        _, columns = self.ANALYTICS_REPORTS[report]
+        
+        tree = self.analytics_tree
+        tree.delete(*tree.get_children())
+        tree.configure(columns=[col for col, _, _, _ in columns])
+        for col, heading, width, anchor in columns:
+            tree.heading(col, text=heading)
+            tree.column(col, width=width, anchor=anchor, minwidth=50)
+        
+        self.spare_names = dict(zip(self.app.parts_data_cache.ids, self.app.parts_data_cache.names))
+        self.machine_totals = {}
+        self.analytics_started = datetime.now()
+        self.analytics_btn.config(state='disabled')
+        self.analytics_cancel_btn.config(state='normal')
+        self.analytics_status.config(text="Loading data...")
+        
+        job = ReportJob(report,
+                        on_partial=lambda result, done, total: self.root.after(
+                            0, lambda: self.show_analytics_partial(job, result, done, total)),
+                        on_done=lambda: self.root.after(0, lambda: self.analytics_finished(job)),
+                        on_error=lambda e: self.root.after(0, lambda: self.analytics_failed(job, e)))
+        self.analytics_job = job
+        job.start()
+    
+    def show_analytics_partial(self, job, result, done, total):
+        """Add one shard's rows as soon as its worker finishes"""
+        if job is not self.analytics_job:
+            return
+        names = self.spare_names
+        tree = self.analytics_tree
+        
+        if job.report == 'usage_rollup':
+            for spare_id, total_qty, months, avg, peak_month, peak_qty in result:
+                tree.insert('', 'end', values=(names.get(spare_id, f"#{spare_id}"), total_qty, months,
+                                               f"{avg:.1f}", peak_month, peak_qty))
+        elif job.report == 'pq_variance':
+            for spare_id, checks, mean, mean_abs, std, off, shrinkage in result:
+                tree.insert('', 'end', values=(names.get(spare_id, f"#{spare_id}"), checks, f"{mean:+.1f}",
+                                               f"{mean_abs:.1f}", f"{std:.1f}", f"{off:.0%}", shrinkage))
         else:
-            self.error_label.config(text="❌ Invalid username or password")
-            self.password_entry.delete(0, tk.END)
-            self.password_entry.focus_set()
+            # Shards hold disjoint spares, so per-machine figures simply add up
+            for machine, per_spare in result.items():
+                entry = self.machine_totals.setdefault(machine, [0, 0, 0, None])
+                entry[0] += sum(per_spare.values())
+                entry[1] += len(per_spare)
+                top_spare, top_qty = max(per_spare.items(), key=lambda item: item[1])
+                if top_qty > entry[2]:
+                    entry[2], entry[3] = top_qty, top_spare
+            tree.delete(*tree.get_children())
+            machines = job.machines.values
+            for machine, (total_qty, spares, top_qty, top_spare) in sorted(
+                    self.machine_totals.items(), key=lambda item: item[1][0], reverse=True):
+                tree.insert('', 'end', values=(machines[machine], total_qty, spares,
+                                               names.get(top_spare, f"#{top_spare}"), top_qty))
+        
+        self.analytics_status.config(text=f"{done}/{total} shards, {len(tree.get_children())} rows")
     
-    def login_successful(self):
-        """Handle successful login"""
-        messagebox.showinfo("Admin Access", "Welcome to Admin Panel!")
-        self.root.destroy()
+    def analytics_finished(self, job):
+        if job is not self.analytics_job:
+            return
+        self.analytics_job = None
+        elapsed = (datetime.now() - self.analytics_started).total_seconds()
+        self.analytics_btn.config(state='normal')
+        self.analytics_cancel_btn.config(state='disabled')
+        self.analytics_status.config(
+            text=f"{len(self.analytics_tree.get_children())} rows, {job.total} shards, {elapsed:.1f}s")
     
-    def back_to_main(self):
-        """Return to main application"""
-        self.root.destroy()
-        if self.parent:
-            self.parent.root.deiconify()
+    def analytics_failed(self, job, error):
+        if job is not self.analytics_job:
+            return
+        self.analytics_job = None
+        self.analytics_btn.config(state='normal')
+        self.analytics_cancel_btn.config(state='disabled')
+        self.analytics_status.config(text="")
+        messagebox.showerror("Analytics", f"Report failed: {str(error)}", parent=self.root)
     
-    def run(self):
-        """Run login window"""
-        self.root.mainloop()
+    def cancel_analytics(self):
+        """Stop streaming; shards not yet started are dropped"""
+        if self.analytics_job:
+            self.analytics_job.cancel()
+            self.analytics_job = None
+        self.analytics_btn.config(state='normal')
+        self.analytics_cancel_btn.config(state='disabled')
+        self.analytics_status.config(text=f"Cancelled - {len(self.analytics_tree.get_children())} rows")
+    
+    def on_closing(self):
+        if self.analytics_job:
+            self.analytics_job.cancel()
+        self.root.destroy()
 
 
 # ================================================
@@ -1626,6 +6149,8 @@ def create_sample_data():
                 VALUES (%s, %s, %s, %s, %s, %s)
             """
             Database.execute_many(query, sample_spareparts)
+            Database.execute_query(REFRESH_ALL_STATUS_PRIORITY_SQL)
+            book_opening_balances()
             
             print(f"Inserted {len(sample_spareparts)} sample items")
             
@@ -1633,31 +6158,171 @@ def create_sample_data():
         print(f"Sample data creation error: {e}")
 
 
+# ================================================
+# PROFILING - OPT-IN (--profile or ME_PROFILE=1)
+# ================================================
+
+PROFILE_ENV = 'ME_PROFILE'
+PROFILE_DIR = os.path.join(APP_DATA_DIR, 'profiles')
+PROFILE_TOP_N = 30
+
+# Main-thread handlers wrapped in profiling mode. Nested main loops
+# (open_admin_login) and high-frequency polls are left out.
+PROFILE_HANDLERS = {
+    'SparepartApp': ('initialize', 'show_main_window', 'populate_tree', 'on_parts_loaded',
+                     'poll_delta', 'apply_filter', 'sort_by_column', 'on_item_selected',
+                     'on_item_typed', 'on_item_entered', 'on_tree_select', 'on_tree_double_click',
+                     'submit_transaction', 'clear_form', 'export_data', 'open_pqt_check',
+                     'open_reports', 'open_alerts', 'open_diagnostics', 'on_alerts_changed'),
+    'ReportsWindow': ('run_forecast', 'show_forecast', 'run_reconcile', 'show_reconcile',
+                      'post_reconcile_corrections'),
+    'StockAlertWindow': ('refresh', 'export_reorder_list'),
+    'MovementHistoryWindow': ('show_page',),
+    'AdminCatalogWindow': ('show_catalog', 'apply_filter', 'end_edit', 'revert', 'save', 'on_saved'),
+}
+
+
+class Profiler:
+    """
+    cProfile and tracemalloc around startup stages and UI handlers
+    
+    Nothing is wrapped unless profiling is requested, so the normal run
+    pays no overhead. Each section keeps one cumulative profile; an
+    allocation snapshot is kept from its call with the highest peak.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.profiles = {}  # section -> cProfile.Profile (accumulates across calls)
+        self.timings = {}   # section -> [calls, total seconds, worst seconds, worst peak bytes]
+        self.active = False
+        os.makedirs(directory, exist_ok=True)
+        tracemalloc.start(25)
+    
+    @classmethod
+    def from_environment(cls, argv=None) -> Optional['Profiler']:
+        """Profiler if requested by --profile[=DIR] or ME_PROFILE=1|DIR, else None"""
+        argv = sys.argv[1:] if argv is None else argv
+        requested = os.environ.get(PROFILE_ENV, '').strip()
+        for arg in argv:
+            if arg == '--profile' or arg.startswith('--profile='):
+                requested = arg.partition('=')[2] or '1'
+        if not requested or requested.lower() in ('0', 'false', 'no'):
+            return None
+        
+        base = PROFILE_DIR if requested.lower() in ('1', 'true', 'yes') else requested
+        return cls(os.path.join(base, datetime.now().strftime('%Y%m%d-%H%M%S')))
+    
+    @contextmanager
+    def section(self, name: str):
+        """Profile one call of a section (nested and worker-thread calls run unprofiled)"""
+        if self.active or threading.current_thread() is not threading.main_thread():
+            yield
+            return
+        
+        profile = self.profiles.setdefault(name, cProfile.Profile())
+        timing = self.timings.setdefault(name, [0, 0.0, 0.0, 0])
+        self.active = True
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            self.active = False
+            
+            timing[0] += 1
+            timing[1] += elapsed
+            timing[2] = max(timing[2], elapsed)
+            if peak > timing[3]:
+                timing[3] = peak
+                tracemalloc.take_snapshot().dump(self.path(name, 'tracemalloc'))
+    
+    def wrap(self, func, name: str):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.section(name):
+                return func(*args, **kwargs)
+        return wrapper
+    
+    def instrument(self, handlers: dict = None):
+        """Replace the listed methods with profiled wrappers (before any window is built)"""
+        for class_name, methods in (handlers or PROFILE_HANDLERS).items():
+            cls = globals()[class_name]
+            for method in methods:
+                setattr(cls, method, self.wrap(getattr(cls, method), f"{class_name}.{method}"))
+    
+    def path(self, name: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{name}.{extension}")
+    
+    def write_summary(self) -> str:
+        """Dump every section's profile and a hotspot summary; returns the summary path"""
+        for name, profile in self.profiles.items():
+            profile.dump_stats(self.path(name, 'prof'))
+        
+        lines = [f"{'Section':<50} {'Calls':>6} {'Total s':>9} {'Mean ms':>9} {'Worst ms':>9} {'Peak KB':>9}"]
+        for name, (calls, total, worst, peak) in sorted(self.timings.items(),
+                                                         key=lambda item: item[1][1], reverse=True):
+            if calls:
+                lines.append(f"{name:<50} {calls:>6} {total:>9.3f} {total / calls * 1000:>9.1f} "
+                             f"{worst * 1000:>9.1f} {peak / 1024:>9.0f}")
+        
+        stream = io.StringIO()
+        profiles = [profile for name, profile in self.profiles.items() if self.timings[name][0]]
+        if profiles:
+            stats = pstats.Stats(profiles[0], stream=stream)
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats.strip_dirs().sort_stats('cumulative').print_stats(PROFILE_TOP_N)
+        
+        summary_path = os.path.join(self.directory, 'summary.txt')
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines))
+            f.write(f"\n\nTop {PROFILE_TOP_N} cumulative hotspots across all sections:\n")
+            f.write(stream.getvalue())
+        tracemalloc.stop()
+        return summary_path
+
+
 # ================================================
 # MAIN ENTRY POINT - OPTIMIZED
 # ================================================
 
 def main():
     """Main entry point with loading screen"""
+    # Profiling mode is opt-in; otherwise stages run under a no-op context
+    profiler = Profiler.from_environment()
+    if profiler:
+        profiler.instrument()
+        stage = profiler.section
+    else:
+        stage = lambda name: nullcontext()
+    
     try:
         # Show loading screen
-        loading = LoadingScreen()
-        loading.update_status("Connecting to database...")
-        loading.root.update()
+        with stage('startup.loading_screen'):
+            loading = LoadingScreen()
+            loading.update_status("Connecting to database...")
+            loading.root.update()
         
         # Setup database
-        Database.setup_database()
+        with stage('startup.setup_database'):
+            Database.setup_database()
         
         loading.update_status("Creating sample data...")
         loading.root.update()
         
         # Create sample data
-        create_sample_data()
+        with stage('startup.create_sample_data'):
+            create_sample_data()
         
         loading.update_status("Starting application...")
         loading.root.update()
         
-        # Create main application
+        # Create main application (SparepartApp.initialize is profiled as a handler)
         app = SparepartApp(loading)
         app.run()
         
@@ -1667,6 +6332,8 @@ def main():
         messagebox.showerror("Fatal Error", f"Application failed to start:\n\n{str(e)}")
     finally:
         Database.close_connection()
+        if profiler:
+            print(f"Profile summary: {profiler.write_summary()}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file